@@ -6,7 +6,6 @@ Permet l'exécution via GitHub Actions ou en ligne de commande
 import os
 import json
 import argparse
-import ast
 from claude_code_reviewer import ReviewCrew
 
 def parse_args():
@@ -64,10 +63,10 @@ def main():
     print(f"\n🔍 Analyse du dépôt {owner}/{repo}...")
     
     # Retrieve repository file tree
-    from claude_code_reviewer import get_file_tree, global_path
-    get_file_tree(owner=owner, repo=repo)
+    from claude_code_reviewer import get_file_tree
+    repo_tree = get_file_tree(owner=owner, repo=repo)
     
-    if not global_path:
+    if not repo_tree:
         print("❌ Impossible de récupérer la structure du dépôt. Vérifiez vos identifiants et l'URL.")
         return
     
@@ -87,17 +86,13 @@ def main():
         except Exception as e:
             print(f"⚠️ Erreur lors de la création de la page Notion: {e}")
     
-    # Import the PathAgent to find matching files
-    from claude_code_reviewer import Agents, Tasks
-    
-    path_agent = Agents.path_agent()
-    path_task = Tasks.get_file_path_task(agent=path_agent, filetree=global_path, user_input=target_path)
+    # Resolve matching files locally (the PathAgent is only used for ambiguous targets)
+    from claude_code_reviewer import resolve_target_paths
     
     print(f"\n🔍 Recherche des fichiers correspondant à '{target_path}'...")
-    paths_output = path_task.execute()
     
     try:
-        paths = ast.literal_eval(paths_output)
+        paths = resolve_target_paths(repo_tree, target_path)
         
         if not paths:
             print(f"❌ Aucun fichier trouvé correspondant à '{target_path}'")
@@ -9,11 +9,19 @@ import sys
 import json
 import time
 import argparse
-import ast
 import logging
 import traceback
 from datetime import datetime
 
+from code_chunker import DEFAULT_CHUNK_LINES
+from file_ranker import DEFAULT_CHURN_COMMITS, DEFAULT_SHORTLIST_FACTOR, FileRanker, fetch_churn, fetch_diff_paths, is_excluded
+from github_client import get_client
+from model_router import ModelRouter
+from tarball_source import open_tarball_source
+from repo_tree import is_ignored
+from review_cache import DEFAULT_CACHE_PATH, ReviewCache
+from review_executor import DEFAULT_CONCURRENCY, run_reviews
+
 # Configuration du logger
 def setup_logger(debug_mode=False):
     """Configure le système de logging"""
@@ -50,6 +58,33 @@ def parse_args():
     parser.add_argument("--config", type=str, help="Chemin vers un fichier de configuration JSON")
     parser.add_argument("--debug", action="store_true", help="Activer le mode débogage (plus de logs)")
     parser.add_argument("--timeout", type=int, default=300, help="Timeout pour les appels API en secondes (défaut: 300)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Nombre de fichiers examinés simultanément (défaut: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--cache-path", type=str, default=DEFAULT_CACHE_PATH,
+                        help=f"Fichier SQLite du cache de revues (défaut: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--no-cache", action="store_true", help="Désactiver le cache de revues")
+    parser.add_argument("--engine", type=str, choices=("direct", "crew"), default="direct",
+                        help="Moteur de revue: 'direct' (un seul appel à Claude) ou 'crew' (équipe CrewAI) (défaut: direct)")
+    parser.add_argument("--output-budget", type=int,
+                        help="Budget de jetons de sortie par fichier au-delà duquel la génération en flux est interrompue (moteur direct)")
+    parser.add_argument("--output-mode", type=str, choices=("patch", "full"), default="patch",
+                        help="Forme des corrections (moteur direct): 'patch' (diff unifié ou rechercher/remplacer, "
+                             "fichier modifié reconstruit localement) ou 'full' (fichier complet) (défaut: patch)")
+    parser.add_argument("--chunk-lines", type=int, default=DEFAULT_CHUNK_LINES,
+                        help=f"Taille des morceaux des fichiers de plus de 1000 lignes ou 1 Mo, examinés par morceaux "
+                             f"syntaxiques (moteur direct, 0 pour les ignorer) (défaut: {DEFAULT_CHUNK_LINES})")
+    parser.add_argument("--source", type=str, choices=("api", "tarball"), default="api",
+                        help="Lecture des fichiers: 'api' (un appel contents par fichier) ou 'tarball' (une seule archive "
+                             "du dépôt téléchargée et indexée en mémoire) (défaut: api)")
+    parser.add_argument("--max-files", type=int,
+                        help="Nombre maximal de fichiers examinés, les plus risqués d'abord "
+                             "(défaut: review_settings.max_files_per_run, 0 pour ne pas limiter)")
+    parser.add_argument("--diff-base", type=str,
+                        help="Référence de base: les fichiers modifiés depuis cette référence sont favorisés par le classement")
+    parser.add_argument("--batch", action="store_true",
+                        help="Soumettre toutes les revues en un seul lot (API Message Batches, moteur direct)")
+    parser.add_argument("--batch-id", type=str,
+                        help="Reprendre la collecte des résultats d'un lot déjà soumis (état dans .review_batches/)")
     return parser.parse_args()
 
 def load_config(config_path, logger):
@@ -72,8 +107,114 @@ def load_config(config_path, logger):
             logger.debug(f"Traceback: {traceback.format_exc()}")
         return None
 
+def open_review_cache(args, logger):
+    """Ouvre le cache de revues sauf s'il est désactivé"""
+    if args.no_cache:
+        logger.info("ℹ️ Cache de revues désactivé")
+        return None
+    try:
+        cache = ReviewCache(args.cache_path)
+        logger.info(f"✅ Cache de revues ouvert: {args.cache_path}")
+        return cache
+    except Exception as e:
+        logger.warning(f"⚠️ Cache de revues indisponible ({e}), les revues seront toutes recalculées")
+        return None
+
+def log_review_results(review_results, page_id, logger):
+    """Affiche les résultats des revues et le bilan de l'exécution"""
+    for result in review_results:
+        if not result.get('error'):
+            logger.info(f"Résultat pour {result['file']}: {result['result']}")
+    
+    total = len(review_results)
+    failed = sum(1 for result in review_results if result.get('error'))
+    if failed:
+        logger.warning(f"⚠️ {failed} fichier(s) en erreur sur {total}")
+    logger.info(f"✅ Toutes les revues sont terminées! ({total} fichier(s) analysé(s))")
+    if page_id:
+        # Les revues sont exportées en arrière-plan: on attend la fin des écritures en file
+        from claude_code_reviewer import close_notion_writer
+        summary = close_notion_writer()
+        logger.info(f"📝 Les résultats ont été exportés vers Notion" + (f": {summary}" if summary else ""))
+
+def resume_batch(args, logger):
+    """Reprend un lot déjà soumis: attend sa fin puis traite ses résultats"""
+    try:
+        from batch_review import collect_batch_results, load_batch_state
+        from review_engine import token_usage
+        state = load_batch_state(args.batch_id)
+    except FileNotFoundError:
+        logger.error(f"❌ État du lot {args.batch_id} introuvable dans .review_batches/")
+        return 1
+    except ImportError as e:
+        logger.error(f"❌ Erreur d'importation des modules: {e}")
+        return 1
+    
+    logger.info(f"📦 Reprise du lot {args.batch_id} ({state['owner']}/{state['repo']}, {len(state['paths'])} fichier(s))")
+    cache = open_review_cache(args, logger)
+    try:
+        review_results = collect_batch_results(state, cache=cache, logger=logger)
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la collecte du lot {args.batch_id}: {e}")
+        if logger.level == logging.DEBUG:
+            logger.debug(f"Traceback: {traceback.format_exc()}")
+        return 1
+    finally:
+        if cache:
+            logger.info(f"♻️ Cache de revues: {cache.summary()}")
+            cache.close()
+    
+    log_review_results(review_results, state.get('page_id'), logger)
+    if token_usage.calls:
+        logger.info(f"🧮 Jetons Claude: {token_usage.summary()}")
+    get_client().log_stats(logger)
+    return 0
+
+def select_review_paths(args, config, owner, repo, repo_tree, paths, logger, content_source=None):
+    """
+    Applique exclude_paths puis, si le nombre de fichiers est plafonné, ne garde que les plus risqués.
+    
+    Le classement (file_ranker) combine taille, complexité, commits récents et présence
+    dans le diff depuis --diff-base; il n'a lieu que si le plafond est dépassé. Sans
+    archive du dépôt (content_source), seuls les contenus d'une liste restreinte sont
+    récupérés pour mesurer la complexité.
+    """
+    config = config or {}
+    kept = [path for path in paths if not is_excluded(path, config.get('exclude_paths'))]
+    if len(kept) < len(paths):
+        logger.info(f"🚫 {len(paths) - len(kept)} fichier(s) exclu(s) par exclude_paths")
+    
+    limit = args.max_files if args.max_files is not None else config.get('review_settings', {}).get('max_files_per_run')
+    if not limit or len(kept) <= limit:
+        return kept
+    
+    ranking = config.get('file_ranking', {})
+    churn = {}
+    try:
+        churn = fetch_churn(owner, repo, max_commits=ranking.get('churn_commits', DEFAULT_CHURN_COMMITS),
+                            concurrency=args.concurrency)
+    except Exception as e:
+        logger.warning(f"⚠️ Historique des commits indisponible ({e}), classement sans activité récente")
+    diff_paths = set()
+    if args.diff_base:
+        try:
+            diff_paths = fetch_diff_paths(owner, repo, args.diff_base)
+        except Exception as e:
+            logger.warning(f"⚠️ Comparaison avec {args.diff_base} impossible ({e}), classement sans diff")
+    
+    from claude_code_reviewer import fetch_file_contents
+    entries = {entry['path']: entry for entry in repo_tree}
+    ranker = FileRanker(
+        ranking.get('weights'), lambda path: fetch_file_contents(path, owner, repo, max_lines=None),
+        churn, diff_paths, concurrency=args.concurrency, logger=logger, local_content=content_source is not None,
+        shortlist_factor=ranking.get('shortlist_factor', DEFAULT_SHORTLIST_FACTOR)
+    )
+    return [item['path'] for item in ranker.select([entries.get(path, {'path': path}) for path in kept], limit)]
+
 def verify_environment_vars(logger):
-    """Vérifie que les variables d'environnement nécessaires sont définies"""
+    """Vérifie que les variables d'environnement nécessaires sont définies (fichier .env compris)"""
+    from claude_code_reviewer import load_environment
+    load_environment()
     required_vars = ["ANTHROPIC_API_KEY", "GITHUB_API_KEY"]
     missing_vars = [var for var in required_vars if not os.getenv(var)]
     
@@ -106,6 +247,10 @@ def main():
     if not verify_environment_vars(logger):
         return 1
     
+    # Reprise d'un lot soumis lors d'une exécution précédente
+    if args.batch_id:
+        return resume_batch(args, logger)
+    
     # Charger la configuration depuis un fichier si spécifié
     config = None
     if args.config:
@@ -138,7 +283,8 @@ def main():
     
     # Importer les modules nécessaires
     try:
-        from claude_code_reviewer import get_file_tree, global_path, create_notion_page, Agents, Tasks, ReviewCrew
+        from claude_code_reviewer import get_file_tree, create_notion_page, resolve_target_paths, ReviewCrew
+        from review_engine import build_repo_context, log_sink, notion_sink, token_usage
         logger.info("✅ Modules importés avec succès")
     except ImportError as e:
         logger.error(f"❌ Erreur d'importation des modules: {e}")
@@ -149,16 +295,17 @@ def main():
     logger.info(f"🔍 Récupération de la structure du dépôt {owner}/{repo}...")
     start_time = time.time()
     try:
-        get_file_tree(owner=owner, repo=repo)
+        repo_tree = get_file_tree(owner=owner, repo=repo)
         elapsed_time = time.time() - start_time
-        logger.info(f"✅ Structure du dépôt récupérée en {elapsed_time:.2f} secondes")
+        if repo_tree:
+            logger.info(f"✅ Structure du dépôt récupérée en {elapsed_time:.2f} secondes ({len(repo_tree)} entrées)")
     except Exception as e:
         logger.error(f"❌ Erreur lors de la récupération de la structure du dépôt: {e}")
         if logger.level == logging.DEBUG:
             logger.debug(f"Traceback: {traceback.format_exc()}")
         return 1
     
-    if not global_path:
+    if not repo_tree:
         logger.error("❌ Impossible de récupérer la structure du dépôt. Vérifiez vos identifiants et l'URL.")
         return 1
     
@@ -182,57 +329,100 @@ def main():
     else:
         logger.info("ℹ️ Exportation vers Notion désactivée (clés API manquantes)")
     
-    # Importer l'agent de chemin pour trouver les fichiers correspondants
-    path_agent = Agents.path_agent()
-    path_task = Tasks.get_file_path_task(agent=path_agent, filetree=global_path, user_input=target_path)
-    
+    # Résoudre localement les fichiers correspondants (l'agent de chemin n'intervient que si la cible est ambiguë)
     logger.info(f"🔍 Recherche des fichiers correspondant à '{target_path}'...")
+    start_time = time.time()
     try:
-        paths_output = path_task.execute()
-        logger.debug(f"Résultat brut de la recherche: {paths_output}")
+        paths = resolve_target_paths(repo_tree, target_path)
+        elapsed_time = time.time() - start_time
+        logger.debug(f"Chemins résolus en {elapsed_time * 1000:.2f} ms: {paths}")
     except Exception as e:
         logger.error(f"❌ Erreur lors de la recherche des fichiers: {e}")
         if logger.level == logging.DEBUG:
             logger.debug(f"Traceback: {traceback.format_exc()}")
         return 1
     
+    content_source = None
     try:
-        paths = ast.literal_eval(paths_output)
-        
         if not paths:
             logger.error(f"❌ Aucun fichier trouvé correspondant à '{target_path}'")
             return 1
             
         logger.info(f"✅ {len(paths)} fichier(s) trouvé(s): {', '.join(paths)}")
         
-        # Analyser chaque fichier un par un
-        for i, path in enumerate(paths):
-            logger.info(f"📄 ({i+1}/{len(paths)}) Analyse de {path}...")
-            
-            # Exécuter l'équipe de revue
-            start_time = time.time()
-            try:
-                review_crew = ReviewCrew(owner=owner, repo=repo, page_id=page_id, path=path)
-                result = review_crew.run()
-                elapsed_time = time.time() - start_time
-                
-                # Afficher les résultats
-                logger.info(f"✅ Revue terminée pour {path} en {elapsed_time:.2f} secondes")
-                logger.info(f"Résultat: {result}")
-            except Exception as e:
-                logger.error(f"❌ Erreur lors de l'analyse de {path}: {e}")
-                if logger.level == logging.DEBUG:
-                    logger.debug(f"Traceback: {traceback.format_exc()}")
+        # Une seule archive du dépôt remplace les appels contents par fichier
+        content_source = open_tarball_source(owner, repo, logger=logger) if args.source == "tarball" else None
+        
+        # Exclusions et plafond de la configuration: seuls les fichiers les plus risqués sont examinés
+        paths = select_review_paths(args, config, owner, repo, repo_tree, paths, logger, content_source)
+        if not paths:
+            logger.error("❌ Tous les fichiers trouvés sont exclus par exclude_paths")
+            return 1
+        
+        # Le SHA de blob de chaque fichier sert de clé au cache de revues
+        cache = open_review_cache(args, logger)
+        blob_shas = {entry['path']: entry['sha'] for entry in repo_tree if entry['type'] == 'blob'}
+        review_settings = config.get('review_settings', {}) if config else {}
+        
+        # Modèle et max_tokens choisis par fichier selon la section model_routing (moteur direct)
+        router = ModelRouter.from_config(config, logger)
+        
+        # Contexte commun à toutes les revues: préfixe de prompt mis en cache par le moteur direct
+        repo_context = build_repo_context(
+            repo,
+            [entry['path'] for entry in repo_tree if entry['type'] == 'blob' and not is_ignored(entry['path'])],
+            review_settings
+        )
+        
+        if args.batch:
+            # Toutes les revues partent en un seul lot (moteur direct), repris avec --batch-id si interrompu
+            from batch_review import run_batch_reviews
+            if args.engine != "direct":
+                logger.warning("⚠️ Le mode lot utilise toujours le moteur direct")
+            logger.info(f"📦 Revues soumises en lot ({len(paths)} fichier(s))")
+            review_results = run_batch_reviews(
+                owner, repo, page_id, paths, blob_shas=blob_shas, cache=cache, settings=review_settings,
+                concurrency=args.concurrency, repo_context=repo_context, output_mode=args.output_mode, router=router,
+                logger=logger
+            )
+        else:
+            # Analyser les fichiers en parallèle (résultats conservés dans l'ordre d'entrée)
+            logger.info(f"⚙️ Revues exécutées avec le moteur '{args.engine}' et une concurrence de {args.concurrency}")
+            # La revue est journalisée et écrite dans Notion avant la fin du correctif
+            sinks = [log_sink(logger)] + ([notion_sink(page_id)] if page_id else [])
+            review_results = run_reviews(
+                paths,
+                lambda path: ReviewCrew(
+                    owner=owner, repo=repo, page_id=page_id, path=path,
+                    blob_sha=blob_shas.get(path), cache=cache, settings=review_settings, engine=args.engine,
+                    repo_context=repo_context, output_budget=args.output_budget, sinks=sinks,
+                    output_mode=args.output_mode, chunk_lines=args.chunk_lines, router=router
+                ).run(),
+                concurrency=args.concurrency,
+                logger=logger
+            )
+        
+        if cache:
+            logger.info(f"♻️ Cache de revues: {cache.summary()}")
+            cache.close()
         
-        logger.info(f"✅ Toutes les revues sont terminées! ({len(paths)} fichier(s) analysé(s))")
-        if page_id:
-            logger.info(f"📝 Les résultats ont été exportés vers Notion")
+        # Afficher les résultats
+        log_review_results(review_results, page_id, logger)
+        if router:
+            logger.info(f"🧭 Modèles choisis: {router.summary()}")
+        if token_usage.calls:
+            logger.info(f"🧮 Jetons Claude: {token_usage.summary()}")
+        get_client().log_stats(logger)
     
     except Exception as e:
         logger.error(f"❌ Erreur lors de l'analyse: {e}")
         if logger.level == logging.DEBUG:
             logger.debug(f"Traceback: {traceback.format_exc()}")
         return 1
+    finally:
+        # L'index de l'archive (et son fichier temporaire) est libéré même en cas d'erreur
+        if content_source:
+            content_source.close()
     
     return 0
 
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+"""
+Revues en lot via l'API Message Batches d'Anthropic
+
+Pour les revues complètes planifiées, la latence importe peu : toutes les
+requêtes de revue sont soumises en un seul lot (facturé à tarif réduit et hors
+des limites par minute), le lot est interrogé avec un délai croissant, puis les
+résultats JSONL sont lus en flux et traités comme ceux du moteur direct.
+
+L'état de chaque lot soumis est enregistré dans .review_batches/<id>.json afin
+de pouvoir reprendre la collecte des résultats avec l'identifiant du lot.
+L'URL de l'API se règle via ANTHROPIC_BASE_URL, ce qui permet de viser un
+serveur local simulant les endpoints de lot.
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from claude_code_reviewer import FileSkipped, ReviewCrew, fetch_file_contents, get_setting
+from github_client import GITHUB_API_URL
+from review_engine import DEFAULT_MAX_TOKENS, DEFAULT_OUTPUT_MODE, DirectReviewEngine, token_usage
+from review_schema import ReviewResult
+
+ANTHROPIC_VERSION = "2023-06-01"
+
+# Répertoire où sont conservés les états des lots soumis
+DEFAULT_BATCH_DIR = ".review_batches"
+
+# Interrogation du lot: délai initial, facteur de croissance et plafond (secondes)
+DEFAULT_POLL_INTERVAL = 10
+DEFAULT_POLL_BACKOFF = 1.5
+DEFAULT_MAX_POLL_INTERVAL = 300
+DEFAULT_BATCH_TIMEOUT = 24 * 3600  # un lot expire côté Anthropic après 24 h
+
+
+class BatchClient:
+    """Client minimal des endpoints /v1/messages/batches"""
+
+    def __init__(self, api_key=None, base_url=None, timeout=60):
+        """
+        Paramètres:
+        - api_key: Clé API Anthropic (ANTHROPIC_API_KEY par défaut).
+        - base_url: URL de base de l'API (ANTHROPIC_BASE_URL par défaut).
+        - timeout: Timeout des requêtes HTTP, en secondes.
+        """
+        self.base_url = (base_url or get_setting("ANTHROPIC_BASE_URL")).rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({
+            'x-api-key': api_key or get_setting("ANTHROPIC_API_KEY"),
+            'anthropic-version': ANTHROPIC_VERSION,
+            'content-type': 'application/json',
+        })
+
+    def create(self, batch_requests):
+        """Soumet une liste de requêtes {custom_id, params} et renvoie le lot créé"""
+        response = self.session.post(
+            f"{self.base_url}/v1/messages/batches",
+            json={'requests': batch_requests},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def retrieve(self, batch_id):
+        """Renvoie l'état courant d'un lot"""
+        response = self.session.get(f"{self.base_url}/v1/messages/batches/{batch_id}", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def wait(self, batch_id, poll_interval=DEFAULT_POLL_INTERVAL, backoff=DEFAULT_POLL_BACKOFF,
+             max_interval=DEFAULT_MAX_POLL_INTERVAL, timeout=DEFAULT_BATCH_TIMEOUT, logger=None):
+        """
+        Interroge le lot jusqu'à la fin de son traitement, avec un délai croissant.
+
+        Lève TimeoutError si le lot n'est pas terminé après `timeout` secondes.
+        """
+        logger = logger or logging.getLogger('code_review')
+        deadline = time.time() + timeout
+        interval = poll_interval
+        while True:
+            batch = self.retrieve(batch_id)
+            if batch.get('processing_status') == 'ended':
+                return batch
+            counts = batch.get('request_counts', {})
+            logger.info(
+                f"⏳ Lot {batch_id}: {batch.get('processing_status')} - "
+                f"{counts.get('processing', '?')} en cours, {counts.get('succeeded', 0)} réussie(s), "
+                f"{counts.get('errored', 0)} en erreur; prochaine vérification dans {interval:.0f} s"
+            )
+            if time.time() + interval > deadline:
+                raise TimeoutError(f"Le lot {batch_id} n'est pas terminé après {timeout} secondes")
+            time.sleep(interval)
+            interval = min(max_interval, interval * backoff)
+
+    def results(self, batch):
+        """Lit en flux le fichier JSONL des résultats d'un lot terminé, ligne par ligne"""
+        results_url = batch.get('results_url') or f"{self.base_url}/v1/messages/batches/{batch['id']}/results"
+        with self.session.get(results_url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    yield json.loads(line)
+
+
+def _state_path(batch_id, batch_dir=DEFAULT_BATCH_DIR):
+    """Chemin du fichier d'état d'un lot"""
+    return os.path.join(batch_dir, f"{batch_id}.json")
+
+
+def save_batch_state(state, batch_dir=DEFAULT_BATCH_DIR):
+    """Enregistre l'état d'un lot soumis (correspondance custom_id -> fichier)"""
+    os.makedirs(batch_dir, exist_ok=True)
+    path = _state_path(state['batch_id'], batch_dir)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_batch_state(batch_id, batch_dir=DEFAULT_BATCH_DIR):
+    """Charge l'état d'un lot soumis précédemment"""
+    with open(_state_path(batch_id, batch_dir), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_batch_source(state, entry):
+    """
+    Contenu d'origine d'un fichier du lot, pour valider le correctif et reconstruire updated_code.
+
+    Le blob enregistré à la soumission est relu s'il est connu (la branche a pu avancer
+    depuis), sinon le fichier est relu à la référence du lot.
+    """
+    owner, repo = state['owner'], state['repo']
+    if entry.get('blob_sha'):
+        blob_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/blobs/{entry['blob_sha']}"
+        return fetch_file_contents(blob_url, owner, repo, max_lines=None)
+    return fetch_file_contents(entry['path'], owner, repo, ref=state.get('ref'), max_lines=None)
+
+
+def submit_batch_reviews(owner, repo, page_id, paths, blob_shas=None, cache=None, settings=None, ref=None,
+                         client=None, concurrency=4, batch_dir=DEFAULT_BATCH_DIR, repo_context=None,
+                         output_mode=DEFAULT_OUTPUT_MODE, router=None, logger=None):
+    """
+    Prépare et soumet en un seul lot les revues des fichiers absents du cache.
+
+    Paramètres:
+    - owner, repo, page_id, ref: Dépôt examiné et page Notion de destination.
+    - paths: Liste des chemins de fichiers à examiner.
+    - blob_shas: Dictionnaire chemin -> SHA du blob, pour le cache de revues.
+    - cache, settings: Cache de revues et paramètres de revue (comme ReviewCrew).
+    - client: BatchClient à utiliser (un nouveau par défaut).
+    - concurrency: Nombre de contenus récupérés simultanément sur GitHub.
+    - batch_dir: Répertoire des fichiers d'état des lots.
+    - repo_context: Contexte du dépôt, préfixe de prompt commun mis en cache.
+    - output_mode: Forme de la correction demandée ("patch" ou "full").
+    - router: ModelRouter choisissant le modèle et max_tokens de chaque requête (optionnel).
+
+    Renvoie (état du lot ou None si rien à soumettre, {known, errors} des fichiers hors lot).
+    """
+    logger = logger or logging.getLogger('code_review')
+    client = client or BatchClient()
+    blob_shas = blob_shas or {}
+
+    def prepare(item):
+        index, path = item
+        crew = ReviewCrew(
+            owner=owner, repo=repo, page_id=page_id, path=path, blob_sha=blob_shas.get(path),
+            cache=cache, settings=settings, engine="direct", ref=ref, output_mode=output_mode,
+            router=router
+        )
+        cache_key = crew.cache_key()
+        cached = crew.cached_result(cache_key)
+        if cached is not None:
+            return path, cached, None, None
+        engine = DirectReviewEngine(
+            owner=owner, repo=repo, page_id=page_id, path=path, ref=ref, repo_context=repo_context,
+            output_mode=output_mode, router=router
+        )
+        try:
+            content = engine.load_content()
+        except FileSkipped as e:
+            return path, engine.skipped_result(e), None, None
+        except Exception as e:
+            logger.error(f"❌ Impossible de récupérer le contenu de {path}: {e}")
+            return path, None, None, f"Erreur lors de l'analyse: {e}"
+        engine.apply_routing(content)
+        request = {'custom_id': f"file-{index}", 'params': engine.build_request(content)}
+        entry = {'path': path, 'blob_sha': blob_shas.get(path), 'cache_key': cache_key, 'max_tokens': engine.max_tokens}
+        return path, None, (request, entry), None
+
+    known = {}
+    errors = {}
+    batch_requests = []
+    files = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch") as executor:
+        for path, result, pending, error in executor.map(prepare, enumerate(paths)):
+            if error is not None:
+                errors[path] = error
+                continue
+            if pending is None:
+                known[path] = result.to_dict()
+                continue
+            request, entry = pending
+            batch_requests.append(request)
+            files[request['custom_id']] = entry
+
+    if not batch_requests:
+        logger.info("ℹ️ Aucune revue à soumettre en lot (tous les fichiers sont en cache ou ignorés)")
+        return None, {'known': known, 'errors': errors}
+
+    batch = client.create(batch_requests)
+    state = {
+        'batch_id': batch['id'],
+        'owner': owner,
+        'repo': repo,
+        'ref': ref,
+        'page_id': page_id,
+        'output_mode': output_mode,
+        'paths': list(paths),
+        'files': files,
+        'known': known,
+        'errors': errors,
+        'submitted_at': time.time(),
+    }
+    state_path = save_batch_state(state, batch_dir)
+    logger.info(f"📦 Lot {batch['id']} soumis avec {len(batch_requests)} requête(s) (état: {state_path})")
+    return state, {'known': known, 'errors': errors}
+
+
+def collect_batch_results(state, cache=None, client=None, logger=None, **wait_kwargs):
+    """
+    Attend la fin d'un lot puis traite ses résultats comme ceux du moteur direct.
+
+    Chaque revue réussie est écrite dans Notion et dans le cache de revues; les
+    fichiers servis depuis le cache ou ignorés à la soumission sont repris de l'état.
+    Le contenu d'origine est relu pour valider les correctifs; faute de quoi la revue
+    n'est pas mise en cache.
+    Renvoie une liste {file, result, time[, error]} dans l'ordre des chemins du lot,
+    au même format que run_reviews.
+    """
+    logger = logger or logging.getLogger('code_review')
+    client = client or BatchClient()
+    results = {path: ReviewResult.from_value(value, state['repo'], path)
+               for path, value in (state.get('known') or {}).items()}
+    errors = dict(state.get('errors') or {})
+
+    batch = client.wait(state['batch_id'], logger=logger, **wait_kwargs)
+    elapsed_time = time.time() - state.get('submitted_at', time.time())
+    for line in client.results(batch):
+        entry = state['files'].get(line.get('custom_id'))
+        if entry is None:
+            logger.warning(f"⚠️ Résultat inattendu dans le lot: {line.get('custom_id')}")
+            continue
+        path = entry['path']
+        outcome = line.get('result', {})
+        if outcome.get('type') != 'succeeded':
+            detail = outcome.get('error') or outcome.get('type')
+            logger.error(f"❌ Revue en lot échouée pour {path}: {detail}")
+            errors[path] = f"Erreur lors de l'analyse: {detail}"
+            continue
+        try:
+            source = load_batch_source(state, entry)
+        except Exception as e:
+            logger.warning(f"⚠️ Contenu d'origine de {path} indisponible ({e}), correctif non vérifié")
+            source = None
+        engine = DirectReviewEngine(
+            owner=state['owner'], repo=state['repo'], page_id=state.get('page_id'), path=path, ref=state.get('ref'),
+            output_mode=state.get('output_mode', DEFAULT_OUTPUT_MODE), source=source,
+            max_tokens=entry.get('max_tokens', DEFAULT_MAX_TOKENS)
+        )
+        message = outcome.get('message', {})
+        token_usage.record(message.get('usage'))
+        result = engine.finish_message(message.get('content', []), message.get('stop_reason'))
+        # Comme pour le moteur direct, une revue tronquée ou inexploitable n'est pas mise en cache
+        cacheable = source is not None and not (engine.failed or engine.truncated)
+        if cache is not None and entry.get('cache_key') and cacheable:
+            cache.put(entry['cache_key'], result.to_dict())
+        results[path] = result
+        logger.info(f"✅ Revue en lot reçue pour {path}")
+
+    review_results = []
+    for path in state['paths']:
+        if path in results:
+            review_results.append({"file": path, "result": results[path], "time": elapsed_time})
+        else:
+            review_results.append({
+                "file": path,
+                "result": errors.get(path, "Erreur lors de l'analyse: résultat absent du lot"),
+                "time": elapsed_time,
+                "error": True
+            })
+    return review_results
+
+
+def run_batch_reviews(owner, repo, page_id, paths, blob_shas=None, cache=None, settings=None, ref=None,
+                      client=None, concurrency=4, batch_dir=DEFAULT_BATCH_DIR, repo_context=None,
+                      output_mode=DEFAULT_OUTPUT_MODE, router=None, logger=None, **wait_kwargs):
+    """Soumet les revues en un lot, attend sa fin et renvoie les résultats (format run_reviews)"""
+    client = client or BatchClient()
+    state, outcome = submit_batch_reviews(
+        owner, repo, page_id, paths, blob_shas=blob_shas, cache=cache, settings=settings, ref=ref,
+        client=client, concurrency=concurrency, batch_dir=batch_dir, repo_context=repo_context,
+        output_mode=output_mode, router=router, logger=logger
+    )
+    if state is None:
+        # Rien n'a été soumis: résultats issus du cache, fichiers ignorés ou en erreur
+        return [
+            {"file": path, "result": outcome['errors'][path], "time": 0.0, "error": True}
+            if path in outcome['errors']
+            else {"file": path, "result": ReviewResult.from_value(outcome['known'][path], repo, path), "time": 0.0}
+            for path in paths
+        ]
+    return collect_batch_results(state, cache=cache, client=client, logger=logger, **wait_kwargs)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Mesure du temps de démarrage des scripts de revue
+
+Chaque mesure est faite dans un interpréteur neuf : import de claude_code_reviewer
+et de review_engine, puis `--help` des scripts principaux. Le script échoue si
+une mesure dépasse le seuil ou si l'import charge une dépendance lourde (CrewAI,
+langchain, Anthropic, Notion, dotenv), ce qui signalerait le retour d'un import
+ou d'un client créé au chargement du module.
+
+Exemple:
+    python bench_import_time.py --runs 5 --max-seconds 1.0
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Dépendances qui ne doivent être importées qu'au premier usage
+HEAVY_MODULES = ("crewai", "langchain", "langchain_core", "anthropic", "notion_client", "dotenv")
+
+# Code exécuté dans l'interpréteur neuf: durée de l'import et dépendances lourdes chargées
+IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+# Scripts dont l'analyse des arguments est mesurée
+HELP_SCRIPTS = ("pr_review_enhanced.py", "auto_review_enhanced.py", "review_service.py")
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure_import(module, runs):
+    """Durées d'import d'un module (une par interpréteur neuf) et dépendances lourdes chargées"""
+    durations = []
+    heavy = set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        durations.append(result["seconds"])
+        heavy.update(result["heavy"])
+    return durations, sorted(heavy)
+
+
+def measure_help(script, runs):
+    """Durées totales (démarrage de l'interpréteur compris) de `script --help`"""
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script, "--help"], cwd=ROOT, check=True, capture_output=True)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def parse_args():
+    """Parse les arguments de ligne de commande"""
+    parser = argparse.ArgumentParser(description="Mesure du temps d'import et de démarrage des scripts de revue")
+    parser.add_argument("--runs", type=int, default=5, help="Nombre de mesures par cible (défaut: 5)")
+    parser.add_argument("--max-seconds", type=float, default=1.0,
+                        help="Durée médiane maximale acceptée par cible, en secondes (défaut: 1.0)")
+    return parser.parse_args()
+
+
+def main():
+    """Fonction principale"""
+    args = parse_args()
+    failures = []
+
+    print(f"⏱️ Temps de démarrage (médiane sur {args.runs} exécution(s), seuil: {args.max_seconds:.2f} s)")
+    for module in ("claude_code_reviewer", "review_engine"):
+        durations, heavy = measure_import(module, args.runs)
+        median = statistics.median(durations)
+        print(f"   import {module}: {median * 1000:.0f} ms" + (f" (dépendances lourdes: {', '.join(heavy)})" if heavy else ""))
+        if median > args.max_seconds:
+            failures.append(f"import {module} trop lent ({median:.2f} s)")
+        if heavy:
+            failures.append(f"import {module} charge {', '.join(heavy)}")
+
+    for script in HELP_SCRIPTS:
+        median = statistics.median(measure_help(script, args.runs))
+        print(f"   {script} --help: {median * 1000:.0f} ms")
+        if median > args.max_seconds:
+            failures.append(f"{script} --help trop lent ({median:.2f} s)")
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        return 1
+    print("✅ Aucune régression du temps de démarrage")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
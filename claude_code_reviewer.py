@@ -1,51 +1,140 @@
 #!/usr/bin/env python
 """
 Agent de revue de code autonome utilisant CrewAI et Claude API
+
+L'import du module est sans effet de bord: le fichier .env, les clients
+Anthropic et Notion ainsi que CrewAI et langchain ne sont chargés qu'au premier
+usage (get_setting, get_anthropic_client, get_notion_client, moteur crew).
+Les anciens noms de module (ANTHROPIC_API_KEY, anthropic_client, notion...)
+restent disponibles et sont résolus à la demande.
 """
 import os
-import ast
+import atexit
 import base64
+import hashlib
 import json
+import threading
 import requests
-from dotenv import load_dotenv
 from textwrap import dedent
-from langchain.tools import tool
-from crewai import Agent, Task, Crew, Process
-from anthropic import Anthropic
-
-# Chargement des variables d'environnement
-load_dotenv()
+from code_chunker import DEFAULT_CHUNK_LINES
+from github_client import get_client
+from repo_tree import fetch_repo_tree, render_tree_text
+from notion_sink import NotionWriter, heading_block, text_blocks
+from path_resolver import PathResolver
+from review_schema import ReviewResult, parse_path_list
 
 # Configuration des clés API
-# Vous pouvez remplacer les clés ci-dessous par vos propres clés ou les mettre dans un fichier .env
-ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "sk-ant-api03-...")  # Remplacez par votre clé
-GITHUB_API_KEY = os.getenv("GITHUB_API_KEY", "ghp_CohWQti...")  # Remplacez par votre clé
-GITHUB_USERNAME = os.getenv("GITHUB_USERNAME", "robinixbox")  # Remplacez par votre nom d'utilisateur
+# Vous pouvez remplacer les valeurs par défaut ci-dessous par vos propres clés ou les mettre dans un fichier .env
+SETTING_DEFAULTS = {
+    "ANTHROPIC_API_KEY": "sk-ant-api03-...",  # Remplacez par votre clé
+    "GITHUB_API_KEY": "ghp_CohWQti...",  # Remplacez par votre clé
+    "GITHUB_USERNAME": "robinixbox",  # Remplacez par votre nom d'utilisateur
+    "NOTION_API_KEY": None,
+    "NOTION_PAGE_ID": None,
+    "ANTHROPIC_BASE_URL": "https://api.anthropic.com",
+}
+
+_env_loaded = False
+_anthropic_client = None
+_notion_client = None
+_clients_lock = threading.Lock()
+
+def load_environment():
+    """Charge le fichier .env une seule fois, au premier besoin d'une clé"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
 
-# Configuration d'Anthropic (Claude API)
-print("🔌 Initialisation de l'API Claude...")
-anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY)
+def get_setting(name):
+    """Valeur d'une clé de configuration (SETTING_DEFAULTS), lue dans l'environnement ou le fichier .env"""
+    load_environment()
+    return os.getenv(name, SETTING_DEFAULTS.get(name))
 
-# Variable globale pour stocker la structure du dépôt
+def get_anthropic_client():
+    """Client Anthropic (Claude API) partagé, créé au premier appel"""
+    global _anthropic_client
+    with _clients_lock:
+        if _anthropic_client is None:
+            from anthropic import Anthropic
+            print("🔌 Initialisation de l'API Claude...")
+            _anthropic_client = Anthropic(api_key=get_setting("ANTHROPIC_API_KEY"))
+        return _anthropic_client
+
+def get_notion_client():
+    """Client Notion partagé, créé au premier appel; None si NOTION_API_KEY n'est pas définie"""
+    global _notion_client
+    with _clients_lock:
+        if _notion_client is None and get_setting("NOTION_API_KEY"):
+            from notion_client import Client
+            _notion_client = Client(auth=get_setting("NOTION_API_KEY"))
+            print("✅ API Notion configurée")
+        return _notion_client
+
+def __getattr__(name):
+    """Anciens attributs du module (clés et clients), résolus au premier accès"""
+    if name in SETTING_DEFAULTS:
+        return get_setting(name)
+    if name == "anthropic_client":
+        return get_anthropic_client()
+    if name == "notion":
+        return get_notion_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Variables globales pour stocker la structure du dépôt (vue texte et entrées structurées)
 global_path = ""
+global_tree = []
+
+# Modèle et consignes de revue (ils font partie de la clé du cache de revues)
+REVIEW_MODEL = "claude-3-opus-20240229"
+REVIEW_TEMPERATURE = 0.2
+REVIEW_INSTRUCTIONS = dedent("""
+Examine le fichier donné et fournis des retours détaillés sur les points qui ne respectent pas 
+les standards de code de l'industrie.
+Prends le chemin du fichier et son contenu depuis l'agent contentAgent.
+Apporte des modifications au contenu du fichier pour l'améliorer et renvoie le contenu modifié 
+comme updated_code dans la réponse.
 
-# Configuration Notion (si la clé est présente)
-NOTION_API_KEY = os.getenv("NOTION_API_KEY")
-NOTION_PAGE_ID = os.getenv("NOTION_PAGE_ID")
-if NOTION_API_KEY:
-    from notion_client import Client
-    notion = Client(auth=NOTION_API_KEY)
-    print("✅ API Notion configurée")
+Renvoie les valeurs suivantes dans la réponse :
+project_name: {repo}
+file_path: chemin_du_fichier
+review: revue_ici
+updated_code: contenu mis à jour du fichier après modifications
+
+Renvoie la sortie qui suit la structure de tableau ci-dessous, chaque élément devant être 
+enveloppé dans une chaîne multilignes.
+Dans le cas d'updated_code, ajoute le code complet sous forme de chaîne multiligne.
+Renvoie uniquement le contenu du fichier qui a été modifié dans updated_code ; s'il y a 
+plusieurs modifications dans le contenu du fichier, alors envoie tout le contenu du fichier.
+
+Chaque tableau doit suivre ce format :
+[project_name, file_path, review, updated_code]
+
+Ne renvoie rien d'autre que le tableau au format ci-dessus.
+""")
+
+# Consigne ajoutée lorsque seuls des extraits numérotés du fichier sont fournis
+EXCERPT_NOTE = dedent("""
+Le contenu fourni ne contient que des extraits modifiés du fichier {path},
+chaque ligne étant précédée de son numéro dans le fichier. Concentre la revue sur ces
+lignes et cite les numéros de ligne d'origine. Dans updated_code, renvoie uniquement les
+extraits corrigés, sans les numéros de ligne.
+""")
+
+def review_prompt_hash():
+    """Empreinte des consignes de revue, invalidant le cache quand elles changent"""
+    return hashlib.sha256(f"{REVIEW_INSTRUCTIONS}|{REVIEW_TEMPERATURE}".encode('utf-8')).hexdigest()[:16]
 
 def create_notion_page(project_name):
     """
     Crée une page Notion pour stocker les résultats de la revue
     """
-    if not NOTION_API_KEY or not NOTION_PAGE_ID:
+    if not get_setting("NOTION_API_KEY") or not get_setting("NOTION_PAGE_ID"):
         print("⚠️ Configuration Notion incomplète. Les résultats ne seront pas exportés.")
         return None
         
-    parent = {"type": "page_id", "page_id": NOTION_PAGE_ID}
+    parent = {"type": "page_id", "page_id": get_setting("NOTION_PAGE_ID")}
     properties = {
         "title": {
             "type": "title",
@@ -54,206 +143,261 @@ def create_notion_page(project_name):
     }
     
     try:
-        create_page_response = notion.pages.create(parent=parent, properties=properties)
+        create_page_response = get_notion_client().pages.create(parent=parent, properties=properties)
         return create_page_response['id']
     except Exception as e:
         print(f"❌ Erreur lors de la création de la page Notion: {e}")
         return None
 
-def get_file_tree(owner, repo, path='', level=0):
+def get_file_tree(owner, repo, ref="HEAD"):
     """
-    Récupère et affiche la structure arborescente d'un dépôt GitHub, en ignorant 
-    certains dossiers spécifiques.
+    Récupère la structure arborescente d'un dépôt GitHub en un seul appel à l'API
+    Git Trees, en ignorant certains dossiers spécifiques dans la vue texte.
     
     Paramètres:
     - owner: Le nom d'utilisateur du propriétaire du dépôt.
     - repo: Le nom du dépôt.
-    - path: Le chemin à récupérer. Laisser vide pour récupérer le répertoire racine.
-    - level: La profondeur actuelle dans la structure arborescente.
-    """
-    # Répertoires à ignorer
-    ignore_dirs = {'public', 'images', 'media', 'assets', 'node_modules', '.git'}
-    global global_path
+    - ref: La branche, le tag ou le SHA à parcourir (HEAD par défaut).
     
-    api_url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
-    # Ajout de l'en-tête Authorization avec le token
-    headers = {'Authorization': f'token {GITHUB_API_KEY}'}
+    Renvoie la liste des entrées {path, type, size, sha} (ou None en cas d'erreur)
+    et met à jour global_path avec la vue texte indentée.
+    """
+    global global_path, global_tree
     
     try:
-        # Effectue la requête
-        response = requests.get(api_url, headers=headers)
-        if response.status_code != 200:
-            print(f"❌ Erreur HTTP {response.status_code}: {response.reason}")
-            print(f"URL: {api_url}")
-            return
-            
-        items = response.json()
-        
-        if isinstance(items, list):
-            for item in items:
-                # Ignorer les répertoires spécifiés
-                if item['name'] in ignore_dirs:
-                    continue
-                
-                global_path += f"{' ' * (level * 2)}- {item['name']}\n"
-                if item['type'] == 'dir':
-                    get_file_tree(owner, repo, item['path'], level + 1)
+        global_tree = fetch_repo_tree(owner, repo, get_setting("GITHUB_API_KEY"), ref=ref)
+        global_path = render_tree_text(global_tree)
+        return global_tree
+    except requests.exceptions.HTTPError as e:
+        print(f"❌ Erreur HTTP {e.response.status_code}: {e.response.reason}")
+        print(f"URL: {e.request.url}")
     except Exception as e:
         print(f"❌ Erreur lors de la récupération de la structure du dépôt: {e}")
+    return None
+
+def review_blocks(output, include_review=True):
+    """
+    Blocs Notion du résultat d'une revue [project_name, file_path, review, updated_code],
+    avec ses constats localisés s'il s'agit d'un ReviewResult.
+    
+    Les textes et le code longs sont découpés selon les limites de l'API Notion.
+    include_review=False omet la revue, déjà écrite par une destination partielle.
+    """
+    blocks = [heading_block("🚀 Nom du fichier")]
+    blocks += text_blocks("paragraph", output[1])
+    if include_review:
+        blocks.append(heading_block("📝 Revue"))
+        blocks += text_blocks("paragraph", output[2])
+    findings = getattr(output, 'findings', None)
+    if findings:
+        blocks.append(heading_block("🔎 Constats"))
+        for finding in findings:
+            blocks += text_blocks("bulleted_list_item", output.describe_finding(finding))
+    # En mode correctif, le fichier modifié n'est reconstruit qu'ici; à défaut le diff est affiché
+    updated_code = output.updated_code if isinstance(output, ReviewResult) else output[3]
+    language = "python"  # À adapter en fonction du type de fichier
+    if not updated_code and getattr(output, 'patch', None):
+        updated_code, language = output.patch, "diff"
+    blocks.append(heading_block("💡 Code amélioré"))
+    blocks += text_blocks("code", updated_code, caption=[], language=language)
+    return blocks
+
+_notion_writer = None
+_notion_writer_lock = threading.Lock()
+
+def get_notion_writer():
+    """Écrivain Notion d'arrière-plan partagé, créé au premier usage et vidé à la sortie du processus"""
+    global _notion_writer
+    with _notion_writer_lock:
+        if _notion_writer is None:
+            _notion_writer = NotionWriter(get_notion_client())
+            atexit.register(_notion_writer.close)
+        return _notion_writer
+
+def close_notion_writer():
+    """Attend la fin des écritures Notion en file et renvoie leur résumé (None si rien n'a été exporté)"""
+    if _notion_writer is None:
+        return None
+    _notion_writer.close()
+    return _notion_writer.summary()
+
+def flush_notion_writer():
+    """Attend la fin des écritures Notion en file sans arrêter l'écrivain (processus de longue durée)"""
+    if _notion_writer is None:
+        return None
+    _notion_writer.flush()
+    return _notion_writer.summary()
+
+def append_review_to_notion(output, page_id, include_review=True):
+    """
+    Met en file le résultat d'une revue pour l'ajouter à une page Notion.
+    
+    L'écriture a lieu en arrière-plan (notion_sink.NotionWriter): la revue n'attend pas Notion.
+    include_review=False n'ajoute que les constats et le code (revue déjà écrite en amont).
+    """
+    if not get_setting("NOTION_API_KEY") or not page_id:
+        return "Notion n'est pas configuré. Les résultats ne seront pas exportés."
+    
+    try:
+        blocks = review_blocks(output, include_review=include_review)
+    except Exception as e:
+        return f"Erreur lors de l'ajout à Notion: {e}"
+    get_notion_writer().submit(page_id, blocks, label=str(output[1]))
+    return f"📤 Revue de {output[1]} mise en file pour Notion ({len(blocks)} blocs)"
+
+class FileSkipped(Exception):
+    """Fichier ignoré car trop volumineux pour être examiné"""
+
+# Limites au-delà desquelles un fichier n'est pas soumis à la revue
+MAX_FILE_BYTES = 1000000  # 1MB en octets
+MAX_FILE_LINES = 1000
+# Taille maximale d'un fichier examiné par morceaux (lecture brute au-delà de 1 Mo)
+MAX_CHUNKED_FILE_BYTES = 10000000
+
+# Sources de contenu enregistrées (ex: TarballSource), par (owner, repo, ref)
+_content_sources = {}
+
+def register_content_source(owner, repo, ref, source):
+    """
+    Enregistre une source de contenu consultée par fetch_file_contents avant l'API GitHub.
+    
+    La source doit fournir get(path) -> bytes ou None; `source=None` retire l'enregistrement.
+    """
+    if source is None:
+        _content_sources.pop((owner, repo, ref), None)
+    else:
+        _content_sources[(owner, repo, ref)] = source
+
+def _check_size(size, max_bytes):
+    """Lève FileSkipped si le fichier dépasse la taille maximale"""
+    if max_bytes is not None and size > max_bytes:
+        raise FileSkipped(f"Taille du fichier supérieure à {max_bytes / 1000000:g} Mo.")
+
+def _check_lines(content_str, max_lines):
+    """Lève FileSkipped si le fichier dépasse le nombre maximal de lignes"""
+    if max_lines is not None and len(content_str.split('\n')) > max_lines:
+        raise FileSkipped(f"Le fichier contient plus de {max_lines} lignes.")
+
+def fetch_file_contents(path, owner, repo, ref=None, max_bytes=MAX_FILE_BYTES, max_lines=MAX_FILE_LINES):
+    """
+    Récupère le contenu texte d'un fichier via l'API GitHub.
+    
+    Paramètres:
+    - path: Le chemin du fichier dans le dépôt (ou l'URL complète de l'API).
+    - owner: Le nom d'utilisateur du propriétaire du dépôt.
+    - repo: Le nom du dépôt.
+    - ref: La branche, le tag ou le SHA à lire (branche par défaut si None).
+    - max_bytes, max_lines: Limites de taille (None pour ne pas limiter).
+    
+    Le fichier est lu dans la source de contenu enregistrée pour ce dépôt et cette
+    référence s'il y figure, sinon via l'API contents.
+    
+    Lève FileSkipped si le fichier dépasse les limites et requests.HTTPError en cas d'erreur HTTP.
+    """
+    source = _content_sources.get((owner, repo, ref))
+    data = source.get(path) if source is not None and not path.startswith("https://") else None
+    if data is not None:
+        _check_size(len(data), max_bytes)
+        content_str = data.decode('utf-8')
+        _check_lines(content_str, max_lines)
+        return content_str
+    
+    if path.startswith("https://"):
+        api_url = path
+    else:
+        api_url = f"/repos/{owner}/{repo}/contents/{path}"
+    
+    params = {'ref': ref} if ref else None
+    response = get_client(get_setting("GITHUB_API_KEY")).get(api_url, params=params)
+    response.raise_for_status()
+    file_content = response.json()
+    
+    # Vérifie la taille du fichier
+    _check_size(file_content['size'], max_bytes)
+    
+    if file_content.get('encoding') == 'none' or (file_content['size'] and not file_content.get('content')):
+        # Au-delà de 1 Mo, l'API ne renvoie pas le contenu: lecture brute du fichier
+        raw = get_client(get_setting("GITHUB_API_KEY")).get(
+            api_url, params=params, headers={'Accept': 'application/vnd.github.raw'}
+        )
+        raw.raise_for_status()
+        content_str = raw.content.decode('utf-8')
+    else:
+        # Le contenu est encodé en Base64, donc on le décode puis on le convertit en chaîne
+        content_str = base64.b64decode(file_content['content']).decode('utf-8')
+    
+    # Vérifie le nombre de lignes dans le fichier
+    _check_lines(content_str, max_lines)
+    
+    return content_str
+
+def _add_to_notion(output, page_id):
+    """
+    Utilisé pour ajouter des données à un document Notion.
+    """
+    return append_review_to_notion(output, page_id)
+
+def _get_file_contents(path, owner, repo):
+    """
+    Utilisé pour obtenir le contenu d'un fichier à partir du chemin, du propriétaire 
+    du dépôt et du nom du dépôt.
+    L'URL ressemblera à https://api.github.com/repos/{owner}/{repo}/{path}
+    """
+    try:
+        return fetch_file_contents(path, owner, repo)
+    except FileSkipped as e:
+        return f"Ignoré: {e}"
+    except requests.exceptions.HTTPError as e:
+        # Gère les erreurs (par exemple, fichier non trouvé, accès refusé)
+        return f"Erreur: {e.response.status_code} - {e.response.reason}"
+    except Exception as e:
+        return f"Erreur lors de la récupération du contenu: {e}"
+
+_tools = {}
+
+def _make_tool(name, function):
+    """Outil langchain créé au premier usage (langchain n'est importé qu'à ce moment)"""
+    with _clients_lock:
+        if name not in _tools:
+            from langchain.tools import tool
+            _tools[name] = tool(name)(function)
+        return _tools[name]
 
 class Tools:
-    """Outils personnalisés pour les agents"""
+    """Outils personnalisés pour les agents, créés au premier usage"""
     
-    @tool("Add data to notion")
-    def add_to_notion(output, page_id):
-        """
-        Utilisé pour ajouter des données à un document Notion.
-        """
-        if not NOTION_API_KEY or not page_id:
-            return "Notion n'est pas configuré. Les résultats ne seront pas exportés."
-        
-        try:
-            children = [
-                {
-                    "object": "block",
-                    "type": "heading_2",
-                    "heading_2": {
-                        "rich_text": [{"type": "text", "text": {"content": "🚀 Nom du fichier"}}]
-                    }
-                },
-                {
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{"type": "text", "text": {"content": output[1]}}]
-                    }
-                },
-                {
-                    "object": "block",
-                    "type": "heading_2",
-                    "heading_2": {
-                        "rich_text": [{"type": "text", "text": {"content": "📝 Revue"}}]
-                    }
-                },
-                {
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{"type": "text", "text": {"content": output[2]}}]
-                    }
-                },
-                {
-                    "object": "block",
-                    "type": "heading_2",
-                    "heading_2": {
-                        "rich_text": [{"type": "text", "text": {"content": "💡 Code amélioré"}}]
-                    }
-                },
-                {
-                    "object": "block",
-                    "type": "code",
-                    "code": {
-                        "caption": [],
-                        "rich_text": [{
-                            "type": "text",
-                            "text": {
-                                "content": output[3]
-                            }
-                        }],
-                        "language": "python"  # À adapter en fonction du type de fichier
-                    }
-                },
-            ]
-            
-            add_data_response = notion.blocks.children.append(
-                block_id=page_id, children=children
-            )
-            return "Données ajoutées avec succès à Notion"
-        except Exception as e:
-            return f"Erreur lors de l'ajout à Notion: {e}"
+    def add_to_notion():
+        """Outil d'ajout des résultats à un document Notion"""
+        return _make_tool("Add data to notion", _add_to_notion)
 
-    @tool("get file contents from given file path")
-    def get_file_contents(path, owner, repo):
-        """
-        Utilisé pour obtenir le contenu d'un fichier à partir du chemin, du propriétaire 
-        du dépôt et du nom du dépôt.
-        L'URL ressemblera à https://api.github.com/repos/{owner}/{repo}/{path}
-        """
-        if path.startswith("https://"):
-            api_url = path
-        else:
-            api_url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
-        
-        # Ajout de l'en-tête Authorization avec le token
-        headers = {'Authorization': f'token {GITHUB_API_KEY}', 'X-GitHub-Api-Version': '2022-11-28'}
-        
-        try:
-            # Effectue la requête
-            response = requests.get(api_url, headers=headers)
-            
-            # Vérifie si la requête a réussi
-            if response.status_code == 200:
-                file_content = response.json()
-                
-                # Vérifie la taille du fichier
-                if file_content['size'] > 1000000:  # 1MB en octets
-                    return "Ignoré: Taille du fichier supérieure à 1 Mo."
-                
-                # Le contenu est encodé en Base64, donc on le décode
-                content_decoded = base64.b64decode(file_content['content'])
-                
-                # Convertit les octets en chaîne de caractères
-                content_str = content_decoded.decode('utf-8')
-                
-                # Vérifie le nombre de lignes dans le fichier
-                if len(content_str.split('\n')) > 1000:
-                    return "Ignoré: Le fichier contient plus de 1000 lignes."
-                    
-                return content_str
-            else:
-                # Gère les erreurs (par exemple, fichier non trouvé, accès refusé)
-                return f"Erreur: {response.status_code} - {response.reason}"
-        except Exception as e:
-            return f"Erreur lors de la récupération du contenu: {e}"
+    def get_file_contents():
+        """Outil de lecture du contenu d'un fichier du dépôt"""
+        return _make_tool("get file contents from given file path", _get_file_contents)
 
 class Tasks:
     """Définition des tâches pour les agents"""
     
-    def review_task(agent, repo, context):
-        """Tâche de revue de code"""
+    def review_task(agent, repo, context, path=None, content=None):
+        """
+        Tâche de revue de code
+        
+        Si `content` est fourni (par exemple les extraits modifiés d'une PR), il est
+        inclus directement dans la description au lieu d'être demandé à contentAgent.
+        """
+        description = REVIEW_INSTRUCTIONS.format(repo=repo)
+        if content is not None:
+            description += "\n" + EXCERPT_NOTE.format(path=path) + "\nVoici le contenu à examiner :\n" + content
+        from crewai import Task
         return Task(
             agent=agent,
-            description=dedent(
-                f"""
-                Examine le fichier donné et fournis des retours détaillés sur les points qui ne respectent pas 
-                les standards de code de l'industrie.
-                Prends le chemin du fichier et son contenu depuis l'agent contentAgent.
-                Apporte des modifications au contenu du fichier pour l'améliorer et renvoie le contenu modifié 
-                comme updated_code dans la réponse.
-                
-                Renvoie les valeurs suivantes dans la réponse :
-                project_name: {repo}
-                file_path: chemin_du_fichier
-                review: revue_ici
-                updated_code: contenu mis à jour du fichier après modifications
-                
-                Renvoie la sortie qui suit la structure de tableau ci-dessous, chaque élément devant être 
-                enveloppé dans une chaîne multilignes.
-                Dans le cas d'updated_code, ajoute le code complet sous forme de chaîne multiligne.
-                Renvoie uniquement le contenu du fichier qui a été modifié dans updated_code ; s'il y a 
-                plusieurs modifications dans le contenu du fichier, alors envoie tout le contenu du fichier.
-                
-                Chaque tableau doit suivre ce format :
-                [project_name, file_path, review, updated_code]
-                
-                Ne renvoie rien d'autre que le tableau au format ci-dessus.
-                """),
+            description=description,
             context=context,
             expected_output="Un tableau de 4 éléments au format donné dans la description"
         )
         
     def notion_task(agent, context, page_id):
         """Tâche d'ajout à Notion"""
+        from crewai import Task
         return Task(
             agent=agent,
             description=dedent(f"""
@@ -268,6 +412,7 @@ class Tasks:
         
     def get_file_path_task(agent, filetree, user_input):
         """Tâche de récupération des chemins de fichiers"""
+        from crewai import Task
         return Task(
             agent=agent,
             description=dedent(f"""
@@ -312,6 +457,7 @@ class Tasks:
         
     def get_file_content_task(agent, owner, repo, path):
         """Tâche de récupération du contenu d'un fichier"""
+        from crewai import Task
         return Task(
             agent=agent,
             description=dedent(f"""
@@ -335,8 +481,9 @@ class Tasks:
 class Agents:
     """Définition des agents"""
     
-    def review_agent():
+    def review_agent(model=REVIEW_MODEL):
         """Agent de revue de code"""
+        from crewai import Agent
         return Agent(
             role='Senior software developer',
             goal="Effectuer des revues de code sur un fichier donné pour vérifier s'il correspond aux standards de code de l'industrie",
@@ -345,24 +492,25 @@ class Agents:
             verbose=True,
             # Utilisation de Claude API
             llm_config={
-                "provider": anthropic_client,
-                "model": "claude-3-opus-20240229",
-                "temperature": 0.2
+                "provider": get_anthropic_client(),
+                "model": model,
+                "temperature": REVIEW_TEMPERATURE
             }
         )
         
     def notion_agent():
         """Agent Notion"""
+        from crewai import Agent
         return Agent(
             role="Expert API Notion et rédacteur de contenu",
             goal="Ajouter les données du tableau donné dans le document Notion en utilisant l'outil addToNotion",
             backstory="Tu es un expert de l'API Notion qui peut utiliser l'outil addToNotion et ajouter les données fournies dans un document Notion",
             allow_delegation=True,
-            tools=[Tools.add_to_notion],
+            tools=[Tools.add_to_notion()],
             verbose=True,
             # Utilisation de Claude API
             llm_config={
-                "provider": anthropic_client,
+                "provider": get_anthropic_client(),
                 "model": "claude-3-haiku-20240307",
                 "temperature": 0.1
             }
@@ -370,6 +518,7 @@ class Agents:
         
     def path_agent():
         """Agent de chemin de fichier"""
+        from crewai import Agent
         return Agent(
             role="Extracteur de chemin de fichier",
             goal="Obtenir la structure arborescente du dossier et renvoyer les chemins complets du fichier donné ou des fichiers du dossier donné au format tableau",
@@ -378,7 +527,7 @@ class Agents:
             verbose=True,
             # Utilisation de Claude API
             llm_config={
-                "provider": anthropic_client,
+                "provider": get_anthropic_client(),
                 "model": "claude-3-haiku-20240307",
                 "temperature": 0.1
             }
@@ -386,54 +535,182 @@ class Agents:
         
     def content_agent():
         """Agent de contenu"""
+        from crewai import Agent
         return Agent(
             role="Expert API GitHub",
             goal="Obtenir le contenu du fichier donné en utilisant l'API GitHub",
             backstory="Tu es un expert de l'API GitHub qui a extrait de nombreux contenus de fichiers en utilisant l'API de GitHub",
             verbose=True,
             allow_delegation=False,
-            tools=[Tools.get_file_contents],
+            tools=[Tools.get_file_contents()],
             # Utilisation de Claude API
             llm_config={
-                "provider": anthropic_client,
+                "provider": get_anthropic_client(),
                 "model": "claude-3-haiku-20240307",
                 "temperature": 0.1
             }
         )
 
+# Moteurs de revue disponibles: équipe CrewAI complète ou appel direct à Claude
+ENGINES = ("crew", "direct")
+DEFAULT_ENGINE = "crew"
+
 class ReviewCrew:
     """Équipe de revue de code"""
     
-    def __init__(self, owner, repo, page_id, path):
-        """Initialisation de l'équipe"""
+    def __init__(self, owner, repo, page_id, path, blob_sha=None, cache=None, settings=None, content=None,
+                 engine=DEFAULT_ENGINE, ref=None, repo_context=None, output_budget=None, sinks=None,
+                 output_mode=None, source=None, chunk_lines=None, router=None, diff=None, usage=None):
+        """
+        Initialisation de l'équipe
+        
+        Si un cache de revues et le SHA du blob sont fournis, un fichier inchangé
+        est servi depuis le cache sans exécuter l'équipe. Si `content` est fourni,
+        il est examiné directement sans passer par l'agent de contenu.
+        
+        `engine` vaut "crew" (équipe CrewAI à trois agents) ou "direct" (un seul
+        appel à Claude, voir review_engine); `ref`, `repo_context` (préfixe de prompt
+        mis en cache, commun aux revues du dépôt), `output_budget`, `sinks`
+        (destinations de la revue partielle en flux), `output_mode` ("patch" par défaut
+        ou "full") et `source` (fichier complet quand `content` est un extrait, pour
+        appliquer les correctifs) et `chunk_lines` (taille des morceaux d'un fichier trop
+        volumineux, 0 pour l'ignorer) ne sont utilisés que par le moteur direct.
+        `router` (ModelRouter) choisit le modèle d'après le contenu et `diff` (diff
+        unifié des modifications examinées); avec l'équipe CrewAI, le routage n'a
+        lieu que si `content` est fourni. `usage` (review_engine.TokenUsage) compte les
+        jetons du moteur direct pour cette revue (cumul du processus par défaut).
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Moteur de revue inconnu: {engine} (attendu: {', '.join(ENGINES)})")
         self.owner = owner
         self.repo = repo
         self.page_id = page_id
         self.path = path
+        self.blob_sha = blob_sha
+        self.cache = cache
+        self.settings = settings or {}
+        self.content = content
+        self.engine = engine
+        self.ref = ref
+        self.repo_context = repo_context
+        self.output_budget = output_budget
+        self.sinks = sinks
+        self.output_mode = output_mode
+        self.source = source
+        self.chunk_lines = chunk_lines
+        self.router = router
+        self.diff = diff
+        self.usage = usage
+        
+    def cache_key(self):
+        """Clé du cache de revues pour ce fichier, ou None si le cache est inutilisable"""
+        if self.cache is None or not self.blob_sha:
+            return None
+        settings = dict(self.settings, engine=self.engine)
+        if self.router is not None:
+            # Le modèle retenu dépend des règles de routage
+            settings['routing'] = self.router.fingerprint()
+        if self.content is not None:
+            # Un extrait dépend aussi des plages retenues, pas seulement du blob
+            settings['content'] = hashlib.sha256(self.content.encode('utf-8')).hexdigest()
+        if self.engine == "direct":
+            from review_engine import DEFAULT_OUTPUT_MODE, engine_prompt_hash
+            prompt_hash = engine_prompt_hash(self.output_mode or DEFAULT_OUTPUT_MODE)
+            if self.chunk_lines not in (None, DEFAULT_CHUNK_LINES):
+                # Le découpage des fichiers volumineux change la revue obtenue
+                settings['chunk_lines'] = self.chunk_lines
+        else:
+            prompt_hash = review_prompt_hash()
+        return self.cache.make_key(self.blob_sha, prompt_hash, REVIEW_MODEL, settings)
+        
+    def cached_result(self, cache_key=None):
+        """Renvoie la revue en cache pour ce fichier (exportée vers Notion), ou None"""
+        cache_key = cache_key or self.cache_key()
+        if not cache_key:
+            return None
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            cached = ReviewResult.from_value(cached, self.repo, self.path)
+            cached.source = self.source
+            print(f"♻️ Revue de {self.path} servie depuis le cache")
+            if get_setting("NOTION_API_KEY") and self.page_id:
+                self._export_cached(cached)
+        return cached
         
     def run(self):
         """Exécution de l'équipe"""
-        # Agents
-        review_agent = Agents.review_agent()
-        content_agent = Agents.content_agent()
-        notion_agent = Agents.notion_agent() if NOTION_API_KEY else None
+        cache_key = self.cache_key()
+        cached = self.cached_result(cache_key)
+        if cached is not None:
+            return cached
         
-        # Tâches
-        content_task = Tasks.get_file_content_task(
-            agent=content_agent, 
-            owner=self.owner, 
-            repo=self.repo, 
-            path=self.path
-        )
+        if self.engine == "direct":
+            from review_engine import DEFAULT_OUTPUT_MODE, DirectReviewEngine
+            engine = DirectReviewEngine(
+                owner=self.owner, repo=self.repo, page_id=self.page_id, path=self.path,
+                ref=self.ref, content=self.content, repo_context=self.repo_context,
+                output_budget=self.output_budget, sinks=self.sinks,
+                output_mode=self.output_mode or DEFAULT_OUTPUT_MODE, source=self.source,
+                chunk_lines=DEFAULT_CHUNK_LINES if self.chunk_lines is None else self.chunk_lines,
+                router=self.router, diff=self.diff, usage=self.usage
+            )
+            result = engine.run()
+            if engine.truncated or engine.failed:
+                # Une revue tronquée ou inexploitable n'est pas mise en cache pour être refaite au prochain passage
+                return result
+        else:
+            # La sortie texte de l'équipe est validée et normalisée comme celle du moteur direct
+            result = ReviewResult.from_value(self._kickoff(), self.repo, self.path)
         
-        review_task = Tasks.review_task(
-            agent=review_agent, 
-            repo=self.repo, 
-            context=[content_task]
-        )
+        if cache_key:
+            self.cache.put(cache_key, result.to_dict())
+        return result
         
-        agents = [content_agent, review_agent]
-        tasks = [content_task, review_task]
+    def _export_cached(self, cached):
+        """Exporte vers Notion un résultat servi depuis le cache (la tâche Notion n'a pas tourné)"""
+        try:
+            print(append_review_to_notion(cached, self.page_id))
+        except Exception as e:
+            print(f"⚠️ Impossible d'exporter vers Notion le résultat en cache de {self.path}: {e}")
+        
+    def _kickoff(self):
+        """Construction et exécution de l'équipe CrewAI"""
+        # Agents
+        model = REVIEW_MODEL
+        if self.router is not None and self.content is not None:
+            model = self.router.route(self.path, self.source or self.content, diff=self.diff)['model']
+        review_agent = Agents.review_agent(model)
+        notion_agent = Agents.notion_agent() if get_setting("NOTION_API_KEY") else None
+        
+        # Tâches
+        if self.content is not None:
+            # Contenu déjà disponible: l'agent de contenu est inutile
+            review_task = Tasks.review_task(
+                agent=review_agent, 
+                repo=self.repo, 
+                context=[],
+                path=self.path,
+                content=self.content
+            )
+            agents = [review_agent]
+            tasks = [review_task]
+        else:
+            content_agent = Agents.content_agent()
+            content_task = Tasks.get_file_content_task(
+                agent=content_agent, 
+                owner=self.owner, 
+                repo=self.repo, 
+                path=self.path
+            )
+            
+            review_task = Tasks.review_task(
+                agent=review_agent, 
+                repo=self.repo, 
+                context=[content_task]
+            )
+            
+            agents = [content_agent, review_agent]
+            tasks = [content_task, review_task]
         
         # Ajouter la tâche Notion si configurée
         if notion_agent and self.page_id:
@@ -446,6 +723,7 @@ class ReviewCrew:
             agents.append(notion_agent)
         
         # Équipe
+        from crewai import Crew, Process
         crew = Crew(
             agents=agents,
             tasks=tasks,
@@ -457,6 +735,29 @@ class ReviewCrew:
         result = crew.kickoff()
         return result
 
+def resolve_target_paths(tree, user_input):
+    """
+    Résout l'entrée utilisateur en chemins de fichiers à partir de l'arborescence.
+    
+    La résolution est faite localement (chemin exact, dossier, glob, nom de fichier);
+    l'agent de chemin n'est sollicité que si la requête reste ambiguë, et seulement
+    avec les candidats retenus lorsqu'il y en a.
+    """
+    resolver = PathResolver(tree)
+    paths, ambiguous = resolver.resolve(user_input)
+    if not ambiguous:
+        return paths
+    
+    print(f"⚠️ Entrée ambiguë '{user_input}', sollicitation de l'agent de chemin...")
+    candidates = set(paths)
+    filetree = render_tree_text([entry for entry in tree if entry['path'] in candidates]) if paths else render_tree_text(tree)
+    path_agent = Agents.path_agent()
+    path_task = Tasks.get_file_path_task(agent=path_agent, filetree=filetree, user_input=user_input)
+    paths_output = path_task.execute()
+    
+    # On ne garde que les chemins qui existent réellement dans le dépôt
+    return [path for path in parse_path_list(paths_output) if path in resolver.file_set]
+
 def main():
     """Fonction principale"""
     print("=" * 50)
@@ -464,11 +765,11 @@ def main():
     print("=" * 50)
     
     # Vérification des clés API
-    if not ANTHROPIC_API_KEY:
+    if not get_setting("ANTHROPIC_API_KEY"):
         print("❌ Clé API Anthropic (Claude) non trouvée. Veuillez configurer la variable d'environnement ANTHROPIC_API_KEY.")
         return
     
-    if not GITHUB_API_KEY:
+    if not get_setting("GITHUB_API_KEY"):
         print("❌ Clé API GitHub non trouvée. Veuillez configurer la variable d'environnement GITHUB_API_KEY.")
         return
     
@@ -488,8 +789,6 @@ def main():
     print(f"\n🔍 Analyse du dépôt {owner}/{repo}...")
     
     # Récupération de la structure arborescente du dépôt GitHub
-    global global_path
-    global_path = ""
     get_file_tree(owner=owner, repo=repo)
     
     if not global_path:
@@ -500,7 +799,7 @@ def main():
     
     # Création d'une page Notion si les clés sont configurées
     page_id = None
-    if NOTION_API_KEY and NOTION_PAGE_ID:
+    if get_setting("NOTION_API_KEY") and get_setting("NOTION_PAGE_ID"):
         try:
             page_id = create_notion_page(project_name=repo)
             if page_id:
@@ -508,15 +807,11 @@ def main():
         except Exception as e:
             print(f"⚠️ Erreur lors de la création de la page Notion: {e}")
     
-    # Récupération des chemins de fichiers à partir de l'entrée utilisateur
-    path_agent = Agents.path_agent()
-    path_task = Tasks.get_file_path_task(agent=path_agent, filetree=global_path, user_input=user_input)
-    
     print(f"\n🔍 Recherche des fichiers correspondant à '{user_input}'...")
-    paths_output = path_task.execute()
     
     try:
-        paths = ast.literal_eval(paths_output)
+        # Récupération des chemins de fichiers à partir de l'entrée utilisateur
+        paths = resolve_target_paths(global_tree, user_input)
         
         if not paths:
             print(f"❌ Aucun fichier trouvé correspondant à '{user_input}'")
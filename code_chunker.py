@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+"""
+Découpage des fichiers volumineux en morceaux syntaxiques pour la revue
+
+Les fichiers Python sont coupés entre les fonctions et les classes (module ast),
+les grandes classes entre leurs méthodes ; les autres langages sont coupés aux
+lignes où les accolades sont refermées ou, à défaut, avant les lignes non
+indentées. Chaque morceau est accompagné d'un en-tête commun (docstring du
+module, imports) et les lignes gardent leur numéro dans le fichier complet, ce
+qui permet de fusionner les constats avec des numéros de ligne globaux.
+"""
+import ast
+import re
+
+from diff_utils import build_excerpt, parse_patch
+
+# Nombre maximal de lignes par morceau (hors en-tête commun)
+DEFAULT_CHUNK_LINES = 400
+
+# L'en-tête commun est tronqué au-delà de ce nombre de lignes
+MAX_HEADER_LINES = 120
+
+# Lignes d'import ou de déclaration retenues dans l'en-tête des autres langages
+_GENERIC_HEADER_RE = re.compile(
+    r'^\s*(import\b|from\s+\S+\s+import\b|#include\b|#import\b|using\b|use\b|require\b|package\b|'
+    r'(const|let|var)\s+\S+\s*=\s*require\()'
+)
+
+# Chaînes et commentaires de fin de ligne, ignorés pour compter les accolades
+_STRINGS_RE = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|`(?:\\.|[^`\\])*`')
+_LINE_COMMENT_RE = re.compile(r'(//|#).*$')
+
+
+def _pack(cut_points, total, max_lines):
+    """
+    Regroupe les lignes 1..total en plages d'au plus max_lines lignes.
+
+    Chaque plage se termine sur un point de coupe autorisé quand c'est possible,
+    sinon elle est coupée arbitrarement (bloc unique plus long que max_lines).
+    """
+    cut_points = sorted(set(point for point in cut_points if 1 <= point < total)) + [total]
+    ranges = []
+    start = 1
+    while start <= total:
+        limit = start + max_lines - 1
+        candidates = [point for point in cut_points if start <= point <= limit]
+        end = candidates[-1] if candidates else min(limit, total)
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+def _python_layout(content, max_lines):
+    """
+    Analyse un fichier Python: renvoie (plages d'en-tête, points de coupe, en-têtes de classes).
+
+    Lève SyntaxError si le fichier n'est pas du Python valide.
+    """
+    tree = ast.parse(content)
+    header = []
+    cuts = []
+    classes = []
+
+    for index, node in enumerate(tree.body):
+        start = min([node.lineno] + [decorator.lineno for decorator in getattr(node, 'decorator_list', [])])
+        end = node.end_lineno
+        cuts.append(end)
+        is_docstring = (index == 0 and isinstance(node, ast.Expr)
+                        and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str))
+        if is_docstring or isinstance(node, (ast.Import, ast.ImportFrom)):
+            header.append((start, end))
+        if isinstance(node, ast.ClassDef) and end - start + 1 > max_lines and node.body:
+            # Grande classe: on peut couper entre ses membres, en rappelant la signature de la classe
+            body_start = node.body[0].lineno
+            classes.append({'start': start, 'end': end, 'signature': (start, max(start, body_start - 1))})
+            cuts.extend(member.end_lineno for member in node.body)
+    return header, cuts, classes
+
+
+def _strip_code(line):
+    """Retire les chaînes et le commentaire de fin d'une ligne pour compter les accolades"""
+    return _LINE_COMMENT_RE.sub('', _STRINGS_RE.sub('""', line))
+
+
+def _generic_layout(lines):
+    """Plages d'en-tête et points de coupe d'un fichier d'un autre langage"""
+    header = [(number, number) for number, line in enumerate(lines[:MAX_HEADER_LINES], 1)
+              if _GENERIC_HEADER_RE.match(line)]
+
+    code = [_strip_code(line) for line in lines]
+    cuts = []
+    if sum(line.count('{') for line in code) >= 2:
+        # Langage à accolades: coupe à la fin de chaque instruction de premier niveau
+        depth = 0
+        for number, line in enumerate(code, 1):
+            depth = max(0, depth + line.count('{') - line.count('}'))
+            if depth == 0 and line.strip():
+                cuts.append(number)
+    else:
+        # Langage à indentation: coupe avant chaque ligne non vide non indentée
+        for number, line in enumerate(lines[1:], 2):
+            if line.strip() and not line[0].isspace():
+                cuts.append(number - 1)
+    return header, cuts
+
+
+def chunk_file(path, content, max_lines=DEFAULT_CHUNK_LINES):
+    """
+    Découpe un fichier en morceaux syntaxiques.
+
+    Paramètres:
+    - path: Chemin du fichier (l'extension détermine l'analyse utilisée).
+    - content: Contenu complet du fichier.
+    - max_lines: Nombre maximal de lignes par morceau.
+
+    Renvoie (header, chunks) où header est la liste des plages de l'en-tête commun et
+    chunks une liste de {index, start, end, context} (context: plages rappelées en plus
+    de l'en-tête, comme la signature de la classe englobante).
+    """
+    lines = content.split('\n')
+    total = len(lines)
+    classes = []
+    if path.endswith('.py'):
+        try:
+            header, cuts, classes = _python_layout(content, max_lines)
+        except SyntaxError:
+            header, cuts = _generic_layout(lines)
+    else:
+        header, cuts = _generic_layout(lines)
+
+    # L'en-tête est borné pour ne pas dominer chaque morceau
+    bounded = []
+    budget = MAX_HEADER_LINES
+    for start, end in header:
+        if budget <= 0:
+            break
+        end = min(end, start + budget - 1)
+        bounded.append((start, end))
+        budget -= end - start + 1
+
+    chunks = []
+    for index, (start, end) in enumerate(_pack(cuts, total, max_lines)):
+        context = [cls['signature'] for cls in classes if cls['start'] < start <= cls['end']]
+        chunks.append({'index': index, 'start': start, 'end': end, 'context': context})
+    return bounded, chunks
+
+
+def render_chunk(content, header, chunk):
+    """Texte soumis pour un morceau: en-tête commun puis lignes du morceau, numérotées globalement"""
+    return build_excerpt(content, list(header) + list(chunk['context']) + [(chunk['start'], chunk['end'])], context=0)
+
+
+def remap_findings(findings, chunk, header):
+    """
+    Ramène les constats d'un morceau à des numéros de ligne globaux.
+
+    Le morceau est soumis avec ses numéros de ligne d'origine; un constat dont la
+    plage tombe hors du morceau et de son en-tête, mais y entre une fois décalée,
+    est considéré comme numéroté relativement au morceau et corrigé.
+    """
+    known = list(header) + list(chunk['context']) + [(chunk['start'], chunk['end'])]
+    offset = chunk['start'] - 1
+    remapped = []
+    for finding in findings:
+        finding = dict(finding)
+        start, end = finding.get('line_start'), finding.get('line_end')
+        if start is not None and offset:
+            inside = any(low <= start <= high for low, high in known)
+            shifted_end = (end or start) + offset
+            if not inside and chunk['start'] <= start + offset and shifted_end <= chunk['end']:
+                finding['line_start'], finding['line_end'] = start + offset, shifted_end
+        remapped.append(finding)
+    return remapped
+
+
+def _touches(hunk, ranges):
+    """Indique si les lignes d'origine d'un hunk recoupent l'une des plages"""
+    end = hunk['old_start'] + max(hunk['old_count'], 1) - 1
+    return any(hunk['old_start'] <= high and low <= end for low, high in ranges)
+
+
+def merge_patches(patches, header=None):
+    """
+    Fusionne les diffs unifiés de plusieurs morceaux en un seul, hunks triés par position.
+
+    L'en-tête commun est soumis avec chaque morceau: seuls les hunks d'en-tête du
+    premier diff qui en contient sont conservés, et les hunks identiques ne sont
+    gardés qu'une fois, pour que le diff fusionné reste applicable.
+    """
+    hunks = []
+    header_owner = None
+    for index, patch in enumerate(patches):
+        for hunk in parse_patch(patch.rstrip('\n'), lenient=True):
+            if header and _touches(hunk, header):
+                if header_owner is None:
+                    header_owner = index
+                elif header_owner != index:
+                    continue
+            if hunk not in hunks:
+                hunks.append(hunk)
+    if not hunks:
+        return None
+    hunks.sort(key=lambda hunk: hunk['old_start'])
+    text = []
+    for hunk in hunks:
+        text.append(f"@@ -{hunk['old_start']},{hunk['old_count']} +{hunk['new_start']},{hunk['new_count']} @@")
+        text.extend(hunk['lines'])
+    return "\n".join(text) + "\n"
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+"""
+Utilitaires de manipulation des diffs unifiés renvoyés par l'API GitHub
+
+Le champ `patch` des fichiers d'une PR (ou d'une comparaison de commits)
+est découpé en hunks, ce qui permet de ne soumettre au modèle que les
+lignes modifiées accompagnées d'un peu de contexte.
+
+Les correctifs proposés par le modèle (diff unifié ou blocs rechercher/remplacer)
+sont appliqués localement au contenu d'origine, ce qui les valide.
+"""
+import re
+
+HUNK_HEADER_RE = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+class PatchError(ValueError):
+    """Correctif qui ne s'applique pas au contenu d'origine"""
+
+
+def parse_patch(patch, lenient=False):
+    """
+    Découpe un diff unifié en hunks.
+
+    Renvoie une liste de dictionnaires {old_start, old_count, new_start, new_count, lines},
+    où `lines` contient les lignes brutes du hunk (préfixées par ' ', '+' ou '-').
+    Avec `lenient`, une ligne vide dans un hunk est lue comme une ligne de contexte
+    vide dont l'espace initial a été perdu (fréquent dans les diffs générés).
+    """
+    hunks = []
+    current = None
+    for line in (patch or '').split('\n'):
+        match = HUNK_HEADER_RE.match(line)
+        if match:
+            old_start, old_count, new_start, new_count = match.groups()
+            current = {
+                'old_start': int(old_start),
+                'old_count': int(old_count) if old_count is not None else 1,
+                'new_start': int(new_start),
+                'new_count': int(new_count) if new_count is not None else 1,
+                'lines': [],
+            }
+            hunks.append(current)
+        elif current is not None and line[:1] in (' ', '+', '-'):
+            current['lines'].append(line)
+        elif current is not None and lenient and line == '':
+            current['lines'].append(' ')
+        # Les lignes "\ No newline at end of file" et les en-têtes de fichier sont ignorées
+    return hunks
+
+
+def changed_ranges(patch):
+    """
+    Renvoie les plages (début, fin) de lignes modifiées côté nouvelle version.
+
+    Une suppression pure est représentée par la ligne qui suit le point de suppression.
+    """
+    ranges = []
+    for hunk in parse_patch(patch):
+        new_line = hunk['new_start']
+        start = None
+        for line in hunk['lines']:
+            if line.startswith('+'):
+                if start is None:
+                    start = new_line
+                new_line += 1
+                continue
+            if start is not None:
+                ranges.append((start, new_line - 1))
+                start = None
+            if line.startswith('-'):
+                ranges.append((new_line, new_line))
+            else:
+                new_line += 1
+        if start is not None:
+            ranges.append((start, new_line - 1))
+    return merge_ranges(ranges)
+
+
+def merge_ranges(ranges, context=0, max_line=None):
+    """Élargit chaque plage de `context` lignes et fusionne les plages qui se chevauchent"""
+    merged = []
+    for start, end in sorted(ranges):
+        start = max(1, start - context)
+        end = end + context
+        if max_line is not None:
+            end = min(end, max_line)
+        if start > end:
+            continue
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def number_lines(lines, start=1):
+    """Préfixe chaque ligne de son numéro dans le fichier, ex: "   12 | code" """
+    return "\n".join(f"{number:>5} | {line}" for number, line in enumerate(lines, start))
+
+
+def build_excerpt(content, ranges, context=3):
+    """
+    Construit un extrait numéroté du fichier limité aux plages données et à leur contexte.
+
+    Chaque bloc est précédé d'un en-tête indiquant les lignes couvertes, pour que
+    la revue puisse citer des numéros de ligne globaux.
+    """
+    lines = content.split('\n')
+    blocks = []
+    for start, end in merge_ranges(ranges, context=context, max_line=len(lines)):
+        blocks.append(f"# --- lignes {start}-{end} ---\n" + number_lines(lines[start - 1:end], start))
+    return "\n\n".join(blocks)
+
+
+def _locate_block(lines, block, expected, start):
+    """
+    Position de `block` dans `lines` à partir de `start`, la plus proche de `expected`.
+
+    La comparaison exacte est tentée d'abord, puis en ignorant les espaces de fin de ligne.
+    Renvoie None si le bloc est introuvable.
+    """
+    if not block:
+        return min(max(start, expected), len(lines))
+    for normalize in (lambda line: line, str.rstrip):
+        target = [normalize(line) for line in block]
+        positions = [
+            position for position in range(start, len(lines) - len(block) + 1)
+            if normalize(lines[position]) == target[0]
+            and [normalize(line) for line in lines[position:position + len(block)]] == target
+        ]
+        if positions:
+            return min(positions, key=lambda position: abs(position - expected))
+    return None
+
+
+def apply_unified_diff(content, patch):
+    """
+    Applique un diff unifié au contenu d'origine et renvoie le contenu modifié.
+
+    Les numéros de ligne des en-têtes ne servent qu'à départager plusieurs
+    emplacements possibles : chaque hunk est validé par ses lignes de contexte
+    et de suppression. Lève PatchError si un hunk ne correspond pas au contenu.
+    """
+    hunks = parse_patch((patch or '').rstrip('\n'), lenient=True)
+    if not hunks:
+        raise PatchError("aucun hunk dans le correctif")
+
+    lines = content.split('\n')
+    result = []
+    cursor = 0
+    for hunk in hunks:
+        old = [line[1:] for line in hunk['lines'] if line[:1] in (' ', '-')]
+        new = [line[1:] for line in hunk['lines'] if line[:1] in (' ', '+')]
+        # Un hunk d'insertion pure (-N,0) s'insère après la ligne N
+        expected = hunk['old_start'] if hunk['old_count'] == 0 else hunk['old_start'] - 1
+        position = _locate_block(lines, old, expected, cursor)
+        if position is None:
+            raise PatchError(f"le hunk @@ -{hunk['old_start']},{hunk['old_count']} ne correspond pas au contenu")
+        result.extend(lines[cursor:position])
+        result.extend(new)
+        cursor = position + len(old)
+    result.extend(lines[cursor:])
+    return '\n'.join(result)
+
+
+def apply_search_replace(content, edits):
+    """
+    Applique une liste de blocs {search, replace} dans l'ordre et renvoie le contenu modifié.
+
+    Chaque texte recherché doit apparaître exactement une fois dans le contenu courant;
+    sinon PatchError est levée.
+    """
+    for index, edit in enumerate(edits, 1):
+        search, replace = edit.get('search', ''), edit.get('replace', '')
+        if not search:
+            raise PatchError(f"bloc {index}: texte recherché vide")
+        occurrences = content.count(search)
+        if occurrences == 0:
+            raise PatchError(f"bloc {index}: texte recherché introuvable")
+        if occurrences > 1:
+            raise PatchError(f"bloc {index}: texte recherché ambigu ({occurrences} occurrences)")
+        content = content.replace(search, replace, 1)
+    return content
+
+
+def apply_patch(content, patch=None, edits=None):
+    """Applique un diff unifié puis des blocs rechercher/remplacer au contenu d'origine"""
+    if patch:
+        content = apply_unified_diff(content, patch)
+    if edits:
+        content = apply_search_replace(content, edits)
+    return content
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""
+Pré-analyse locale des fichiers candidats à la revue
+
+Avant tout appel au modèle, chaque fichier reçoit un score de risque calculé à
+partir de sa taille, de sa complexité cyclomatique, de son activité récente
+(nombre de commits qui l'ont modifié) et de sa présence dans le diff examiné.
+Quand la configuration limite le nombre de fichiers par exécution
+(review_settings.max_files_per_run), seuls les N meilleurs scores, conservés
+dans une file de priorité bornée, sont examinés.
+
+Mesurer la complexité demande le contenu du fichier. Lorsqu'il n'est pas déjà
+disponible localement (archive du dépôt), un premier classement sur la taille,
+l'activité et le diff retient une liste restreinte de quelques fois N fichiers,
+dont seuls les contenus sont ensuite récupérés.
+"""
+import fnmatch
+import heapq
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from github_client import get_client
+from model_router import cyclomatic_complexity
+
+# Poids des signaux dans le score (section file_ranking.weights de config.json)
+DEFAULT_WEIGHTS = {"size": 1.0, "complexity": 2.0, "churn": 1.5, "diff": 3.0}
+
+# Nombre de commits récents parcourus pour mesurer l'activité des fichiers
+DEFAULT_CHURN_COMMITS = 50
+
+# Au-delà de cette taille, la complexité n'est pas mesurée (seule la taille compte)
+MAX_COMPLEXITY_BYTES = 1000000
+
+# Taille de la liste restreinte, en multiple du nombre de fichiers retenus (contenus distants)
+DEFAULT_SHORTLIST_FACTOR = 3
+
+
+def is_excluded(path, exclude_paths):
+    """
+    Indique si un chemin est exclu par la liste exclude_paths de la configuration.
+
+    Une entrée exclut un composant de chemin (ex: "node_modules"), un préfixe
+    (ex: "docs/legacy") ou un motif glob (ex: "*.min.js").
+    """
+    parts = path.split('/')
+    for pattern in exclude_paths or ():
+        pattern = pattern.strip('/')
+        if not pattern:
+            continue
+        if pattern in parts or path == pattern or path.startswith(pattern + '/') or fnmatch.fnmatch(path, pattern):
+            return True
+    return False
+
+
+def fetch_churn(owner, repo, token=None, ref=None, max_commits=DEFAULT_CHURN_COMMITS, concurrency=8):
+    """
+    Compte, pour chaque fichier, les commits récents qui l'ont modifié.
+
+    Les max_commits derniers commits de la référence sont listés en un appel, puis
+    leurs fichiers modifiés sont récupérés en parallèle.
+
+    Renvoie un dictionnaire chemin -> nombre de commits.
+    """
+    client = get_client(token)
+    params = {'per_page': min(max_commits, 100)}
+    if ref:
+        params['sha'] = ref
+    response = client.get(f"/repos/{owner}/{repo}/commits", params=params)
+    response.raise_for_status()
+    shas = [commit['sha'] for commit in response.json()[:max_commits]]
+
+    def commit_files(sha):
+        detail = client.get(f"/repos/{owner}/{repo}/commits/{sha}")
+        detail.raise_for_status()
+        return [file['filename'] for file in detail.json().get('files', [])]
+
+    churn = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for filenames in executor.map(commit_files, shas):
+            for filename in filenames:
+                churn[filename] = churn.get(filename, 0) + 1
+    return churn
+
+
+def fetch_diff_paths(owner, repo, base, head="HEAD", token=None):
+    """Chemins modifiés entre deux références (API compare)"""
+    response = get_client(token).get(f"/repos/{owner}/{repo}/compare/{base}...{head}")
+    response.raise_for_status()
+    return {file['filename'] for file in response.json().get('files', [])}
+
+
+def top_n(items, limit, key):
+    """Les `limit` éléments de plus grande clé, via un tas borné (ordre décroissant, ordre d'entrée en cas d'égalité)"""
+    heap = []
+    for index, item in enumerate(items):
+        entry = (key(item), -index, item)
+        if len(heap) < limit:
+            heapq.heappush(heap, entry)
+        else:
+            heapq.heappushpop(heap, entry)
+    return [item for _, _, item in sorted(heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+class FileRanker:
+    """Classement des fichiers candidats par score de risque"""
+
+    def __init__(self, weights=None, content_loader=None, churn=None, diff_paths=None, concurrency=8, logger=None,
+                 local_content=False, shortlist_factor=DEFAULT_SHORTLIST_FACTOR):
+        """
+        Paramètres:
+        - weights: Poids des signaux {size, complexity, churn, diff} (DEFAULT_WEIGHTS complétés).
+        - content_loader: Fonction path -> contenu texte, pour mesurer la complexité (optionnelle).
+        - churn: Dictionnaire chemin -> nombre de commits récents (fetch_churn).
+        - diff_paths: Ensemble des chemins présents dans le diff examiné.
+        - concurrency: Nombre de contenus chargés simultanément.
+        - logger: Logger où journaliser le classement (print par défaut).
+        - local_content: Vrai si content_loader lit des contenus déjà locaux (complexité mesurée
+          pour tous les candidats).
+        - shortlist_factor: Sinon, seuls les `limit * shortlist_factor` meilleurs candidats sans
+          complexité sont chargés puis reclassés.
+        """
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.content_loader = content_loader
+        self.churn = churn or {}
+        self.diff_paths = set(diff_paths or ())
+        self.concurrency = concurrency
+        self.logger = logger
+        self.local_content = local_content
+        self.shortlist_factor = shortlist_factor
+
+    def _complexity(self, entry):
+        """Complexité d'un fichier, 0 si son contenu n'est pas disponible"""
+        if self.content_loader is None or (entry.get('size') or 0) > MAX_COMPLEXITY_BYTES:
+            return 0
+        try:
+            return cyclomatic_complexity(entry['path'], self.content_loader(entry['path']))
+        except Exception:
+            # Fichier binaire ou illisible: seule la taille compte
+            return 0
+
+    def score(self, entries, complexity=True):
+        """
+        Calcule le score de chaque entrée {path, size}.
+
+        Chaque signal est ramené entre 0 et 1 (la taille sur une échelle logarithmique),
+        puis pondéré; le score final est compris entre 0 et 1. Avec complexity=False,
+        aucun contenu n'est chargé et la complexité compte pour 0.
+        """
+        if complexity:
+            with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as executor:
+                complexities = list(executor.map(self._complexity, entries))
+        else:
+            complexities = [0] * len(entries)
+
+        max_size = max([math.log1p(entry.get('size') or 0) for entry in entries] + [1.0])
+        max_complexity = max(complexities + [1])
+        max_churn = max([self.churn.get(entry['path'], 0) for entry in entries] + [1])
+        total_weight = sum(self.weights.values()) or 1.0
+
+        scored = []
+        for entry, complexity in zip(entries, complexities):
+            signals = {
+                "size": math.log1p(entry.get('size') or 0) / max_size,
+                "complexity": complexity / max_complexity,
+                "churn": self.churn.get(entry['path'], 0) / max_churn,
+                "diff": 1.0 if entry['path'] in self.diff_paths else 0.0,
+            }
+            score = sum(self.weights[name] * value for name, value in signals.items()) / total_weight
+            scored.append({
+                "path": entry['path'],
+                "score": round(score, 4),
+                "size": entry.get('size') or 0,
+                "complexity": complexity,
+                "churn": self.churn.get(entry['path'], 0),
+                "in_diff": entry['path'] in self.diff_paths,
+            })
+        return scored
+
+    def select(self, entries, limit):
+        """Renvoie les `limit` fichiers au score le plus élevé, du plus risqué au moins risqué"""
+        total = len(entries)
+        shortlist_size = limit * max(1, self.shortlist_factor)
+        if self.content_loader is not None and not self.local_content and len(entries) > shortlist_size:
+            # Contenus distants: complexité mesurée seulement sur les candidats les mieux classés sans elle
+            by_path = {entry['path']: entry for entry in entries}
+            shortlist = top_n(self.score(entries, complexity=False), shortlist_size, key=lambda item: item['score'])
+            self._log(f"📋 Liste restreinte de {len(shortlist)} fichier(s) sur {len(entries)} avant mesure de la complexité")
+            entries = [by_path[item['path']] for item in shortlist]
+        selected = top_n(self.score(entries), limit, key=lambda item: item['score'])
+        self._log(f"🎯 {len(selected)} fichier(s) retenu(s) sur {total} par score de risque:")
+        for item in selected:
+            self._log(
+                f"   {item['score']:.3f} {item['path']} ({item['size']} octets, complexité {item['complexity']}, "
+                f"{item['churn']} commit(s) récent(s){', dans le diff' if item['in_diff'] else ''})"
+            )
+        return selected
+
+    def _log(self, message):
+        if self.logger:
+            self.logger.info(message)
+        else:
+            print(message)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+"""
+Client HTTP partagé pour l'API GitHub
+
+Toutes les requêtes GitHub passent par une session `requests` unique par token,
+avec un pool de connexions persistantes (keep-alive), des nouvelles tentatives
+avec backoff sur les erreurs 5xx, un timeout par défaut, un cache de requêtes
+conditionnelles, un cadencement selon le quota restant et des statistiques de
+latence par endpoint.
+"""
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from http_cache import DEFAULT_HTTP_CACHE_PATH, HttpCache
+from rate_limiter import RateLimitScheduler, request_priority
+
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_API_VERSION = "2022-11-28"
+
+# Paramètres par défaut du pool de connexions et des nouvelles tentatives
+DEFAULT_POOL_SIZE = 20
+DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+DEFAULT_RATE_LIMIT_RETRIES = 3
+
+# Segments variables remplacés dans les libellés d'endpoint (numéros, SHA)
+_ID_SEGMENT_RE = re.compile(r'^(\d+|[0-9a-f]{40})$')
+# Ressources dont la suite du chemin est un chemin de fichier ou une référence
+_PATH_RESOURCES = {'contents', 'tarball', 'zipball', 'compare', 'trees', 'commits'}
+
+
+def endpoint_label(method, url):
+    """
+    Construit un libellé d'endpoint stable pour les statistiques.
+
+    Ex: GET https://api.github.com/repos/o/r/contents/src/app.py -> GET /repos/:owner/:repo/contents/*
+    """
+    path = url.split('://', 1)[-1]
+    path = '/' + path.split('/', 1)[1] if '/' in path else '/'
+    path = path.split('?', 1)[0]
+    parts = [part for part in path.split('/') if part]
+    if len(parts) >= 3 and parts[0] == 'repos':
+        parts[1:3] = [':owner', ':repo']
+    label = []
+    for part in parts:
+        if label and label[-1] in _PATH_RESOURCES:
+            label.append('*')
+            break
+        label.append(':id' if _ID_SEGMENT_RE.match(part) else part)
+    return f"{method.upper()} /{'/'.join(label)}"
+
+
+class GitHubClient:
+    """Client GitHub reposant sur une session HTTP partagée"""
+
+    def __init__(self, token=None, pool_size=None, timeout=DEFAULT_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 base_url=GITHUB_API_URL, http_cache=None, scheduler=None,
+                 rate_limit_retries=DEFAULT_RATE_LIMIT_RETRIES):
+        """
+        Initialise la session.
+
+        Paramètres:
+        - token: Token GitHub utilisé pour l'en-tête Authorization.
+        - pool_size: Nombre maximal de connexions conservées ouvertes
+          (GITHUB_POOL_SIZE, sinon DEFAULT_POOL_SIZE).
+        - timeout: Timeout par défaut des requêtes, en secondes.
+        - max_retries: Nombre de nouvelles tentatives sur erreur 5xx ou de connexion.
+        - backoff_factor: Facteur du délai exponentiel entre deux tentatives.
+        - base_url: URL de base de l'API (modifiable pour GitHub Enterprise).
+        - http_cache: Cache HttpCache pour les requêtes conditionnelles (optionnel).
+        - scheduler: Ordonnanceur de quota partagé (un nouveau par défaut).
+        - rate_limit_retries: Nombre de nouvelles tentatives après un refus pour limite de débit.
+        """
+        self.base_url = base_url.rstrip('/')
+        self.http_cache = http_cache
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.rate_limit_retries = rate_limit_retries
+        self.timeout = timeout
+
+        # Seules les méthodes idempotentes sont rejouées (pas de commentaire publié deux fois)
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            raise_on_status=False,
+        )
+        pool_size = pool_size or int(os.getenv("GITHUB_POOL_SIZE", DEFAULT_POOL_SIZE))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Accept': 'application/vnd.github+json',
+            'X-GitHub-Api-Version': GITHUB_API_VERSION,
+        })
+        if token:
+            self.session.headers['Authorization'] = f'token {token}'
+
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def url(self, path):
+        """Construit l'URL complète à partir d'un chemin relatif à l'API"""
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, priority=None, **kwargs):
+        """
+        Effectue une requête et enregistre sa latence; renvoie la réponse `requests`.
+
+        La requête attend son tour auprès de l'ordonnanceur de quota; `priority`
+        (PRIORITY_METADATA ou PRIORITY_CONTENT) est déduite de l'URL si absente.
+        """
+        url = self.url(path)
+        kwargs.setdefault('timeout', self.timeout)
+        if priority is None:
+            priority = request_priority(method, url)
+
+        # Les GET non streamés sont revalidés via ETag / Last-Modified si un cache HTTP est configuré
+        cache_key = entry = None
+        if self.http_cache is not None and method.upper() == 'GET' and not kwargs.get('stream'):
+            headers = dict(self.session.headers)
+            headers.update(kwargs.get('headers') or {})
+            cache_key = self.http_cache.make_key(url, kwargs.get('params'), headers)
+            entry = self.http_cache.lookup(cache_key)
+            if entry:
+                kwargs['headers'] = dict(kwargs.get('headers') or {}, **self.http_cache.conditional_headers(entry))
+
+        # Les refus pour limite de débit sont absorbés par une attente puis rejoués
+        for attempt in range(self.rate_limit_retries + 1):
+            self.scheduler.acquire(priority)
+            start_time = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            finally:
+                self._record(endpoint_label(method, url), time.perf_counter() - start_time)
+            self.scheduler.update(response)
+
+            delay = self.scheduler.retry_delay(response)
+            if delay is None or attempt == self.rate_limit_retries:
+                break
+            print(f"⏳ Limite de débit GitHub atteinte ({response.status_code}), nouvelle tentative dans {delay:.0f} s")
+
+        if cache_key is not None:
+            if response.status_code == 304 and entry:
+                return self.http_cache.serve(cache_key, entry, response)
+            if response.status_code == 200:
+                self.http_cache.store(cache_key, response, had_entry=entry is not None)
+        return response
+
+    def get(self, path, **kwargs):
+        """Requête GET"""
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        """Requête POST"""
+        return self.request('POST', path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        """Requête PATCH"""
+        return self.request('PATCH', path, **kwargs)
+
+    def _record(self, label, elapsed):
+        """Met à jour les statistiques de latence d'un endpoint"""
+        with self._stats_lock:
+            stats = self._stats.setdefault(label, {'count': 0, 'total': 0.0, 'max': 0.0})
+            stats['count'] += 1
+            stats['total'] += elapsed
+            stats['max'] = max(stats['max'], elapsed)
+
+    def latency_stats(self):
+        """Renvoie {endpoint: {count, total, max, avg}} pour les requêtes effectuées"""
+        with self._stats_lock:
+            return {
+                label: dict(stats, avg=stats['total'] / stats['count'])
+                for label, stats in self._stats.items()
+            }
+
+    def log_stats(self, logger):
+        """Journalise la latence par endpoint, du plus coûteux au moins coûteux"""
+        stats = self.latency_stats()
+        if not stats:
+            return
+        logger.info(f"🌐 Appels GitHub: {sum(s['count'] for s in stats.values())} requête(s)")
+        for label, s in sorted(stats.items(), key=lambda item: item[1]['total'], reverse=True):
+            logger.info(
+                f"   {label}: {s['count']} appel(s), moyenne {s['avg'] * 1000:.0f} ms, "
+                f"max {s['max'] * 1000:.0f} ms, total {s['total']:.2f} s"
+            )
+        if self.http_cache is not None:
+            logger.info(f"♻️ Cache HTTP GitHub: {self.http_cache.summary()}")
+        logger.info(f"🚦 Quota GitHub: {self.scheduler.summary()}")
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _default_http_cache():
+    """
+    Ouvre le cache HTTP indiqué par GITHUB_HTTP_CACHE (défaut: .review_cache/http.sqlite).
+
+    Une valeur vide désactive le cache.
+    """
+    path = os.getenv("GITHUB_HTTP_CACHE", DEFAULT_HTTP_CACHE_PATH)
+    if not path:
+        return None
+    try:
+        return HttpCache(path)
+    except Exception as e:
+        print(f"⚠️ Cache HTTP GitHub indisponible ({e}), requêtes non conditionnelles")
+        return None
+
+
+def get_client(token=None, **kwargs):
+    """
+    Renvoie le client partagé associé à un token (GITHUB_API_KEY par défaut).
+
+    Les paramètres supplémentaires ne sont pris en compte qu'à la création du client.
+    """
+    token = token or os.getenv("GITHUB_API_KEY")
+    with _clients_lock:
+        client = _clients.get(token)
+        if client is None:
+            if 'http_cache' not in kwargs:
+                kwargs['http_cache'] = _default_http_cache()
+            client = GitHubClient(token=token, **kwargs)
+            _clients[token] = client
+        return client
@@ -0,0 +1,514 @@
+#!/usr/bin/env python
+"""
+Accès aux pull requests GitHub: liste des fichiers et publication des revues
+
+La liste des fichiers d'une PR est lue par pages de 100 : la première page
+donne le nombre total de pages (en-tête Link) et les suivantes sont récupérées
+en parallèle. Les patchs que GitHub omet pour les très gros diffs sont
+reconstitués à partir du diff brut de l'API compare.
+
+Les constats localisés sont rattachés aux lignes du diff de la PR et envoyés
+comme commentaires en ligne d'une seule revue : une requête, quel que soit le
+nombre de constats. Les constats hors du diff, les synthèses et les correctifs
+vont dans le corps de la revue, ramené sous la limite de 65 536 caractères.
+
+Pendant l'exécution, un commentaire d'état unique, repéré par un marqueur
+caché, est mis à jour sur place à mesure que les fichiers sont terminés
+(éditions cadencées) et réutilisé par les exécutions suivantes.
+"""
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from diff_utils import parse_patch
+from github_client import get_client
+from review_schema import ReviewResult
+
+# Taille maximale du corps d'une revue ou d'un commentaire GitHub
+MAX_BODY_CHARS = 65536
+
+# Mention ajoutée quand le corps a dû être tronqué
+TRUNCATED_BODY_NOTE = "\n\n_(revue tronquée: limite de taille des commentaires GitHub atteinte)_"
+
+# Taille de page maximale de la liste des fichiers d'une PR (GitHub s'arrête à 3000 fichiers)
+PR_FILES_PER_PAGE = 100
+
+# Nombre de pages de la liste récupérées simultanément
+DEFAULT_PAGE_CONCURRENCY = 8
+
+# Marqueurs cachés du commentaire d'état (et SHA de tête de la dernière revue terminée)
+STATUS_MARKER = "<!-- claude-code-review:status -->"
+STATUS_HEAD_RE = re.compile(r"<!-- claude-code-review:head=([0-9a-f]{7,40}) -->")
+
+# Délai minimal entre deux éditions du commentaire d'état, en secondes
+DEFAULT_STATUS_INTERVAL = 5.0
+
+# Auteur des commentaires d'état quand /user est refusé (GITHUB_TOKEN des GitHub Actions)
+DEFAULT_BOT_IDENTITY = ("github-actions[bot]", "Bot")
+
+
+def last_page(response):
+    """Numéro de la dernière page d'une réponse paginée, lu dans l'en-tête Link (1 s'il est absent)"""
+    url = response.links.get('last', {}).get('url')
+    if not url:
+        return 1
+    return int(parse_qs(urlsplit(url).query).get('page', ['1'])[0])
+
+
+def split_diff(diff):
+    """
+    Découpe un diff unifié brut (plusieurs fichiers) en patchs par fichier.
+
+    Renvoie un dictionnaire chemin -> patch au format de l'API (à partir du premier hunk).
+    """
+    patches = {}
+    path = None
+    lines = []
+
+    def flush():
+        if path and lines:
+            patches[path] = "\n".join(lines).rstrip("\n")
+
+    in_hunks = False
+    for line in diff.split('\n'):
+        if line.startswith('diff --git '):
+            flush()
+            path, lines, in_hunks = None, [], False
+        elif not in_hunks and (line.startswith('+++ ') or line.startswith('--- ')):
+            # Chemin de la nouvelle version, ou de l'ancienne pour un fichier supprimé
+            name = line[4:].strip('"')
+            if name != '/dev/null' and (line.startswith('+++ ') or path is None):
+                path = name[2:] if name[:2] in ('a/', 'b/') else name
+        elif line.startswith('@@'):
+            in_hunks = True
+        if in_hunks:
+            lines.append(line)
+    flush()
+    return patches
+
+
+def fetch_compare_patches(owner, repo, base, head, token=None, timeout=60):
+    """Patchs par fichier entre deux références, lus dans le diff brut de l'API compare (sans patch omis)"""
+    response = get_client(token).get(
+        f"/repos/{owner}/{repo}/compare/{base}...{head}",
+        headers={'Accept': 'application/vnd.github.diff'}, timeout=timeout
+    )
+    response.raise_for_status()
+    return split_diff(response.text)
+
+
+def list_pr_files(owner, repo, pr_number, token=None, base_sha=None, head_sha=None,
+                  concurrency=DEFAULT_PAGE_CONCURRENCY, timeout=60, logger=None):
+    """
+    Liste complète des fichiers modifiés d'une PR.
+
+    Paramètres:
+    - owner, repo, pr_number: Dépôt et numéro de la pull request.
+    - token: Token GitHub (GITHUB_API_KEY par défaut).
+    - base_sha, head_sha: Références de la PR pour compléter les patchs omis
+      (lues dans les métadonnées de la PR si absentes et nécessaires).
+    - concurrency: Nombre de pages récupérées simultanément.
+    - timeout: Timeout des appels à l'API, en secondes.
+    - logger: Logger des avertissements (print par défaut).
+
+    Renvoie la liste des fichiers dans l'ordre de l'API; lève requests.HTTPError si la liste est illisible.
+    """
+    client = get_client(token)
+    url = f"/repos/{owner}/{repo}/pulls/{pr_number}/files"
+
+    def fetch_page(page):
+        response = client.get(url, params={'per_page': PR_FILES_PER_PAGE, 'page': page}, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    first = client.get(url, params={'per_page': PR_FILES_PER_PAGE, 'page': 1}, timeout=timeout)
+    first.raise_for_status()
+    files = first.json()
+    pages = last_page(first)
+    if pages > 1:
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, pages - 1))) as executor:
+            for page_files in executor.map(fetch_page, range(2, pages + 1)):
+                files.extend(page_files)
+
+    # GitHub omet le patch des diffs trop volumineux (les fichiers binaires n'ont aucune ligne modifiée)
+    missing = [file for file in files if file.get('patch') is None and (file.get('changes') or 0) > 0]
+    if missing:
+        try:
+            if not (base_sha and head_sha):
+                details = client.get(f"/repos/{owner}/{repo}/pulls/{pr_number}", timeout=timeout)
+                details.raise_for_status()
+                base_sha, head_sha = details.json()['base']['sha'], details.json()['head']['sha']
+            patches = fetch_compare_patches(owner, repo, base_sha, head_sha, token, timeout)
+        except Exception as e:
+            _log(logger, f"⚠️ Patchs manquants pour {len(missing)} fichier(s), diff de comparaison indisponible: {e}",
+                 warning=True)
+        else:
+            for file in missing:
+                file['patch'] = patches.get(file['filename'])
+            completed = sum(1 for file in missing if file['patch'] is not None)
+            _log(logger, f"🧩 {completed}/{len(missing)} patch(s) omis complété(s) via l'API compare")
+    return files
+
+
+def _log(logger, message, warning=False):
+    if logger:
+        (logger.warning if warning else logger.info)(message)
+    else:
+        print(message)
+
+
+def diff_line_ranges(patch):
+    """Plages (début, fin) de lignes de la nouvelle version couvertes par les hunks d'un diff"""
+    return [
+        (hunk['new_start'], hunk['new_start'] + hunk['new_count'] - 1)
+        for hunk in parse_patch(patch or '', lenient=True)
+        if hunk['new_count'] > 0
+    ]
+
+
+def inline_comment(path, finding, ranges):
+    """
+    Commentaire en ligne d'un constat, ou None si ses lignes sont hors du diff.
+
+    Un constat sur plusieurs lignes d'un même hunk devient un commentaire multiligne;
+    sinon il est rattaché à sa dernière (ou à défaut sa première) ligne présente dans le diff.
+    """
+    start, end = finding.get('line_start'), finding.get('line_end') or finding.get('line_start')
+    if start is None:
+        return None
+    for low, high in ranges:
+        if low <= start <= high and low <= end <= high:
+            # Les lignes sont portées par le commentaire lui-même
+            body = ReviewResult.describe_finding(dict(finding, line_start=None), markdown=True)
+            comment = {"path": path, "line": end, "side": "RIGHT", "body": body[:MAX_BODY_CHARS]}
+            if start != end:
+                comment.update(start_line=start, start_side="RIGHT")
+            return comment
+    for line in (end, start):
+        if any(low <= line <= high for low, high in ranges):
+            body = ReviewResult.describe_finding(finding, markdown=True)
+            return {"path": path, "line": line, "side": "RIGHT", "body": body[:MAX_BODY_CHARS]}
+    return None
+
+
+def fit_body(sections, compact_sections, header='', footer='', limit=MAX_BODY_CHARS):
+    """
+    Assemble le corps d'une revue sous la limite de taille.
+
+    Les sections complètes sont utilisées si elles tiennent, sinon leurs versions
+    compactes (sans correctif); en dernier recours le texte est tronqué.
+    """
+    for candidate in (sections, compact_sections):
+        body = header + "".join(candidate) + footer
+        if len(body) <= limit:
+            return body
+    room = limit - len(header) - len(footer) - len(TRUNCATED_BODY_NOTE)
+    return header + "".join(compact_sections)[:max(room, 0)] + TRUNCATED_BODY_NOTE + footer
+
+
+def build_review(review_results, patches, repo=''):
+    """
+    Prépare les commentaires en ligne et les sections du corps d'une revue de PR.
+
+    Paramètres:
+    - review_results: Résultats au format run_reviews ({file, result, error}).
+    - patches: Dictionnaire fichier -> diff de la PR (lignes commentables); vide, tous
+      les constats sont placés dans le corps (commentaire unique).
+    - repo: Nom du dépôt (pour normaliser les résultats).
+
+    Renvoie (comments, sections, compact_sections, counts) où counts compte les
+    constats publiés en ligne ('inline') et dans le corps ('summary').
+    """
+    comments = []
+    sections = []
+    compact_sections = []
+    counts = {'inline': 0, 'summary': 0}
+
+    for result in review_results:
+        path = result['file']
+        title = f"## Fichier: `{path}`\n\n"
+        if result.get('error'):
+            section = title + f"⚠️ {result['result']}\n\n---\n\n"
+            sections.append(section)
+            compact_sections.append(section)
+            continue
+
+        try:
+            parsed = ReviewResult.from_value(result['result'], repo, path)
+        except Exception as e:
+            section = title + f"⚠️ Erreur lors de l'analyse de ce fichier: {e}\n\n---\n\n"
+            sections.append(section)
+            compact_sections.append(section)
+            continue
+
+        ranges = diff_line_ranges(patches.get(path))
+        outside = []
+        for finding in parsed.findings:
+            comment = inline_comment(path, finding, ranges)
+            if comment is None:
+                outside.append(finding)
+            else:
+                comments.append(comment)
+        counts['inline'] += len(parsed.findings) - len(outside)
+        counts['summary'] += len(outside)
+
+        compact = title + f"### Analyse\n\n{parsed.review}\n\n"
+        if outside:
+            listing = "\n".join(f"- {parsed.describe_finding(finding, markdown=True)}" for finding in outside)
+            heading = "Constats hors du diff" if ranges else "Constats"
+            compact += f"### {heading}\n\n{listing}\n\n"
+        if parsed.patch_error:
+            compact += f"⚠️ Correctif non applicable tel quel: {parsed.patch_error}\n\n"
+        full = compact
+        if parsed.patch:
+            full += f"### Correctif suggéré\n\n```diff\n{parsed.patch}```\n\n"
+        elif parsed.updated_code:
+            full += f"### Code amélioré suggéré\n\n```python\n{parsed.updated_code}\n```\n\n"
+        sections.append(full + "---\n\n")
+        compact_sections.append(compact + "---\n\n")
+
+    return comments, sections, compact_sections, counts
+
+
+def submit_review(owner, repo, pr_number, commit_id, body, comments, token=None, timeout=60, logger=None):
+    """
+    Publie une revue de PR (événement COMMENT) avec tous ses commentaires en ligne, en une requête.
+
+    Si GitHub refuse les commentaires (422, ligne devenue introuvable), la revue est
+    republiée sans eux, leur contenu étant ajouté au corps.
+
+    Renvoie la réponse JSON de GitHub; lève requests.HTTPError en cas d'échec.
+    """
+    url = f"/repos/{owner}/{repo}/pulls/{pr_number}/reviews"
+    client = get_client(token)
+    payload = {"body": body, "event": "COMMENT", "comments": comments}
+    if commit_id:
+        payload["commit_id"] = commit_id
+    response = client.post(url, json=payload, timeout=timeout)
+
+    if response.status_code == 422 and comments:
+        if logger:
+            logger.warning(f"⚠️ Commentaires en ligne refusés par GitHub ({response.text[:200]}), "
+                           f"publication dans le corps de la revue")
+        listing = "\n".join(f"- `{comment['path']}` l. {comment['line']}: {comment['body']}" for comment in comments)
+        extra = f"\n\n## Constats\n\n{listing}"
+        payload.update(body=(body + extra)[:MAX_BODY_CHARS], comments=[])
+        response = client.post(url, json=payload, timeout=timeout)
+
+    response.raise_for_status()
+    return response.json()
+
+
+class StatusComment:
+    """
+    Commentaire d'état d'une PR, édité sur place pendant la revue.
+
+    Le commentaire existant (marqueur STATUS_MARKER) est réutilisé d'une exécution
+    à l'autre. Les résultats reçus via record() et les revues partielles reçues via
+    partial() sont publiés au plus une fois par `min_interval` secondes par un
+    minuteur; les erreurs GitHub sont journalisées sans interrompre la revue.
+    """
+
+    def __init__(self, owner, repo, pr_number, token=None, min_interval=DEFAULT_STATUS_INTERVAL, timeout=60,
+                 logger=None, bot_identity=DEFAULT_BOT_IDENTITY):
+        """
+        Paramètres:
+        - owner, repo, pr_number: Dépôt et numéro de la pull request.
+        - token: Token GitHub (GITHUB_API_KEY par défaut).
+        - min_interval: Délai minimal entre deux éditions, en secondes.
+        - timeout: Timeout des appels à l'API, en secondes.
+        - logger: Logger des publications et des erreurs (print par défaut).
+        - bot_identity: (login, type) de l'auteur attendu si /user n'est pas accessible au token.
+        """
+        self.owner = owner
+        self.repo = repo
+        self.pr_number = pr_number
+        self.token = token
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.logger = logger
+        self.bot_identity = bot_identity
+        self.comment_id = None
+        self.previous_head = None
+        self.header = ''
+        self.paths = []
+        self._results = {}
+        self._partials = {}
+        self._lock = threading.Lock()
+        self._edit_lock = threading.Lock()
+        self._timer = None
+        # Une fois le texte final demandé, les éditions d'avancement encore en vol sont abandonnées
+        self._finished = False
+        self._last_edit = 0.0
+        self._edits = 0
+
+    def find(self):
+        """
+        Recherche le commentaire d'état d'une exécution précédente.
+
+        Seuls les commentaires écrits avec l'identité du token sont retenus: un participant
+        de la PR pourrait sinon publier le marqueur avec un SHA de tête falsifié.
+        Renvoie le SHA de tête enregistré par la dernière revue terminée, ou None.
+        """
+        client = get_client(self.token)
+        identity = self._identity(client)
+        url = f"/repos/{self.owner}/{self.repo}/issues/{self.pr_number}/comments"
+        params = {'per_page': 100}
+        try:
+            while url:
+                response = client.get(url, params=params, timeout=self.timeout)
+                response.raise_for_status()
+                for comment in response.json():
+                    user = comment.get('user') or {}
+                    if (user.get('login'), user.get('type')) != identity:
+                        continue
+                    if STATUS_MARKER in (comment.get('body') or ''):
+                        self.comment_id = comment['id']
+                        match = STATUS_HEAD_RE.search(comment['body'])
+                        self.previous_head = match.group(1) if match else None
+                        return self.previous_head
+                # Les pages suivantes sont désignées par l'en-tête Link
+                url, params = response.links.get('next', {}).get('url'), None
+        except Exception as e:
+            self._log(f"⚠️ Recherche du commentaire d'état impossible: {e}", error=True)
+        return None
+
+    def _identity(self, client):
+        """(login, type) du compte du token, ou bot_identity si /user est refusé"""
+        try:
+            response = client.get("/user", timeout=self.timeout)
+            if response.ok:
+                user = response.json()
+                return user.get('login'), user.get('type')
+        except Exception as e:
+            self._log(f"⚠️ Identité du token inconnue ({e}), auteur attendu: {self.bot_identity[0]}", error=True)
+        return tuple(self.bot_identity)
+
+    def start(self, header, paths):
+        """Publie (ou réinitialise) le commentaire d'état avant l'examen des fichiers `paths`"""
+        with self._lock:
+            self.header = header
+            self.paths = list(paths)
+            self._results = {}
+            self._partials = {}
+            self._finished = False
+        self._publish(self._render())
+
+    def record(self, result):
+        """Enregistre le résultat d'un fichier terminé (callback on_result de run_reviews)"""
+        with self._lock:
+            self._results[result['file']] = result
+            self._partials.pop(result['file'], None)
+            self._schedule()
+
+    def partial(self, path, review):
+        """Enregistre la revue d'un fichier dont le correctif est encore en cours (destination partielle)"""
+        with self._lock:
+            if path in self._results:
+                return
+            self._partials[path] = review
+            self._schedule()
+
+    def finish(self, body, head_sha=None):
+        """
+        Remplace le contenu du commentaire par le texte final.
+
+        Le SHA de tête est enregistré dans le commentaire pour servir de point de départ
+        à la prochaine revue incrémentale. Renvoie True si la publication a réussi.
+        """
+        with self._lock:
+            self._finished = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        head = f"<!-- claude-code-review:head={head_sha} -->\n" if head_sha else ""
+        return self._publish(body, head, final=True)
+
+    def summary(self):
+        """Nombre d'éditions, ex: "commentaire #123 édité 4 fois" """
+        return f"commentaire #{self.comment_id} édité {self._edits} fois" if self.comment_id else "aucun commentaire"
+
+    def _schedule(self):
+        """Programme une édition (verrou _lock détenu par l'appelant)"""
+        if self._timer is not None or self._finished:
+            # Une édition est déjà programmée: elle inclura ce changement
+            return
+        delay = max(0.0, self._last_edit + self.min_interval - time.monotonic())
+        self._timer = threading.Timer(delay, self._flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush(self):
+        with self._lock:
+            self._timer = None
+            body = self._render()
+        self._publish(body)
+
+    def _render(self):
+        """
+        Corps d'avancement: progression, sections des fichiers terminés puis revues
+        dont le correctif est en cours, dans l'ordre de la PR
+        """
+        done = [self._results[path] for path in self.paths if path in self._results]
+        if len(done) < len(self.paths):
+            progress = f"⏳ Revue en cours: {len(done)}/{len(self.paths)} fichier(s) examiné(s).\n\n"
+        else:
+            progress = f"✅ {len(done)} fichier(s) examiné(s), publication des résultats...\n\n"
+        _, sections, compact_sections, _ = build_review(done, {}, self.repo)
+        for path in self.paths:
+            if path in self._partials and path not in self._results:
+                section = (f"## Fichier: `{path}`\n\n⏳ Revue reçue, correctif en cours...\n\n"
+                           f"### Analyse\n\n{self._partials[path]}\n\n---\n\n")
+                sections.append(section)
+                compact_sections.append(section)
+        return fit_body(sections, compact_sections, self.header + progress)
+
+    def _publish(self, body, head='', final=False):
+        """
+        Crée ou édite le commentaire; les éditions successives sont espacées de min_interval.
+
+        Une édition d'avancement (final=False) rendue avant finish() mais publiée après
+        est abandonnée: elle écraserait le texte final et le SHA de tête enregistré.
+        """
+        text = STATUS_MARKER + "\n" + head + body
+        if len(text) > MAX_BODY_CHARS:
+            text = text[:MAX_BODY_CHARS - len(TRUNCATED_BODY_NOTE)] + TRUNCATED_BODY_NOTE
+        client = get_client(self.token)
+        with self._edit_lock:
+            wait = self._last_edit + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            with self._lock:
+                if self._finished and not final:
+                    return False
+            try:
+                if self.comment_id:
+                    response = client.patch(
+                        f"/repos/{self.owner}/{self.repo}/issues/comments/{self.comment_id}",
+                        json={"body": text}, timeout=self.timeout
+                    )
+                    if response.status_code == 404:
+                        # Commentaire supprimé entre-temps: un nouveau est créé
+                        self.comment_id = None
+                if not self.comment_id:
+                    response = client.post(
+                        f"/repos/{self.owner}/{self.repo}/issues/{self.pr_number}/comments",
+                        json={"body": text}, timeout=self.timeout
+                    )
+                response.raise_for_status()
+            except Exception as e:
+                self._log(f"⚠️ Mise à jour du commentaire d'état impossible: {e}", error=True)
+                return False
+            finally:
+                self._last_edit = time.monotonic()
+            self.comment_id = self.comment_id or response.json().get('id')
+            self._edits += 1
+            return True
+
+    def _log(self, message, error=False):
+        if self.logger:
+            (self.logger.warning if error else self.logger.info)(message)
+        else:
+            print(message)
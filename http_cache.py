@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+"""
+Cache HTTP persistant pour les requêtes conditionnelles GitHub
+
+Les réponses GET portant un ETag ou un Last-Modified sont conservées dans une
+base SQLite. Lors de l'appel suivant, la requête est envoyée avec
+If-None-Match / If-Modified-Since : une réponse 304 ne consomme pas de quota
+GitHub et le corps est servi depuis le disque. Le cache est borné en taille
+avec une éviction LRU.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+# Emplacement et limites par défaut du cache
+DEFAULT_HTTP_CACHE_PATH = os.path.join(".review_cache", "http.sqlite")
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024  # 200 Mo
+
+# En-têtes de la réponse d'origine conservés avec le corps
+_STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Link')
+
+
+class HttpCache:
+    """Stockage SQLite des réponses GitHub revalidables, avec éviction LRU"""
+
+    def __init__(self, path=DEFAULT_HTTP_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Ouvre (ou crée) le cache.
+
+        Paramètres:
+        - path: Chemin du fichier SQLite.
+        - max_bytes: Taille totale maximale des corps stockés.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(url, params=None, headers=None):
+        """
+        Clé d'une requête: URL, paramètres, type de contenu demandé et identité.
+
+        Le token est haché pour que deux identités ne partagent pas leurs réponses.
+        """
+        headers = headers or {}
+        params_json = json.dumps(sorted((params or {}).items()), default=str)
+        identity = hashlib.sha256(str(headers.get('Authorization', '')).encode('utf-8')).hexdigest()
+        raw = f"{url}|{params_json}|{headers.get('Accept', '')}|{identity}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def lookup(self, key):
+        """Renvoie l'entrée stockée {url, etag, last_modified, headers, body} ou None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, etag, last_modified, headers, body FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'url': row[0],
+            'etag': row[1],
+            'last_modified': row[2],
+            'headers': json.loads(row[3]),
+            'body': row[4],
+        }
+
+    @staticmethod
+    def conditional_headers(entry):
+        """En-têtes de revalidation à ajouter à la requête"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def serve(self, key, entry, not_modified):
+        """
+        Construit une réponse 200 à partir de l'entrée stockée après un 304.
+
+        Les en-têtes frais du 304 (quota, date) remplacent ceux de la réponse d'origine.
+        """
+        response = Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response._content = entry['body']
+        response.url = entry['url']
+        response.encoding = 'utf-8'
+        response.request = not_modified.request
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.headers.update(not_modified.headers)
+        response.from_cache = True
+
+        with self._lock:
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return response
+
+    def store(self, key, response, had_entry):
+        """Enregistre une réponse 200 si elle est revalidable (ETag ou Last-Modified)"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        with self._lock:
+            if had_entry:
+                self.refreshes += 1
+            else:
+                self.misses += 1
+            if not etag and not last_modified:
+                return
+            body = response.content
+            headers = {name: response.headers[name] for name in _STORED_HEADERS if name in response.headers}
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, url, etag, last_modified, headers, body, size, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, response.url, etag, last_modified, json.dumps(headers), body, len(body), time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Supprime les réponses les moins récemment utilisées au-delà de la taille maximale"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        """Renvoie les compteurs du cache pour l'exécution en cours"""
+        lookups = self.hits + self.misses + self.refreshes
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def summary(self):
+        """Résumé lisible des compteurs, pour les logs de fin d'exécution"""
+        stats = self.stats()
+        return (
+            f"{stats['hits']} réponse(s) 304 servie(s) localement, {stats['misses']} miss(es), "
+            f"{stats['refreshes']} rafraîchissement(s), {stats['evictions']} éviction(s) - "
+            f"taux de hit {stats['hit_rate']:.0%}"
+        )
+
+    def close(self):
+        """Ferme la connexion SQLite"""
+        with self._lock:
+            self._conn.close()
@@ -6,12 +6,21 @@ MCT Analyzer - Module d'analyse du projet Mifare Classic Tool.
 
 Ce module implémente des fonctionnalités pour analyser le code source
 du projet Mifare Classic Tool et générer un rapport d'analyse.
+
+Le dépôt est cloné partiellement (profondeur 1, sans blobs hors de la
+révision extraite), l'arborescence est parcourue avec os.scandir et
+l'analyse de chaque fichier est répartie sur un pool de processus.
 """
 
 import os
+import re
 import sys
+import json
+import time
+import hashlib
 import logging
-import requests
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Union
@@ -23,56 +32,241 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Répertoires ignorés lors du parcours (métadonnées Git, artefacts de build)
+SKIP_DIRS = {'.git', '.gradle', '.idea', 'build', 'node_modules', '__pycache__'}
+
+# Langage par extension de fichier
+LANGUAGES = {
+    '.java': 'Java', '.kt': 'Kotlin', '.kts': 'Kotlin', '.xml': 'XML', '.gradle': 'Gradle',
+    '.py': 'Python', '.c': 'C', '.h': 'C', '.cpp': 'C++', '.hpp': 'C++', '.js': 'JavaScript',
+    '.ts': 'TypeScript', '.sh': 'Shell', '.md': 'Markdown', '.json': 'JSON', '.yml': 'YAML',
+    '.yaml': 'YAML', '.properties': 'Properties', '.pro': 'ProGuard', '.html': 'HTML',
+    '.txt': 'Text', '.keys': 'Keys', '.dump': 'Dump', '.png': 'Image', '.jpg': 'Image',
+    '.webp': 'Image', '.svg': 'SVG',
+}
+
+# Langages comptés comme composants de code source
+SOURCE_LANGUAGES = {'Java', 'Kotlin', 'Python', 'C', 'C++', 'JavaScript', 'TypeScript'}
+
+# Déclaration de paquetage Java / Kotlin
+_PACKAGE_RE = re.compile(rb'^\s*package\s+([\w.]+)', re.MULTILINE)
+
+# Délai maximal du clonage, en secondes
+CLONE_TIMEOUT = 600
+
+
+def _analyze_file(path: str) -> Dict:
+    """
+    Analyse un fichier (exécuté dans un processus du pool).
+
+    Args:
+        path: Chemin absolu du fichier
+
+    Returns:
+        Dictionnaire {path, language, lines, loc, sha256, package}, ou {path, error}
+        si le fichier est illisible (une erreur ne doit pas interrompre tout le pool)
+    """
+    language = LANGUAGES.get(os.path.splitext(path)[1].lower(), 'Other')
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        lines = loc = 0
+        package = None
+        if b'\0' not in data[:8192]:
+            # Fichier texte: lignes totales et lignes non vides
+            text_lines = data.splitlines()
+            lines = len(text_lines)
+            loc = sum(1 for line in text_lines if line.strip())
+            if language in ('Java', 'Kotlin'):
+                match = _PACKAGE_RE.search(data[:4096])
+                if match:
+                    package = match.group(1).decode('ascii', 'replace')
+    except (OSError, UnicodeDecodeError) as e:
+        return {"path": path, "error": str(e)}
+
+    return {
+        "path": path,
+        "language": language,
+        "lines": lines,
+        "loc": loc,
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "package": package,
+    }
+
+
+def scan_files(root: Path) -> List[str]:
+    """
+    Parcourt récursivement un répertoire avec os.scandir.
+
+    Args:
+        root: Répertoire racine
+
+    Returns:
+        Liste des chemins absolus des fichiers réguliers (hors SKIP_DIRS)
+    """
+    files = []
+    pending = [str(root)]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in SKIP_DIRS:
+                            pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        files.append(entry.path)
+        except OSError as e:
+            logger.warning(f"Répertoire illisible {directory}: {e}")
+    return files
+
+
 class MCTAnalyzer:
     """Analyseur pour le projet Mifare Classic Tool."""
-    
-    def __init__(self, repo_url: str, output_dir: Optional[Path] = None):
+
+    def __init__(self, repo_url: str, output_dir: Optional[Path] = None,
+                 repo_dir: Optional[Path] = None, ref: Optional[str] = None,
+                 max_workers: Optional[int] = None):
         """
         Initialise l'analyseur.
-        
+
         Args:
             repo_url: URL du dépôt GitHub à analyser
             output_dir: Répertoire pour les sorties de l'analyse
+            repo_dir: Répertoire du clone local (output_dir/repo par défaut)
+            ref: Branche ou tag à cloner (branche par défaut si None)
+            max_workers: Nombre de processus d'analyse (nombre de cœurs par défaut)
         """
         self.repo_url = repo_url
-        self.output_dir = output_dir or Path("./output")
+        self.output_dir = Path(output_dir or "./output")
+        self.repo_dir = Path(repo_dir or self.output_dir / "repo")
+        self.ref = ref
+        self.max_workers = max_workers or os.cpu_count() or 1
         self.report_data = {
             "timestamp": datetime.now().isoformat(),
             "repo_url": repo_url,
             "findings": []
         }
         logger.info(f"Initialisation de l'analyse pour {repo_url}")
-    
+
     def clone_repository(self) -> bool:
-        """Clone le dépôt pour analyse locale."""
-        # À implémenter: clonage du dépôt avec GitPython
+        """
+        Clone le dépôt pour analyse locale.
+
+        Le clone est superficiel (--depth 1) et partiel (--filter=blob:none): seuls
+        les blobs de la révision extraite sont téléchargés. Un clone déjà présent
+        dans repo_dir est réutilisé.
+
+        Returns:
+            True si le dépôt est disponible localement
+        """
+        if (self.repo_dir / ".git").is_dir():
+            logger.info(f"Clone existant réutilisé: {self.repo_dir}")
+            return True
+
         logger.info("Clonage du dépôt pour analyse")
+        command = ["git", "clone", "--depth", "1", "--filter=blob:none", "--single-branch", "--no-tags"]
+        if self.ref:
+            command += ["--branch", self.ref]
+        command += [self.repo_url, str(self.repo_dir)]
+
+        start_time = time.perf_counter()
+        os.makedirs(self.repo_dir.parent, exist_ok=True)
+        try:
+            subprocess.run(command, check=True, capture_output=True, text=True, timeout=CLONE_TIMEOUT)
+        except FileNotFoundError:
+            logger.error("Git n'est pas installé ou introuvable dans le PATH")
+            return False
+        except subprocess.TimeoutExpired:
+            logger.error(f"Clonage interrompu après {CLONE_TIMEOUT} s")
+            return False
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Échec du clonage: {e.stderr.strip()}")
+            return False
+
+        self.report_data["clone_seconds"] = round(time.perf_counter() - start_time, 2)
+        logger.info(f"Dépôt cloné en {self.report_data['clone_seconds']} s dans {self.repo_dir}")
         return True
-    
+
     def analyze_code_structure(self) -> Dict:
-        """Analyse la structure du code."""
+        """
+        Analyse la structure du code.
+
+        Les fichiers sont listés avec os.scandir, puis la détection du langage, le
+        comptage des lignes, la lecture du paquetage et l'empreinte de chaque fichier
+        sont répartis sur un pool de processus.
+
+        Returns:
+            Dictionnaire {component_count, file_types, package_structure, ...}
+        """
         logger.info("Analyse de la structure du code")
-        return {
+        structure = {
             "component_count": 0,
             "file_types": {},
             "package_structure": {}
         }
-    
+        if not self.repo_dir.is_dir():
+            logger.warning(f"Aucun clone dans {self.repo_dir}, structure vide")
+            return structure
+
+        start_time = time.perf_counter()
+        paths = scan_files(self.repo_dir)
+        # Lots assez gros pour amortir la communication entre processus
+        chunksize = max(1, len(paths) // (self.max_workers * 16))
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(_analyze_file, paths, chunksize=chunksize))
+
+        hashes: Dict[str, List[str]] = {}
+        total_loc = 0
+        skipped = []
+        for result in results:
+            relative = os.path.relpath(result["path"], self.repo_dir)
+            if "error" in result:
+                logger.warning(f"Fichier ignoré {relative}: {result['error']}")
+                skipped.append({"path": relative, "error": result["error"]})
+                continue
+            stats = structure["file_types"].setdefault(result["language"], {"files": 0, "loc": 0})
+            stats["files"] += 1
+            stats["loc"] += result["loc"]
+            total_loc += result["loc"]
+            if result["language"] in SOURCE_LANGUAGES:
+                structure["component_count"] += 1
+                package = result["package"] or os.path.dirname(relative) or "."
+                structure["package_structure"][package] = structure["package_structure"].get(package, 0) + 1
+            hashes.setdefault(result["sha256"], []).append(relative)
+
+        structure["total_files"] = len(results) - len(skipped)
+        structure["skipped_files"] = skipped
+        structure["total_loc"] = total_loc
+        structure["duplicate_files"] = sorted(
+            sorted(group) for group in hashes.values() if len(group) > 1
+        )
+        structure["analysis_seconds"] = round(time.perf_counter() - start_time, 2)
+        logger.info(
+            f"{structure['total_files']} fichier(s) analysé(s) en {structure['analysis_seconds']} s "
+            f"avec {self.max_workers} processus"
+            + (f", {len(skipped)} ignoré(s)" if skipped else "")
+        )
+        return structure
+
     def analyze_security(self) -> List[Dict]:
         """Analyse la sécurité du code, notamment pour les implémentations MIFARE."""
         logger.info("Analyse de sécurité")
         return []
-    
+
     def generate_report(self) -> Dict:
         """Génère un rapport complet d'analyse."""
         logger.info("Génération du rapport d'analyse")
         self.report_data["structure"] = self.analyze_code_structure()
         self.report_data["security"] = self.analyze_security()
-        
+
         # Sauvegarde du rapport
         os.makedirs(self.output_dir, exist_ok=True)
         report_path = self.output_dir / f"mct_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(self.report_data, f, ensure_ascii=False, indent=2)
+
         logger.info(f"Rapport généré: {report_path}")
         return self.report_data
 
@@ -80,9 +274,10 @@ def main():
     """Fonction principale."""
     mct_url = "https://github.com/ikarus23/MifareClassicTool"
     analyzer = MCTAnalyzer(mct_url)
-    analyzer.clone_repository()
+    if not analyzer.clone_repository():
+        return 1
     report = analyzer.generate_report()
-    
+
     logger.info("Analyse terminée")
     return 0
 
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""
+Choix du modèle et du budget de sortie de chaque revue à partir de mesures locales
+
+Avant l'appel à Claude, des signaux peu coûteux sont calculés sur le fichier :
+estimation du nombre de jetons, taille du diff, complexité cyclomatique et type
+de fichier. Les règles de la section `model_routing` de config.json (la première
+qui correspond l'emporte) désignent alors le niveau de modèle et `max_tokens` :
+un changement trivial part vers le modèle rapide, seuls les fichiers complexes
+vont au grand modèle.
+"""
+import ast
+import hashlib
+import json
+import re
+import threading
+from textwrap import dedent
+
+from diff_utils import parse_patch
+
+# Estimation du nombre de caractères par jeton
+CHARS_PER_TOKEN = 4
+
+# Règles par défaut, complétant une section model_routing de config.json (tiers, default ou rules absents)
+DEFAULT_ROUTING = {
+    "enabled": True,
+    "tiers": {
+        "fast": "claude-3-haiku-20240307",
+        "standard": "claude-3-5-sonnet-20241022",
+        "large": "claude-3-opus-20240229",
+    },
+    "default": {"tier": "large", "max_tokens": 4096},
+    "rules": [
+        {"name": "configuration ou documentation", "kinds": ["config", "doc"], "tier": "fast", "max_tokens": 1024},
+        {"name": "changement trivial", "max_diff_lines": 10, "max_complexity": 10, "tier": "fast", "max_tokens": 1024},
+        {"name": "petit fichier simple", "max_token_estimate": 1500, "max_complexity": 10,
+         "tier": "fast", "max_tokens": 2048},
+        {"name": "complexité modérée", "max_token_estimate": 12000, "max_complexity": 40,
+         "tier": "standard", "max_tokens": 4096},
+    ],
+}
+
+# Types de fichiers reconnus à partir du chemin
+CONFIG_EXTENSIONS = ('.json', '.yml', '.yaml', '.toml', '.ini', '.cfg', '.conf', '.env', '.lock', '.xml')
+DOC_EXTENSIONS = ('.md', '.rst', '.txt', '.adoc')
+_TEST_PATH_RE = re.compile(r'(^|/)(tests?|__tests__|spec)/|(^|/)test_[^/]*$|_test\.\w+$|\.(test|spec)\.\w+$')
+
+# Points de décision comptés pour les langages autres que Python
+_DECISION_RE = re.compile(r'\b(if|elif|for|while|case|catch|except)\b|&&|\|\||\?\s')
+
+# Métriques utilisables dans les conditions min_<métrique> / max_<métrique> des règles
+METRICS = ("token_estimate", "lines", "diff_lines", "complexity")
+
+
+def file_kind(path):
+    """Type de fichier: 'test', 'config', 'doc' ou 'code'"""
+    lower = path.lower()
+    name = lower.rsplit('/', 1)[-1]
+    if _TEST_PATH_RE.search(lower):
+        return "test"
+    if lower.endswith(CONFIG_EXTENSIONS) or name in ('dockerfile', 'makefile', 'requirements.txt'):
+        return "config"
+    if lower.endswith(DOC_EXTENSIONS):
+        return "doc"
+    return "code"
+
+
+def cyclomatic_complexity(path, content):
+    """
+    Complexité cyclomatique approchée: 1 + nombre de points de décision.
+
+    Le code Python est analysé avec ast (branches, boucles, exceptions, opérateurs
+    booléens, compréhensions filtrées); les autres langages, ou un extrait Python
+    qui ne se compile pas, sont estimés par les mots-clés de branchement.
+    """
+    if path.endswith('.py'):
+        try:
+            tree = ast.parse(dedent(content))
+        except SyntaxError:
+            tree = None
+        if tree is not None:
+            decisions = 0
+            for node in ast.walk(tree):
+                if isinstance(node, (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp,
+                                     ast.ExceptHandler, ast.Assert, ast.match_case)):
+                    decisions += 1
+                elif isinstance(node, ast.BoolOp):
+                    decisions += len(node.values) - 1
+                elif isinstance(node, ast.comprehension):
+                    decisions += 1 + len(node.ifs)
+            return 1 + decisions
+    return 1 + len(_DECISION_RE.findall(content))
+
+
+def diff_size(diff):
+    """Nombre de lignes ajoutées ou supprimées d'un diff unifié (None si le diff est inconnu)"""
+    if diff is None:
+        return None
+    return sum(
+        1 for hunk in parse_patch(diff) for line in hunk['lines'] if line[:1] in ('+', '-')
+    )
+
+
+def file_metrics(path, content, diff=None):
+    """
+    Mesures locales d'un fichier.
+
+    Paramètres:
+    - path: Chemin du fichier.
+    - content: Code examiné (fichier complet ou morceau).
+    - diff: Diff unifié des modifications examinées (optionnel).
+    """
+    return {
+        "token_estimate": len(content) // CHARS_PER_TOKEN,
+        "lines": content.count('\n') + 1,
+        "diff_lines": diff_size(diff),
+        "complexity": cyclomatic_complexity(path, content),
+        "kind": file_kind(path),
+    }
+
+
+def rule_matches(rule, metrics):
+    """Indique si toutes les conditions d'une règle sont remplies (condition sur une mesure inconnue: non remplie)"""
+    if "kinds" in rule and metrics["kind"] not in rule["kinds"]:
+        return False
+    for metric in METRICS:
+        value = metrics.get(metric)
+        for bound, compare in (("max_", lambda v, limit: v <= limit), ("min_", lambda v, limit: v >= limit)):
+            limit = rule.get(bound + metric)
+            if limit is not None and (value is None or not compare(value, limit)):
+                return False
+    return True
+
+
+class ModelRouter:
+    """Choix du modèle et de max_tokens de chaque revue selon les règles de model_routing"""
+
+    def __init__(self, routing=None, logger=None):
+        """
+        Paramètres:
+        - routing: Section model_routing de config.json (règles par défaut si None).
+        - logger: Logger où journaliser chaque décision (print par défaut).
+        """
+        routing = routing if routing is not None else DEFAULT_ROUTING
+        self.tiers = dict(DEFAULT_ROUTING["tiers"], **routing.get("tiers", {}))
+        self.default = dict(DEFAULT_ROUTING["default"], **routing.get("default", {}))
+        self.rules = list(routing.get("rules", DEFAULT_ROUTING["rules"]))
+        for rule in self.rules + [self.default]:
+            if rule.get("tier") not in self.tiers:
+                raise ValueError(f"Niveau de modèle inconnu dans model_routing: {rule.get('tier')} "
+                                 f"(attendu: {', '.join(self.tiers)})")
+        self.logger = logger
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, logger=None):
+        """
+        Routeur décrit par la section model_routing d'une configuration.
+
+        Renvoie None (modèle unique) si la section est absente ou désactivée: le routage
+        n'a lieu que s'il est demandé explicitement.
+        """
+        routing = (config or {}).get("model_routing")
+        if routing is None or not routing.get("enabled", True):
+            return None
+        router = cls(routing, logger=logger)
+        router._log(f"🧭 Routage des modèles actif: {len(router.rules)} règle(s), "
+                    f"défaut {router.default['tier']} ({router.tiers[router.default['tier']]})")
+        return router
+
+    def fingerprint(self):
+        """Empreinte des règles, pour que le cache de revues distingue les routages"""
+        description = json.dumps([self.tiers, self.default, self.rules], sort_keys=True)
+        return hashlib.sha256(description.encode('utf-8')).hexdigest()[:16]
+
+    def route(self, path, content, diff=None):
+        """
+        Choisit le modèle d'une revue.
+
+        Renvoie {tier, model, max_tokens, rule, metrics}.
+        """
+        metrics = file_metrics(path, content, diff)
+        rule = next((rule for rule in self.rules if rule_matches(rule, metrics)), self.default)
+        decision = {
+            "tier": rule["tier"],
+            "model": self.tiers[rule["tier"]],
+            "max_tokens": rule.get("max_tokens", self.default["max_tokens"]),
+            "rule": rule.get("name", "défaut"),
+            "metrics": metrics,
+        }
+        with self._lock:
+            self._counts[decision["tier"]] = self._counts.get(decision["tier"], 0) + 1
+
+        diff_text = "" if metrics["diff_lines"] is None else f", diff {metrics['diff_lines']} ligne(s)"
+        message = (
+            f"🧭 {path}: modèle {decision['tier']} ({decision['model']}), max_tokens {decision['max_tokens']} "
+            f"— règle '{decision['rule']}' (≈{metrics['token_estimate']} jetons{diff_text}, "
+            f"complexité {metrics['complexity']}, type {metrics['kind']})"
+        )
+        self._log(message)
+        return decision
+
+    def summary(self):
+        """Résumé des décisions, ex: "fast: 3, large: 1" """
+        with self._lock:
+            return ", ".join(f"{tier}: {count}" for tier, count in sorted(self._counts.items())) or "aucune revue"
+
+    def _log(self, message):
+        if self.logger:
+            self.logger.info(message)
+        else:
+            print(message)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+"""
+Export des revues vers Notion en arrière-plan
+
+Les blocs de chaque revue sont mis en file et écrits par un thread dédié : les
+revues n'attendent jamais Notion. Les limites de l'API sont respectées :
+- 2000 caractères par élément rich_text (les textes longs et le code sont découpés,
+  de préférence en fin de ligne) et 100 éléments rich_text par bloc ;
+- 100 blocs par requête d'ajout (les blocs de revues successives d'une même page
+  sont regroupés) ;
+- environ 3 requêtes par seconde, avec nouvelles tentatives espacées sur
+  conflit (409), limite de débit (429) ou erreur serveur effectivement reçus.
+
+Une requête sans réponse (timeout, connexion coupée) n'est pas rejouée : ses blocs
+ont pu être ajoutés et seraient dupliqués. Une revue dont seule une partie des
+blocs a été écrite est signalée comme partielle.
+"""
+import queue
+import threading
+import time
+
+# Limites de l'API Notion
+MAX_TEXT_CHARS = 2000
+MAX_RICH_TEXT_ITEMS = 100
+MAX_BLOCKS_PER_REQUEST = 100
+
+# Débit visé (requêtes par seconde) et nouvelles tentatives
+DEFAULT_RATE = 3.0
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF = 1.0
+RETRY_STATUS_CODES = (409, 429, 500, 502, 503, 504)
+
+# Signal d'arrêt du thread d'écriture
+_STOP = object()
+
+
+def split_text(text, limit=MAX_TEXT_CHARS):
+    """Découpe un texte en morceaux d'au plus `limit` caractères, coupés après un saut de ligne si possible"""
+    pieces = []
+    while len(text) > limit:
+        cut = text.rfind('\n', 0, limit) + 1
+        if cut <= 0:
+            cut = limit
+        pieces.append(text[:cut])
+        text = text[cut:]
+    if text or not pieces:
+        pieces.append(text)
+    return pieces
+
+
+def rich_text(text):
+    """Éléments rich_text d'un texte, chacun sous la limite de caractères"""
+    return [{"type": "text", "text": {"content": piece}} for piece in split_text(text or '')]
+
+
+def text_blocks(block_type, text, **extra):
+    """
+    Blocs d'un type donné portant un texte de longueur quelconque.
+
+    Un texte trop long pour un seul bloc (plus de 100 éléments rich_text) est
+    réparti sur plusieurs blocs consécutifs du même type.
+    """
+    items = rich_text(text)
+    return [
+        {
+            "object": "block",
+            "type": block_type,
+            block_type: dict(extra, rich_text=items[start:start + MAX_RICH_TEXT_ITEMS]),
+        }
+        for start in range(0, len(items), MAX_RICH_TEXT_ITEMS)
+    ]
+
+
+def heading_block(text):
+    """Titre de niveau 2 (tronqué à la limite de caractères)"""
+    return {
+        "object": "block",
+        "type": "heading_2",
+        "heading_2": {"rich_text": [{"type": "text", "text": {"content": text[:MAX_TEXT_CHARS]}}]},
+    }
+
+
+def _status(error):
+    """Code HTTP d'une erreur du client Notion (None pour une erreur réseau ou un timeout)"""
+    status = getattr(error, 'status', None)
+    if status is None and getattr(error, 'response', None) is not None:
+        status = getattr(error.response, 'status_code', None)
+    return status
+
+
+def _retry_after(error):
+    """Délai demandé par l'en-tête Retry-After d'une erreur, en secondes, ou None"""
+    headers = getattr(error, 'headers', None) or getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after') or headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class NotionWriter:
+    """File d'écriture Notion traitée par un thread d'arrière-plan"""
+
+    def __init__(self, client, rate=DEFAULT_RATE, max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF,
+                 logger=None):
+        """
+        Paramètres:
+        - client: Client notion_client (notion.blocks.children.append).
+        - rate: Nombre maximal de requêtes par seconde.
+        - max_retries: Nombre de nouvelles tentatives d'une requête en échec temporaire.
+        - backoff: Délai de base (secondes) du backoff exponentiel.
+        - logger: Logger des erreurs et du résumé (print par défaut).
+        """
+        self.client = client
+        self.interval = 1.0 / rate if rate else 0.0
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.logger = logger
+        self._queue = queue.Queue()
+        self._last_request = 0.0
+        self._stats = {'reviews': 0, 'blocks': 0, 'requests': 0, 'retries': 0, 'partial': 0, 'failed': 0}
+        self._partial = []
+        self._failed = []
+        self._thread = threading.Thread(target=self._worker, name="notion-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, page_id, blocks, label=''):
+        """Met en file les blocs d'une revue à ajouter à la page, sans attendre l'écriture"""
+        self._queue.put((page_id, list(blocks), label))
+
+    def flush(self):
+        """Attend que toutes les revues en file aient été écrites"""
+        self._queue.join()
+
+    def close(self):
+        """Écrit les revues restantes puis arrête le thread d'écriture"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def summary(self):
+        """Résumé des écritures, ex: "12 revue(s), 140 bloc(s) en 3 requête(s), 1 nouvelle(s) tentative(s)" """
+        stats = self._stats
+        text = (f"{stats['reviews']} revue(s), {stats['blocks']} bloc(s) en {stats['requests']} requête(s), "
+                f"{stats['retries']} nouvelle(s) tentative(s)")
+        if self._partial:
+            text += f", {stats['partial']} revue(s) exportée(s) en partie: {', '.join(self._partial)}"
+        if self._failed:
+            text += f", {stats['failed']} revue(s) non exportée(s): {', '.join(self._failed)}"
+        return text
+
+    def _log(self, message, error=False):
+        if self.logger:
+            (self.logger.error if error else self.logger.info)(message)
+        else:
+            print(message)
+
+    def _worker(self):
+        """Regroupe les revues en file par page et les écrit par requêtes d'au plus 100 blocs"""
+        carry = None
+        while True:
+            item = carry if carry is not None else self._queue.get()
+            carry = None
+            if item is _STOP:
+                self._queue.task_done()
+                break
+            # Les revues déjà en attente pour la même page sont ajoutées dans les mêmes requêtes
+            page_id = item[0]
+            items = [item]
+            while sum(len(entry[1]) for entry in items) < MAX_BLOCKS_PER_REQUEST:
+                try:
+                    following = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if following is _STOP or following[0] != page_id:
+                    carry = following
+                    break
+                items.append(following)
+            self._write(page_id, items)
+            for _ in items:
+                self._queue.task_done()
+
+    def _write(self, page_id, items):
+        """
+        Écrit les blocs de plusieurs revues d'une même page, par requêtes de 100 blocs.
+
+        Après un échec, les revues dont tous les blocs étaient déjà écrits comptent comme
+        exportées, celle qui était en cours comme partielle et les suivantes comme non exportées.
+        """
+        blocks = [block for _, entry_blocks, _ in items for block in entry_blocks]
+        written = 0
+        error = None
+        try:
+            for start in range(0, len(blocks), MAX_BLOCKS_PER_REQUEST):
+                chunk = blocks[start:start + MAX_BLOCKS_PER_REQUEST]
+                self._append(page_id, chunk)
+                written += len(chunk)
+        except Exception as e:
+            error = e
+        self._stats['blocks'] += written
+
+        offset = 0
+        partial, failed = [], []
+        for _, entry_blocks, label in items:
+            end = offset + len(entry_blocks)
+            if end <= written:
+                self._stats['reviews'] += 1
+            elif offset < written:
+                partial.append(label or page_id)
+            else:
+                failed.append(label or page_id)
+            offset = end
+        if error is None:
+            return
+        self._stats['partial'] += len(partial)
+        self._stats['failed'] += len(failed)
+        self._partial.extend(partial)
+        self._failed.extend(failed)
+        detail = f"{written}/{len(blocks)} bloc(s) écrit(s)"
+        if partial:
+            detail += f", exportée(s) en partie: {', '.join(partial)}"
+        if failed:
+            detail += f", non exportée(s): {', '.join(failed)}"
+        self._log(f"❌ Erreur lors de l'ajout à Notion ({detail}): {error}", error=True)
+
+    def _append(self, page_id, blocks):
+        """Une requête d'ajout, cadencée et rejouée sur erreur temporaire"""
+        for attempt in range(self.max_retries + 1):
+            wait = self._last_request + self.interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_request = time.monotonic()
+            self._stats['requests'] += 1
+            try:
+                return self.client.blocks.children.append(block_id=page_id, children=blocks)
+            except Exception as e:
+                # Sans réponse (timeout, connexion coupée), l'ajout a pu avoir lieu: pas de nouvelle tentative
+                status = _status(e)
+                if status not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    raise
+                delay = _retry_after(e) or self.backoff * (2 ** attempt)
+                self._stats['retries'] += 1
+                self._log(f"⏳ Notion indisponible ({status or e}), nouvelle tentative dans {delay:.1f} s")
+                time.sleep(delay)
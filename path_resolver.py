@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Résolution locale et déterministe des chemins à examiner
+
+Transforme une entrée utilisateur (fichier, dossier, motif glob ou simple nom
+de fichier) en liste de chemins à partir de l'index de l'arborescence, sans
+appel au modèle. Seules les requêtes ambiguës sont renvoyées vers l'agent de chemin.
+"""
+import bisect
+import difflib
+import fnmatch
+import posixpath
+from collections import defaultdict
+
+from repo_tree import DEFAULT_IGNORE_DIRS, is_ignored
+
+# Caractères signalant un motif glob dans l'entrée utilisateur
+GLOB_CHARS = set('*?[')
+
+
+class PathResolver:
+    """Index des chemins d'un dépôt permettant de résoudre une cible utilisateur"""
+
+    def __init__(self, entries, ignore_dirs=DEFAULT_IGNORE_DIRS):
+        """
+        Construit l'index à partir des entrées structurées de l'arborescence.
+
+        Paramètres:
+        - entries: Liste d'entrées {path, type, size, sha} renvoyée par fetch_repo_tree.
+        - ignore_dirs: Répertoires exclus de la résolution.
+        """
+        self.files = sorted(
+            entry['path'] for entry in entries
+            if entry['type'] == 'blob' and not is_ignored(entry['path'], ignore_dirs)
+        )
+        self.file_set = set(self.files)
+        self.dirs = {
+            entry['path'] for entry in entries
+            if entry['type'] == 'tree' and not is_ignored(entry['path'], ignore_dirs)
+        }
+        self.by_basename = defaultdict(list)
+        for path in self.files:
+            self.by_basename[posixpath.basename(path)].append(path)
+        self._lower_basenames = defaultdict(list)
+        for name in self.by_basename:
+            self._lower_basenames[name.lower()].append(name)
+
+    @staticmethod
+    def normalize(query):
+        """Nettoie l'entrée utilisateur (espaces, './' initial, '/' final)"""
+        query = query.strip().replace('\\', '/')
+        while query.startswith('./'):
+            query = query[2:]
+        return query.strip('/')
+
+    def files_under(self, directory):
+        """Renvoie les fichiers situés sous un dossier (recherche par préfixe)"""
+        if not directory:
+            return list(self.files)
+        prefix = f"{directory}/"
+        start = bisect.bisect_left(self.files, prefix)
+        end = bisect.bisect_left(self.files, f"{directory}0")  # '0' suit '/' en ASCII
+        return self.files[start:end]
+
+    def resolve(self, query):
+        """
+        Résout une entrée utilisateur en chemins de fichiers.
+
+        Renvoie un tuple (chemins, ambigu). Si ambigu vaut True, les chemins sont
+        des candidats à départager (éventuellement vide) et l'agent de chemin
+        doit prendre la décision.
+        """
+        query = self.normalize(query)
+
+        # Racine du dépôt
+        if query in ('', '.'):
+            return list(self.files), False
+
+        # Chemin exact d'un fichier
+        if query in self.file_set:
+            return [query], False
+
+        # Préfixe de dossier
+        under = self.files_under(query)
+        if under or query in self.dirs:
+            return under, False
+
+        # Motif glob explicite: sur le chemin complet s'il contient un '/', sinon sur le nom
+        if GLOB_CHARS & set(query):
+            if '/' in query:
+                matches = [path for path in self.files if fnmatch.fnmatchcase(path, query)]
+            else:
+                matches = [path for path in self.files if fnmatch.fnmatchcase(posixpath.basename(path), query)]
+            return matches, False
+
+        # Nom de fichier exact
+        matches = self.by_basename.get(query, [])
+        if matches:
+            return list(matches), len(matches) > 1
+
+        # Suffixe de chemin (ex: components/Login.jsx ou components)
+        suffix = f"/{query}"
+        matches = [path for path in self.files if path.endswith(suffix)]
+        dirs = [directory for directory in self.dirs if directory.endswith(suffix)]
+        if len(dirs) == 1 and not matches:
+            return self.files_under(dirs[0]), False
+        if matches or dirs:
+            candidates = matches + [path for directory in dirs for path in self.files_under(directory)]
+            return sorted(set(candidates)), len(matches) + len(dirs) > 1
+
+        # Correspondance approximative sur le nom de fichier
+        close = difflib.get_close_matches(query.lower(), list(self._lower_basenames), n=5, cutoff=0.8)
+        candidates = [
+            path
+            for lower in close
+            for name in self._lower_basenames[lower]
+            for path in self.by_basename[name]
+        ]
+        if len(candidates) == 1:
+            return candidates, False
+        if candidates:
+            return candidates, True
+
+        # Rien de trouvé: une requête en langage naturel mérite l'avis de l'agent
+        return [], ' ' in query
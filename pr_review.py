@@ -5,9 +5,10 @@ Permet l'exécution via GitHub Actions lors d'une PR
 """
 import os
 import argparse
-import requests
-import json
 from claude_code_reviewer import ReviewCrew
+from github_client import get_client
+from github_pr import list_pr_files
+from review_schema import ReviewResult
 
 def parse_args():
     """Parse command line arguments"""
@@ -17,29 +18,20 @@ def parse_args():
     return parser.parse_args()
 
 def get_pr_files(owner, repo, pr_number, github_token):
-    """Get the list of files changed in a PR"""
-    url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pr_number}/files"
-    headers = {"Authorization": f"token {github_token}"}
-    
+    """Get the complete list of files changed in a PR (all pages)"""
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return list_pr_files(owner, repo, pr_number, github_token)
     except Exception as e:
         print(f"❌ Erreur lors de la récupération des fichiers de la PR: {e}")
         return []
 
 def post_pr_comment(owner, repo, pr_number, comment, github_token):
     """Post a comment on a pull request"""
-    url = f"https://api.github.com/repos/{owner}/{repo}/issues/{pr_number}/comments"
-    headers = {
-        "Authorization": f"token {github_token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
+    url = f"/repos/{owner}/{repo}/issues/{pr_number}/comments"
     data = {"body": comment}
     
     try:
-        response = requests.post(url, headers=headers, json=data)
+        response = get_client(github_token).post(url, json=data)
         response.raise_for_status()
         return True
     except Exception as e:
@@ -130,15 +122,12 @@ def main():
     
     for result in review_results:
         try:
-            # Assuming result is a string representation of a list or tuple
-            parsed_result = json.loads(result["result"].replace("'", "\""))
-            if len(parsed_result) >= 3:
-                file_path = parsed_result[1]
-                review_text = parsed_result[2]
-                
-                review_comment += f"## Fichier: `{file_path}`\n\n"
-                review_comment += f"{review_text}\n\n"
-                review_comment += "---\n\n"
+            parsed_result = ReviewResult.from_value(result["result"], repo, result["file"])
+            review_comment += f"## Fichier: `{parsed_result.file_path}`\n\n"
+            review_comment += f"{parsed_result.review}\n\n"
+            if parsed_result.findings:
+                review_comment += f"{parsed_result.format_findings()}\n\n"
+            review_comment += "---\n\n"
         except Exception as e:
             review_comment += f"## Fichier: `{result['file']}`\n\n"
             review_comment += "⚠️ Erreur lors de l'analyse de ce fichier.\n\n"
@@ -14,6 +14,18 @@ import time
 import traceback
 from datetime import datetime
 
+from code_chunker import DEFAULT_CHUNK_LINES
+from github_client import get_client
+from github_pr import DEFAULT_STATUS_INTERVAL, StatusComment, build_review, fit_body, list_pr_files, submit_review
+from model_router import ModelRouter
+from tarball_source import open_tarball_source
+from diff_utils import build_excerpt, changed_ranges
+from review_cache import DEFAULT_CACHE_PATH, ReviewCache
+from review_executor import DEFAULT_CONCURRENCY, run_reviews
+
+# Lignes de contexte conservées autour des hunks en mode incrémental
+DEFAULT_CONTEXT_LINES = 5
+
 # Configuration du logger
 def setup_logger(debug_mode=False):
     """Configure le système de logging"""
@@ -42,17 +54,67 @@ def setup_logger(debug_mode=False):
     
     return logger
 
-def parse_args():
-    """Parse les arguments de ligne de commande"""
+def parse_args(argv=None):
+    """Parse les arguments de ligne de commande (ceux du processus si argv est None)"""
     parser = argparse.ArgumentParser(description="Agent d'analyse automatique amélioré des pull requests")
     parser.add_argument("--repo", type=str, required=True, help="Nom du dépôt au format 'owner/repo'")
     parser.add_argument("--pr", type=int, required=True, help="Numéro de la pull request")
     parser.add_argument("--debug", action="store_true", help="Activer le mode débogage (plus de logs)")
     parser.add_argument("--timeout", type=int, default=60, help="Timeout pour les appels API en secondes (défaut: 60)")
-    return parser.parse_args()
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Nombre de fichiers examinés simultanément (défaut: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--cache-path", type=str, default=DEFAULT_CACHE_PATH,
+                        help=f"Fichier SQLite du cache de revues (défaut: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--no-cache", action="store_true", help="Désactiver le cache de revues")
+    parser.add_argument("--engine", type=str, choices=("direct", "crew"), default="direct",
+                        help="Moteur de revue: 'direct' (un seul appel à Claude) ou 'crew' (équipe CrewAI) (défaut: direct)")
+    parser.add_argument("--output-budget", type=int,
+                        help="Budget de jetons de sortie par fichier au-delà duquel la génération en flux est interrompue (moteur direct)")
+    parser.add_argument("--output-mode", type=str, choices=("patch", "full"), default="patch",
+                        help="Forme des corrections (moteur direct): 'patch' (diff unifié ou rechercher/remplacer, "
+                             "fichier modifié reconstruit localement) ou 'full' (fichier complet) (défaut: patch)")
+    parser.add_argument("--chunk-lines", type=int, default=DEFAULT_CHUNK_LINES,
+                        help=f"Taille des morceaux des fichiers de plus de 1000 lignes ou 1 Mo, examinés par morceaux "
+                             f"syntaxiques (moteur direct, 0 pour les ignorer) (défaut: {DEFAULT_CHUNK_LINES})")
+    parser.add_argument("--source", type=str, choices=("api", "tarball"), default="api",
+                        help="Lecture des fichiers: 'api' (un appel contents par fichier) ou 'tarball' (une seule archive "
+                             "du dépôt téléchargée et indexée en mémoire) (défaut: api)")
+    parser.add_argument("--config", type=str,
+                        help="Fichier de configuration JSON dont la section model_routing choisit le modèle de chaque fichier "
+                             "(règles par défaut sinon)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="N'examiner que les hunks modifiés (depuis --since-sha si fourni) au lieu des fichiers entiers")
+    parser.add_argument("--since-sha", type=str, default=None,
+                        help="SHA de tête de la dernière revue (ex: github.event.before lors d'un synchronize)")
+    parser.add_argument("--context-lines", type=int, default=DEFAULT_CONTEXT_LINES,
+                        help=f"Lignes de contexte autour de chaque hunk en mode incrémental (défaut: {DEFAULT_CONTEXT_LINES})")
+    parser.add_argument("--publish", type=str, choices=("review", "comment"), default="review",
+                        help="Publication: 'review' (une revue de PR, constats en commentaires sur les lignes du diff) "
+                             "ou 'comment' (un commentaire unique sur la PR) (défaut: review)")
+    parser.add_argument("--status-interval", type=float, default=DEFAULT_STATUS_INTERVAL,
+                        help=f"Délai minimal en secondes entre deux éditions du commentaire d'état mis à jour pendant "
+                             f"la revue (défaut: {DEFAULT_STATUS_INTERVAL})")
+    parser.add_argument("--no-status-comment", action="store_true",
+                        help="Ne pas publier de commentaire d'état pendant la revue")
+    return parser.parse_args(argv)
+
+def open_review_cache(args, logger):
+    """Ouvre le cache de revues sauf s'il est désactivé"""
+    if args.no_cache:
+        logger.info("ℹ️ Cache de revues désactivé")
+        return None
+    try:
+        cache = ReviewCache(args.cache_path)
+        logger.info(f"✅ Cache de revues ouvert: {args.cache_path}")
+        return cache
+    except Exception as e:
+        logger.warning(f"⚠️ Cache de revues indisponible ({e}), les revues seront toutes recalculées")
+        return None
 
 def verify_environment_vars(logger):
-    """Vérifie que les variables d'environnement nécessaires sont définies"""
+    """Vérifie que les variables d'environnement nécessaires sont définies (fichier .env compris)"""
+    from claude_code_reviewer import load_environment
+    load_environment()
     required_vars = ["ANTHROPIC_API_KEY", "GITHUB_API_KEY"]
     missing_vars = [var for var in required_vars if not os.getenv(var)]
     
@@ -68,19 +130,14 @@ def verify_environment_vars(logger):
     logger.info("✅ Variables d'environnement vérifiées")
     return True
 
-def get_pr_files(owner, repo, pr_number, github_token, timeout=60, logger=None):
-    """Récupère la liste des fichiers modifiés dans une PR"""
-    url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pr_number}/files"
-    headers = {"Authorization": f"token {github_token}"}
-    
+def get_pr_files(owner, repo, pr_number, github_token, timeout=60, logger=None, base_sha=None, head_sha=None):
+    """Récupère la liste complète des fichiers modifiés dans une PR (pages de 100 lues en parallèle)"""
     try:
         logger.info(f"🔍 Récupération des fichiers de la PR #{pr_number}...")
         start_time = time.time()
-        response = requests.get(url, headers=headers, timeout=timeout)
-        response.raise_for_status()
+        files = list_pr_files(owner, repo, pr_number, github_token, base_sha, head_sha, timeout=timeout, logger=logger)
         elapsed_time = time.time() - start_time
         
-        files = response.json()
         logger.info(f"✅ {len(files)} fichier(s) trouvé(s) dans la PR (en {elapsed_time:.2f} secondes)")
         
         if logger and logger.level == logging.DEBUG:
@@ -105,17 +162,13 @@ def get_pr_files(owner, repo, pr_number, github_token, timeout=60, logger=None):
 
 def post_pr_comment(owner, repo, pr_number, comment, github_token, timeout=60, logger=None):
     """Publie un commentaire sur une pull request"""
-    url = f"https://api.github.com/repos/{owner}/{repo}/issues/{pr_number}/comments"
-    headers = {
-        "Authorization": f"token {github_token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
+    url = f"/repos/{owner}/{repo}/issues/{pr_number}/comments"
     data = {"body": comment}
     
     try:
         logger.info(f"📝 Publication du commentaire sur la PR #{pr_number}...")
         start_time = time.time()
-        response = requests.post(url, headers=headers, json=data, timeout=timeout)
+        response = get_client(github_token).post(url, json=data, timeout=timeout)
         response.raise_for_status()
         elapsed_time = time.time() - start_time
         
@@ -143,19 +196,88 @@ def post_pr_comment(owner, repo, pr_number, comment, github_token, timeout=60, l
                 logger.debug(f"Traceback: {traceback.format_exc()}")
         return False
 
-def main():
-    """Fonction principale"""
-    # Parse les arguments
-    args = parse_args()
+def post_pr_review(owner, repo, pr_number, commit_id, body, comments, github_token, timeout=60, logger=None):
+    """Publie une revue de PR avec ses commentaires en ligne, en une seule requête; renvoie la revue créée ou None"""
+    try:
+        logger.info(f"📝 Publication de la revue sur la PR #{pr_number} ({len(comments)} commentaire(s) en ligne)...")
+        start_time = time.time()
+        review = submit_review(owner, repo, pr_number, commit_id, body, comments, github_token, timeout, logger)
+        logger.info(f"✅ Revue publiée avec succès (en {time.time() - start_time:.2f} secondes)")
+        return review
+    except requests.exceptions.RequestException as e:
+        logger.error(f"❌ Erreur lors de la publication de la revue: {e}")
+        if (response := getattr(e, 'response', None)) is not None:
+            logger.error(f"   Code d'erreur: {response.status_code}, réponse: {response.text[:500]}")
+        return None
+
+def get_pr_details(owner, repo, pr_number, github_token, timeout=60, logger=None):
+    """Récupère les métadonnées d'une PR (SHA de tête et de base notamment)"""
+    url = f"/repos/{owner}/{repo}/pulls/{pr_number}"
     
-    # Configure le logger
-    logger = setup_logger(args.debug)
+    try:
+        response = get_client(github_token).get(url, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        if logger:
+            logger.error(f"❌ Erreur lors de la récupération des informations de la PR: {e}")
+        return None
+
+def get_compare_files(owner, repo, base_sha, head_sha, github_token, timeout=60, logger=None):
+    """
+    Compare deux commits et renvoie la réponse de l'API (statut et fichiers modifiés avec leur patch).
     
-    # En-tête
-    logger.info("=" * 50)
-    logger.info("🤖 AGENT D'ANALYSE DES PULL REQUESTS (VERSION AMÉLIORÉE)")
-    logger.info("=" * 50)
+    Renvoie None en cas d'erreur (par exemple si l'ancien SHA n'existe plus après un force-push).
+    """
+    url = f"/repos/{owner}/{repo}/compare/{base_sha}...{head_sha}"
     
+    try:
+        response = get_client(github_token).get(url, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        if logger:
+            logger.warning(f"⚠️ Comparaison {base_sha[:7]}...{head_sha[:7]} impossible: {e}")
+        return None
+
+def select_incremental_patches(owner, repo, python_files, head_sha, since_sha, github_token, timeout=60, logger=None):
+    """
+    Détermine le patch à examiner pour chaque fichier en mode incrémental.
+    
+    Si since_sha (tête de la dernière revue) est un ancêtre de la tête actuelle, seuls les
+    changements poussés depuis sont retenus et les fichiers inchangés depuis sont écartés.
+    Sinon, le patch complet de la PR est utilisé.
+    
+    Renvoie un dictionnaire {nom de fichier: patch ou None}.
+    """
+    patches = {file['filename']: file.get('patch') for file in python_files}
+    if not since_sha:
+        logger.info("ℹ️ Pas de revue précédente connue, examen des hunks de la PR")
+        return patches
+    
+    comparison = get_compare_files(owner, repo, since_sha, head_sha, github_token, timeout, logger)
+    if not comparison or comparison.get('status') not in ('ahead', 'identical'):
+        status = comparison.get('status') if comparison else 'inconnu'
+        logger.warning(f"⚠️ Historique réécrit depuis {since_sha[:7]} (statut: {status}), examen des hunks de la PR")
+        return patches
+    
+    changed = {file['filename']: file.get('patch') for file in comparison.get('files', [])}
+    selected = {name: changed[name] for name in patches if name in changed}
+    logger.info(
+        f"✅ Mode incrémental depuis {since_sha[:7]}: {len(selected)} fichier(s) modifié(s), "
+        f"{len(patches) - len(selected)} inchangé(s) ignoré(s)"
+    )
+    return selected
+
+def review_pull_request(args, logger, cache=None):
+    """
+    Examine une pull request et publie la revue.
+    
+    Appelée par main() ou par le service de webhooks (review_service.py), qui fournit
+    un cache de revues partagé entre les exécutions; ce cache n'est alors pas fermé.
+    
+    Renvoie un code de sortie (0 en cas de succès).
+    """
     # Vérifier les variables d'environnement
     if not verify_environment_vars(logger):
         return 1
@@ -176,15 +298,23 @@ def main():
     
     # Importer les modules nécessaires
     try:
-        from claude_code_reviewer import ReviewCrew, create_notion_page
+        from claude_code_reviewer import (
+            MAX_CHUNKED_FILE_BYTES, ReviewCrew, create_notion_page, fetch_file_contents, flush_notion_writer
+        )
+        from review_engine import TokenUsage, build_repo_context, log_sink, notion_sink, pr_comment_sink, token_usage
         logger.info("✅ Modules importés avec succès")
     except ImportError as e:
         logger.error(f"❌ Erreur d'importation des modules: {e}")
         logger.error("⚠️ Assurez-vous que toutes les dépendances sont installées (pip install -r requirements.txt)")
         return 1
     
+    # Le SHA de tête permet de lire les fichiers dans leur version de la PR (et de compléter les patchs omis)
+    pr_details = get_pr_details(owner, repo, args.pr, github_token, args.timeout, logger)
+    head_sha = pr_details['head']['sha'] if pr_details else None
+    base_sha = pr_details['base']['sha'] if pr_details else None
+    
     # Récupérer les fichiers modifiés dans la PR
-    pr_files = get_pr_files(owner, repo, args.pr, github_token, args.timeout, logger)
+    pr_files = get_pr_files(owner, repo, args.pr, github_token, args.timeout, logger, base_sha, head_sha)
     
     if not pr_files:
         logger.error("❌ Aucun fichier trouvé dans la PR ou erreur lors de la récupération.")
@@ -213,99 +343,195 @@ def main():
     # Filtrer les fichiers Python
     python_files = [file for file in pr_files if file['filename'].endswith('.py') and file['status'] != 'removed']
     
+    # Commentaire d'état réutilisé d'une exécution à l'autre (il porte aussi le SHA de la dernière revue)
+    status = None
+    if not args.no_status_comment:
+        status = StatusComment(owner, repo, args.pr, github_token, args.status_interval, args.timeout, logger)
+        status.find()
+    
     if not python_files:
         logger.warning("⚠️ Aucun fichier Python trouvé dans la PR.")
         comment = "⚠️ **Revue de code automatique**\n\nAucun fichier Python trouvé dans cette PR. Aucune analyse effectuée."
-        post_pr_comment(owner, repo, args.pr, comment, github_token, args.timeout, logger)
+        if not (status and status.finish(comment)):
+            post_pr_comment(owner, repo, args.pr, comment, github_token, args.timeout, logger)
         return 0
     
+    # Mode incrémental: ne retenir que les hunks modifiés (depuis la dernière revue si connue)
+    patches = {}
+    since_sha = args.since_sha
+    if args.incremental:
+        if not since_sha and status and status.previous_head:
+            since_sha = status.previous_head
+            logger.info(f"🔁 Dernière revue terminée sur {since_sha[:7]} (commentaire d'état)")
+        if head_sha:
+            patches = select_incremental_patches(
+                owner, repo, python_files, head_sha, since_sha, github_token, args.timeout, logger
+            )
+            python_files = [file for file in python_files if file['filename'] in patches]
+            if not python_files:
+                logger.info("✅ Aucun fichier Python modifié depuis la dernière revue, rien à analyser.")
+                return 0
+        else:
+            logger.warning("⚠️ Mode incrémental indisponible, examen des fichiers complets")
+    
     logger.info(f"✅ {len(python_files)} fichier(s) Python à analyser")
     
-    # Préparer le commentaire pour la PR
-    review_results = []
+    shared_cache = cache is not None
+    if not shared_cache:
+        cache = open_review_cache(args, logger)
+    blob_shas = {file['filename']: file.get('sha') for file in python_files}
     
-    # Analyser chaque fichier un par un
-    for i, file in enumerate(python_files):
-        filename = file['filename']
-        logger.info(f"📄 ({i+1}/{len(python_files)}) Analyse de {filename}...")
-        
-        # Exécuter l'équipe de revue
-        start_time = time.time()
+    # Modèle et max_tokens choisis par fichier selon la taille du diff et la complexité (moteur direct)
+    config = None
+    if args.config:
         try:
-            review_crew = ReviewCrew(owner=owner, repo=repo, page_id=page_id, path=filename)
-            result = review_crew.run()
-            elapsed_time = time.time() - start_time
-            
-            # Sauvegarder le résultat
-            review_results.append({
-                "file": filename,
-                "result": result,
-                "time": elapsed_time
-            })
-            
-            # Afficher les résultats
-            logger.info(f"✅ Revue terminée pour {filename} en {elapsed_time:.2f} secondes")
-        except Exception as e:
-            logger.error(f"❌ Erreur lors de l'analyse de {filename}: {e}")
-            if args.debug:
-                logger.debug(f"Traceback: {traceback.format_exc()}")
-            
-            # Ajouter un résultat d'erreur
-            review_results.append({
-                "file": filename,
-                "result": f"Erreur lors de l'analyse: {e}",
-                "error": True
-            })
-    
-    # Formater le commentaire pour la PR
-    review_comment = "# 🤖 Revue de code automatique\n\n"
-    review_comment += f"J'ai analysé {len(python_files)} fichier(s) Python dans cette PR.\n\n"
-    
-    for result in review_results:
-        review_comment += f"## Fichier: `{result['file']}`\n\n"
-        
-        if result.get('error'):
-            review_comment += f"⚠️ {result['result']}\n\n"
-        else:
-            try:
-                # Si le résultat est une chaîne représentant un tableau
-                if isinstance(result['result'], str):
-                    parsed_result = json.loads(result['result'].replace("'", "\""))
-                else:
-                    parsed_result = result['result']
-                
-                if isinstance(parsed_result, list) and len(parsed_result) >= 3:
-                    file_path = parsed_result[1]
-                    review_text = parsed_result[2]
-                    
-                    review_comment += f"### Analyse\n\n{review_text}\n\n"
-                    if len(parsed_result) >= 4:
-                        improved_code = parsed_result[3]
-                        review_comment += f"### Code amélioré suggéré\n\n```python\n{improved_code}\n```\n\n"
-                else:
-                    review_comment += f"⚠️ Format de résultat inattendu\n\n"
-            except Exception as e:
-                logger.error(f"❌ Erreur lors du traitement du résultat pour {result['file']}: {e}")
-                review_comment += f"⚠️ Erreur lors de l'analyse de ce fichier: {e}\n\n"
-        
-        review_comment += "---\n\n"
+            with open(args.config, 'r') as f:
+                config = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"❌ Impossible de charger la configuration {args.config}: {e}")
+            return 1
+    try:
+        router = ModelRouter.from_config(config, logger)
+    except ValueError as e:
+        logger.error(f"❌ Section model_routing invalide: {e}")
+        return 1
+    pr_patches = {file['filename']: file.get('patch') for file in pr_files}
     
-    review_comment += "\n\n> Cette revue a été générée automatiquement par Claude Code Review Agent."
-    review_comment += f"\n> Temps total d'analyse: {sum(r.get('time', 0) for r in review_results):.2f} secondes."
+    # Une seule archive de la tête de la PR remplace les appels contents par fichier
+    content_source = None
+    if args.source == "tarball":
+        if head_sha:
+            content_source = open_tarball_source(owner, repo, head_sha, github_token, logger)
+        else:
+            logger.warning("⚠️ SHA de tête inconnu, lecture des fichiers via l'API contents")
     
-    # Publier le commentaire sur la PR
-    if post_pr_comment(owner, repo, args.pr, review_comment, github_token, args.timeout, logger):
-        logger.info("✅ Commentaire publié sur la PR avec succès!")
+    # L'index de l'archive (et son fichier temporaire) est libéré même en cas d'erreur
+    try:
+        # Contexte commun aux revues de la PR: préfixe de prompt mis en cache par le moteur direct
+        repo_context = build_repo_context(repo, [file['filename'] for file in pr_files])
+    
+        # Jetons de cette PR seulement (le service enchaîne les revues dans le même processus)
+        usage = TokenUsage(parent=token_usage)
+    
+        # Destinations de la revue reçue avant la fin du correctif: journal, commentaire d'état, Notion
+        sinks = [log_sink(logger)]
+        if status:
+            sinks.append(pr_comment_sink(status))
+        if page_id:
+            sinks.append(notion_sink(page_id))
+    
+        def review_file(filename):
+            """Examine un fichier complet, ou seulement ses hunks modifiés en mode incrémental"""
+            content = full_content = None
+            patch = patches.get(filename)
+            if patch:
+                full_content = fetch_file_contents(
+                    filename, owner, repo, ref=head_sha, max_bytes=MAX_CHUNKED_FILE_BYTES, max_lines=None
+                )
+                content = build_excerpt(full_content, changed_ranges(patch), context=args.context_lines)
+                logger.debug(f"Extrait incrémental de {filename}: {len(content)} caractères sur {len(full_content)}")
+            return ReviewCrew(
+                owner=owner, repo=repo, page_id=page_id, path=filename,
+                blob_sha=blob_shas.get(filename), cache=cache, content=content,
+                engine=args.engine, ref=head_sha, repo_context=repo_context,
+                output_budget=args.output_budget, sinks=sinks,
+                output_mode=args.output_mode, source=full_content, chunk_lines=args.chunk_lines,
+                router=router, diff=patch or pr_patches.get(filename), usage=usage
+            ).run()
+    
+        header = "# 🤖 Revue de code automatique\n\n"
+        header += f"J'ai analysé {len(python_files)} fichier(s) Python dans cette PR.\n\n"
+        if patches:
+            since = f"depuis `{since_sha[:7]}`" if since_sha else "de la PR"
+            header += f"_Mode incrémental: seuls les hunks modifiés {since} ont été examinés._\n\n"
+    
+        # Les résultats apparaissent dans le commentaire d'état à mesure que les fichiers sont terminés
+        if status:
+            status.start(header, [file['filename'] for file in python_files])
+    
+        # Analyser les fichiers en parallèle (résultats conservés dans l'ordre de la PR)
+        logger.info(f"⚙️ Revues exécutées avec le moteur '{args.engine}' et une concurrence de {args.concurrency}")
+        review_start_time = time.time()
+        review_results = run_reviews(
+            [file['filename'] for file in python_files],
+            review_file,
+            concurrency=args.concurrency,
+            logger=logger,
+            on_result=status.record if status else None
+        )
+        review_elapsed_time = time.time() - review_start_time
+    finally:
+        if content_source:
+            content_source.close()
+    
+    if cache:
+        logger.info(f"♻️ Cache de revues: {cache.summary()}")
+        if not shared_cache:
+            cache.close()
+    
+    # Formater la revue: constats sur les lignes du diff de la PR, synthèses dans le corps
+    footer = "\n\n> Cette revue a été générée automatiquement par Claude Code Review Agent."
+    footer += f"\n> Temps total d'analyse: {review_elapsed_time:.2f} secondes."
+    
+    published = False
+    if args.publish == "review":
+        comments, sections, compact_sections, counts = build_review(review_results, pr_patches, repo)
+        logger.info(f"💬 {counts['inline']} constat(s) sur les lignes du diff, {counts['summary']} dans le corps de la revue")
+        body = fit_body(sections, compact_sections, header, footer)
+        review = post_pr_review(owner, repo, args.pr, head_sha, body, comments, github_token, args.timeout, logger)
+        published = review is not None
+        if published and status:
+            link = f"[revue de PR]({review['html_url']})" if review.get('html_url') else "revue de PR"
+            status.finish(
+                header + f"✅ Revue terminée: {counts['inline']} constat(s) en commentaires sur le diff et "
+                         f"{counts['summary']} dans le corps de la {link}." + footer,
+                head_sha
+            )
+        elif not published:
+            logger.warning("⚠️ Revue de PR refusée, publication d'un commentaire unique")
+    if not published:
+        # Commentaire unique (le commentaire d'état si possible): tous les constats dans le corps
+        _, sections, compact_sections, _ = build_review(review_results, {}, repo)
+        body = fit_body(sections, compact_sections, header, footer)
+        published = bool(status and status.finish(body, head_sha))
+        if not published:
+            published = post_pr_comment(owner, repo, args.pr, body, github_token, args.timeout, logger)
+    if status:
+        logger.info(f"💬 Commentaire d'état: {status.summary()}")
+    if published:
+        logger.info("✅ Revue publiée sur la PR avec succès!")
     else:
-        logger.error("❌ Échec de la publication du commentaire sur la PR.")
+        logger.error("❌ Échec de la publication de la revue sur la PR.")
         return 1
     
     logger.info("\n✅ Analyse de la PR terminée!")
     if page_id:
-        logger.info(f"📝 Les résultats ont été exportés vers Notion")
+        # Les revues sont exportées en arrière-plan: on attend la fin des écritures en file
+        summary = flush_notion_writer()
+        logger.info(f"📝 Les résultats ont été exportés vers Notion" + (f": {summary}" if summary else ""))
+    if router:
+        logger.info(f"🧭 Modèles choisis: {router.summary()}")
+    if usage.calls:
+        logger.info(f"🧮 Jetons Claude: {usage.summary()}")
+    get_client(github_token).log_stats(logger)
     
     return 0
 
+def main(argv=None):
+    """Fonction principale"""
+    # Parse les arguments
+    args = parse_args(argv)
+    
+    # Configure le logger
+    logger = setup_logger(args.debug)
+    
+    # En-tête
+    logger.info("=" * 50)
+    logger.info("🤖 AGENT D'ANALYSE DES PULL REQUESTS (VERSION AMÉLIORÉE)")
+    logger.info("=" * 50)
+    
+    return review_pull_request(args, logger)
+
 if __name__ == "__main__":
     # Capture l'heure de début pour calculer le temps total d'exécution
     start_time = time.time()
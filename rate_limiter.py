@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+"""
+Ordonnancement des appels GitHub en fonction du quota restant
+
+Le budget est suivi à partir des en-têtes X-RateLimit-* de chaque réponse.
+Les requêtes sont cadencées par un seau à jetons dont le débit diminue
+progressivement quand le budget s'épuise, les appels de métadonnées restant
+prioritaires sur les téléchargements de contenu. Les erreurs de limite
+secondaire (403/429 avec Retry-After) sont absorbées par une attente au lieu
+d'interrompre l'exécution.
+"""
+import threading
+import time
+from collections import deque
+
+# Priorités des requêtes: les métadonnées passent avant les contenus
+PRIORITY_METADATA = 0
+PRIORITY_CONTENT = 1
+
+# Ressources considérées comme du contenu (coûteuses et reportables)
+CONTENT_RESOURCES = ('/contents/', '/tarball/', '/zipball/', '/git/blobs/')
+
+# Paramètres par défaut du cadencement
+DEFAULT_MAX_RATE = 10.0          # requêtes par seconde quand le budget est confortable
+DEFAULT_BURST = 10               # capacité du seau à jetons
+DEFAULT_SLOWDOWN_RATIO = 0.2     # en dessous de 20 % du quota, le débit est lissé jusqu'au reset
+DEFAULT_RESERVE_RATIO = 0.05     # 5 % du quota réservés aux métadonnées
+SECONDARY_LIMIT_DELAY = 60       # attente par défaut sur limite secondaire sans Retry-After
+MAX_SLEEP_CHUNK = 5.0            # les attentes longues sont découpées pour réévaluer l'état
+
+
+def request_priority(method, url):
+    """Classe une requête en métadonnée ou contenu"""
+    if method.upper() == 'GET' and any(resource in url for resource in CONTENT_RESOURCES):
+        return PRIORITY_CONTENT
+    return PRIORITY_METADATA
+
+
+class RateLimitScheduler:
+    """Seau à jetons piloté par les en-têtes de quota GitHub"""
+
+    def __init__(self, max_rate=DEFAULT_MAX_RATE, burst=DEFAULT_BURST,
+                 slowdown_ratio=DEFAULT_SLOWDOWN_RATIO, reserve_ratio=DEFAULT_RESERVE_RATIO):
+        """
+        Paramètres:
+        - max_rate: Débit maximal (requêtes/seconde) quand le budget est confortable.
+        - burst: Nombre de requêtes pouvant partir d'un coup.
+        - slowdown_ratio: Fraction du quota en dessous de laquelle le débit est lissé.
+        - reserve_ratio: Fraction du quota réservée aux requêtes de métadonnées.
+        """
+        self.max_rate = max_rate
+        self.burst = burst
+        self.slowdown_ratio = slowdown_ratio
+        self.reserve_ratio = reserve_ratio
+
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        self.blocked_until = 0.0
+        self.waited = 0.0
+        self.rate_limited = 0
+
+        self._tokens = float(burst)
+        self._last_refill = time.time()
+        self._samples = deque(maxlen=50)
+        self._lock = threading.Lock()
+
+    def _current_rate(self, now):
+        """Débit autorisé: maximal tant que le budget est confortable, puis étalé jusqu'au reset"""
+        if self.remaining is None or self.limit is None:
+            return self.max_rate
+        if self.remaining > self.limit * self.slowdown_ratio:
+            return self.max_rate
+        time_left = max(1.0, (self.reset_at or now) - now)
+        return max(0.01, min(self.max_rate, self.remaining / time_left))
+
+    def _wait_time(self, now, priority):
+        """Temps à attendre avant de pouvoir émettre une requête de cette priorité"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+
+        if self.remaining is not None and self.limit is not None:
+            reserve = self.limit * self.reserve_ratio if priority == PRIORITY_CONTENT else 0
+            if self.remaining <= reserve and self.reset_at and self.reset_at > now:
+                return self.reset_at - now
+
+        rate = self._current_rate(now)
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * rate)
+        self._last_refill = now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / rate
+
+    def acquire(self, priority=PRIORITY_METADATA):
+        """Bloque jusqu'à ce qu'une requête de cette priorité puisse partir"""
+        while True:
+            with self._lock:
+                now = time.time()
+                wait = self._wait_time(now, priority)
+                if wait <= 0:
+                    self._tokens -= 1
+                    if self.remaining is not None:
+                        # Estimation locale en attendant les en-têtes de la réponse
+                        self.remaining = max(0, self.remaining - 1)
+                    return
+            sleep_time = min(wait, MAX_SLEEP_CHUNK)
+            with self._lock:
+                self.waited += sleep_time
+            time.sleep(sleep_time)
+
+    def update(self, response):
+        """Met à jour le budget à partir des en-têtes d'une réponse GitHub"""
+        headers = response.headers
+        resource = headers.get('X-RateLimit-Resource', 'core')
+        if resource != 'core' or 'X-RateLimit-Remaining' not in headers:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                self.limit = int(headers.get('X-RateLimit-Limit', self.limit or 0)) or self.limit
+                self.remaining = int(headers['X-RateLimit-Remaining'])
+                self.reset_at = float(headers.get('X-RateLimit-Reset', self.reset_at or now))
+            except ValueError:
+                return
+            self._samples.append((now, self.remaining))
+
+    def retry_delay(self, response):
+        """
+        Délai à respecter avant de rejouer une requête refusée pour cause de quota.
+
+        Renvoie None si la réponse n'est pas une erreur de limite.
+        """
+        if response.status_code not in (403, 429):
+            return None
+        headers = response.headers
+        now = time.time()
+        delay = None
+        if headers.get('Retry-After'):
+            try:
+                delay = float(headers['Retry-After'])
+            except ValueError:
+                delay = SECONDARY_LIMIT_DELAY
+        elif headers.get('X-RateLimit-Remaining') == '0' and headers.get('X-RateLimit-Reset'):
+            delay = max(1.0, float(headers['X-RateLimit-Reset']) - now)
+        elif 'rate limit' in (getattr(response, 'text', '') or '').lower():
+            delay = SECONDARY_LIMIT_DELAY
+        if delay is None:
+            return None
+        with self._lock:
+            self.rate_limited += 1
+            self.blocked_until = max(self.blocked_until, now + delay)
+        return delay
+
+    def projected_exhaustion_seconds(self):
+        """
+        Temps estimé avant épuisement du budget au rythme de consommation observé.
+
+        Renvoie None si le rythme n'est pas encore mesurable ou si le budget se reconstitue.
+        """
+        with self._lock:
+            if len(self._samples) < 2 or self.remaining is None:
+                return None
+            (first_time, first_remaining), (last_time, last_remaining) = self._samples[0], self._samples[-1]
+        elapsed = last_time - first_time
+        consumed = first_remaining - last_remaining
+        if elapsed <= 0 or consumed <= 0:
+            return None
+        return self.remaining / (consumed / elapsed)
+
+    def summary(self):
+        """Résumé lisible de l'état du quota"""
+        if self.remaining is None:
+            return "quota inconnu (aucun en-tête reçu)"
+        text = f"{self.remaining}/{self.limit} requête(s) restante(s)"
+        if self.reset_at:
+            text += f", reset dans {max(0, self.reset_at - time.time()):.0f} s"
+        projected = self.projected_exhaustion_seconds()
+        if projected is not None:
+            text += f", épuisement projeté dans {projected:.0f} s"
+        if self.waited:
+            text += f", {self.waited:.1f} s d'attente de cadencement"
+        if self.rate_limited:
+            text += f", {self.rate_limited} refus pour limite de débit absorbé(s)"
+        return text
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Chargement de l'arborescence d'un dépôt GitHub via l'API Git Trees
+
+Un seul appel récursif suffit dans la grande majorité des cas ; si GitHub
+signale une réponse tronquée, les sous-arbres sont récupérés en parallèle.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from github_client import get_client
+
+# Répertoires ignorés par défaut lors du rendu de l'arborescence
+DEFAULT_IGNORE_DIRS = {'public', 'images', 'media', 'assets', 'node_modules', '.git'}
+
+
+def _fetch_tree(owner, repo, tree_sha, token, recursive=True, timeout=30):
+    """Effectue un appel à l'API Git Trees et renvoie la réponse JSON"""
+    params = {'recursive': '1'} if recursive else None
+    response = get_client(token).get(f"/repos/{owner}/{repo}/git/trees/{tree_sha}", params=params, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def _make_entry(item, prefix):
+    """Convertit un élément de l'API Git Trees en entrée structurée"""
+    return {
+        'path': f"{prefix}{item['path']}",
+        'type': item['type'],
+        'size': item.get('size'),
+        'sha': item['sha'],
+    }
+
+
+def fetch_repo_tree(owner, repo, token, ref="HEAD", max_workers=8, timeout=30):
+    """
+    Récupère l'arborescence complète d'un dépôt GitHub.
+
+    Paramètres:
+    - owner: Le nom d'utilisateur du propriétaire du dépôt.
+    - repo: Le nom du dépôt.
+    - token: Le token GitHub utilisé pour l'authentification.
+    - ref: La branche, le tag ou le SHA à parcourir (HEAD par défaut).
+    - max_workers: Nombre de requêtes simultanées si la réponse est tronquée.
+
+    Renvoie une liste d'entrées {path, type, size, sha} triée par chemin.
+    """
+    root = _fetch_tree(owner, repo, ref, token, recursive=True, timeout=timeout)
+    if not root.get('truncated'):
+        entries = [_make_entry(item, '') for item in root.get('tree', [])]
+        return sort_entries(entries)
+
+    # Réponse tronquée: on repart de la racine et on descend niveau par niveau,
+    # chaque sous-arbre étant demandé récursivement en parallèle
+    entries = []
+    pending = []
+    listing = _fetch_tree(owner, repo, root['sha'], token, recursive=False, timeout=timeout)
+    for item in listing.get('tree', []):
+        entries.append(_make_entry(item, ''))
+        if item['type'] == 'tree':
+            pending.append((item['sha'], f"{item['path']}/"))
+
+    def fetch_subtree(job):
+        sha, prefix = job
+        return sha, prefix, _fetch_tree(owner, repo, sha, token, recursive=True, timeout=timeout)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending:
+            truncated = []
+            for sha, prefix, subtree in executor.map(fetch_subtree, pending):
+                if subtree.get('truncated'):
+                    truncated.append((sha, prefix))
+                    continue
+                entries.extend(_make_entry(item, prefix) for item in subtree.get('tree', []))
+
+            # Les sous-arbres encore tronqués sont listés sans récursion, puis
+            # leurs propres sous-dossiers sont planifiés pour le tour suivant
+            pending = []
+            listings = executor.map(
+                lambda job: (job[1], _fetch_tree(owner, repo, job[0], token, recursive=False, timeout=timeout)),
+                truncated
+            )
+            for prefix, sublisting in listings:
+                for item in sublisting.get('tree', []):
+                    entries.append(_make_entry(item, prefix))
+                    if item['type'] == 'tree':
+                        pending.append((item['sha'], f"{prefix}{item['path']}/"))
+
+    return sort_entries(entries)
+
+
+def sort_entries(entries):
+    """Trie les entrées composant par composant pour garder les dossiers groupés"""
+    return sorted(entries, key=lambda entry: entry['path'].split('/'))
+
+
+def is_ignored(path, ignore_dirs=DEFAULT_IGNORE_DIRS):
+    """Indique si un chemin traverse un des répertoires ignorés"""
+    return any(part in ignore_dirs for part in path.split('/'))
+
+
+def render_tree_text(entries, ignore_dirs=DEFAULT_IGNORE_DIRS):
+    """
+    Construit la vue texte indentée de l'arborescence à partir des entrées structurées.
+
+    Le format est celui attendu par l'agent de chemin :
+    - src
+      - components
+        - Login.jsx
+    """
+    lines = []
+    for entry in sort_entries(entries):
+        if is_ignored(entry['path'], ignore_dirs):
+            continue
+        parts = entry['path'].split('/')
+        lines.append(f"{' ' * ((len(parts) - 1) * 2)}- {parts[-1]}\n")
+    return "".join(lines)
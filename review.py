@@ -12,6 +12,7 @@ from textwrap import dedent
 from langchain.tools import tool
 from crewai import Agent, Task, Crew, Process
 from anthropic import Anthropic
+from repo_tree import fetch_repo_tree, render_tree_text
 
 # Chargement des variables d'environnement
 load_dotenv()
@@ -24,8 +25,9 @@ NOTION_API_KEY = os.getenv("NOTION_API_KEY")
 # Configuration d'Anthropic (Claude API)
 anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY)
 
-# Variable globale pour stocker la structure du dépôt
+# Variables globales pour stocker la structure du dépôt (vue texte et entrées structurées)
 global_path = ""
+global_tree = []
 
 # Configuration Notion (si la clé est présente)
 if NOTION_API_KEY:
@@ -56,41 +58,31 @@ def create_notion_page(project_name):
         print(f"❌ Erreur lors de la création de la page Notion: {e}")
         return None
 
-def get_file_tree(owner, repo, path='', level=0):
+def get_file_tree(owner, repo, ref="HEAD"):
     """
-    Récupère et affiche la structure arborescente d'un dépôt GitHub, en ignorant 
-    certains dossiers spécifiques.
+    Récupère la structure arborescente d'un dépôt GitHub en un seul appel à l'API
+    Git Trees, en ignorant certains dossiers spécifiques dans la vue texte.
     
     Paramètres:
     - owner: Le nom d'utilisateur du propriétaire du dépôt.
     - repo: Le nom du dépôt.
-    - path: Le chemin à récupérer. Laisser vide pour récupérer le répertoire racine.
-    - level: La profondeur actuelle dans la structure arborescente.
-    """
-    # Répertoires à ignorer
-    ignore_dirs = {'public', 'images', 'media', 'assets', 'node_modules', '.git'}
-    global global_path
+    - ref: La branche, le tag ou le SHA à parcourir (HEAD par défaut).
     
-    api_url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
-    # Ajout de l'en-tête Authorization avec le token
-    headers = {'Authorization': f'token {GITHUB_SECRET_KEY}'}
+    Renvoie la liste des entrées {path, type, size, sha} (ou None en cas d'erreur)
+    et met à jour global_path avec la vue texte indentée.
+    """
+    global global_path, global_tree
     
     try:
-        # Effectue la requête
-        response = requests.get(api_url, headers=headers)
-        items = response.json()
-        
-        if isinstance(items, list):
-            for item in items:
-                # Ignorer les répertoires spécifiés
-                if item['name'] in ignore_dirs:
-                    continue
-                
-                global_path += f"{' ' * (level * 2)}- {item['name']}\n"
-                if item['type'] == 'dir':
-                    get_file_tree(owner, repo, item['path'], level + 1)
+        global_tree = fetch_repo_tree(owner, repo, GITHUB_SECRET_KEY, ref=ref)
+        global_path = render_tree_text(global_tree)
+        return global_tree
+    except requests.exceptions.HTTPError as e:
+        print(f"❌ Erreur HTTP {e.response.status_code}: {e.response.reason}")
+        print(f"URL: {e.request.url}")
     except Exception as e:
         print(f"❌ Erreur lors de la récupération de la structure du dépôt: {e}")
+    return None
 
 class Tools:
     """Outils personnalisés pour les agents"""
@@ -464,8 +456,6 @@ def main():
     print(f"\n🔍 Analyse du dépôt {owner}/{repo}...")
     
     # Récupération de la structure arborescente du dépôt GitHub
-    global global_path
-    global_path = ""
     get_file_tree(owner=owner, repo=repo)
     
     if not global_path:
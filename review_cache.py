@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""
+Cache persistant des revues de code, adressé par contenu
+
+La clé combine le SHA du blob Git, l'empreinte des consignes de revue, le
+modèle et les paramètres de revue : un fichier inchangé revu avec les mêmes
+consignes est servi depuis le disque sans appel au modèle. Le cache est
+stocké dans une base SQLite et borné en taille et en âge.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Emplacement et limites par défaut du cache
+DEFAULT_CACHE_PATH = os.path.join(".review_cache", "reviews.sqlite")
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024  # 100 Mo
+DEFAULT_MAX_AGE_DAYS = 30
+
+
+class ReviewCache:
+    """Cache SQLite des résultats de revue avec éviction par taille et par âge"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        """
+        Ouvre (ou crée) le cache.
+
+        Paramètres:
+        - path: Chemin du fichier SQLite.
+        - max_bytes: Taille totale maximale des résultats stockés.
+        - max_age_days: Âge maximal d'une entrée avant éviction.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Une seule connexion partagée entre les threads de revue, protégée par le verrou
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reviews (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_reviews_accessed ON reviews(accessed_at)")
+        self._conn.commit()
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def make_key(blob_sha, prompt_hash, model, settings=None):
+        """Construit la clé du cache à partir du contenu et de la configuration de revue"""
+        settings_json = json.dumps(settings or {}, sort_keys=True, ensure_ascii=False)
+        raw = f"{blob_sha}|{prompt_hash}|{model}|{settings_json}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Renvoie le résultat en cache pour cette clé, ou None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM reviews WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE reviews SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """Enregistre un résultat de revue (sérialisable en JSON)"""
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reviews (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload.encode('utf-8')), now, now)
+            )
+            self.writes += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Supprime les entrées expirées puis les moins récemment utilisées au-delà de la taille maximale"""
+        cursor = self._conn.execute("DELETE FROM reviews WHERE created_at < ?", (time.time() - self.max_age,))
+        self.evictions += cursor.rowcount
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM reviews").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM reviews ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM reviews WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        """Renvoie les compteurs du cache pour l'exécution en cours"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def summary(self):
+        """Résumé lisible des compteurs, pour les logs de fin d'exécution"""
+        stats = self.stats()
+        return (
+            f"{stats['hits']} hit(s), {stats['misses']} miss(es), {stats['writes']} écriture(s), "
+            f"{stats['evictions']} éviction(s) - taux de hit {stats['hit_rate']:.0%}"
+        )
+
+    def close(self):
+        """Ferme la connexion SQLite"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,671 @@
+#!/usr/bin/env python
+"""
+Moteur de revue direct, sans agents intermédiaires
+
+Le contenu est récupéré directement via l'API GitHub, la revue est obtenue
+en un seul appel à Claude et le résultat est écrit directement dans Notion.
+La revue est renvoyée par l'outil submit_review (schéma dans review_schema) et
+le résultat reste compatible avec celui de l'équipe CrewAI :
+[project_name, file_path, review, updated_code].
+
+Le prompt système est un préfixe stable (consignes, puis contexte du dépôt)
+marqué pour le cache de prompts d'Anthropic : seul le message contenant le
+fichier varie d'une revue à l'autre.
+
+Les fichiers qui dépassent les limites de taille sont découpés en morceaux
+syntaxiques (code_chunker) examinés en parallèle ; les constats et correctifs
+sont fusionnés avec des numéros de ligne globaux.
+
+La réponse est lue en flux : la revue est décodée au fil de l'eau et transmise
+aux destinations partielles avant la fin de updated_code, et la génération est
+interrompue si le budget de sortie est dépassé.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from textwrap import dedent
+
+from claude_code_reviewer import (
+    EXCERPT_NOTE,
+    MAX_CHUNKED_FILE_BYTES,
+    REVIEW_MODEL,
+    REVIEW_TEMPERATURE,
+    FileSkipped,
+    append_review_to_notion,
+    fetch_file_contents,
+    get_anthropic_client,
+    get_notion_writer,
+    get_setting,
+)
+from code_chunker import DEFAULT_CHUNK_LINES, chunk_file, merge_patches, remap_findings, render_chunk
+from diff_utils import number_lines
+from notion_sink import heading_block, text_blocks
+from review_schema import REVIEW_TOOL, REVIEW_TOOL_NAME, ReviewResult, ReviewSchemaError, validate_review_payload
+
+# Nombre maximal de jetons générés pour une revue
+DEFAULT_MAX_TOKENS = 4096
+
+# Point d'arrêt du cache de prompts (durée de vie courte, prolongée à chaque lecture)
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# Nombre maximal de chemins listés dans le contexte du dépôt
+MAX_CONTEXT_PATHS = 500
+
+# Estimation du nombre de caractères par jeton, pour le budget de sortie en flux
+CHARS_PER_TOKEN = 4
+
+# Mention ajoutée à la revue quand updated_code n'a pas pu être obtenu en entier
+TRUNCATED_NOTE = "\n\n_(updated_code omis: {reason})_"
+
+# Nombre de morceaux d'un même fichier examinés en parallèle
+DEFAULT_CHUNK_CONCURRENCY = 4
+
+# Formes de la correction renvoyée: correctif (diff / rechercher-remplacer) ou fichier complet
+OUTPUT_MODES = ("patch", "full")
+DEFAULT_OUTPUT_MODE = "patch"
+
+# Consignes du moteur direct: même exigence que la tâche de revue, sortie structurée
+ENGINE_SYSTEM_PROMPT = dedent("""
+Tu es un développeur logiciel senior dans une grande entreprise et tu dois effectuer une revue
+de code sur un contenu de fichier donné.
+
+Examine le fichier donné et fournis des retours détaillés sur les points qui ne respectent pas
+les standards de code de l'industrie.
+Chaque ligne du contenu est précédée de son numéro : localise chaque constat par sa plage
+de lignes (line_start, line_end) et attribue-lui une sévérité (critical, major, minor, info).
+""").strip()
+
+# Consignes propres à chaque forme de correction
+OUTPUT_MODE_INSTRUCTIONS = {
+    "patch": dedent("""
+    Apporte des modifications au contenu du fichier pour l'améliorer, mais ne renvoie jamais le
+    fichier complet : exprime les corrections soit dans patch, sous forme de diff unifié relatif
+    au fichier d'origine (en-têtes @@ avec les numéros de ligne d'origine, trois lignes de contexte),
+    soit dans edits, sous forme de blocs rechercher/remplacer dont le texte recherché est recopié
+    exactement depuis le fichier et apparaît une seule fois. N'inclus jamais les numéros de ligne
+    dans le code des correctifs et laisse updated_code vide.
+    """).strip(),
+    "full": dedent("""
+    Apporte des modifications au contenu du fichier pour l'améliorer et renvoie le contenu modifié,
+    sans les numéros de ligne, comme updated_code ; n'envoie updated_code que si le fichier a été modifié.
+    """).strip(),
+}
+
+# Rappel final commun à toutes les formes de correction
+ENGINE_TOOL_REMINDER = dedent("""
+Renvoie toujours la revue en appelant l'outil submit_review : la synthèse dans review,
+puis les constats dans findings.
+""").strip()
+
+# Consigne ajoutée en mode correctif lorsque seuls des extraits numérotés du fichier sont fournis
+PATCH_EXCERPT_NOTE = dedent("""
+Le contenu fourni ne contient que des extraits modifiés du fichier {path},
+chaque ligne étant précédée de son numéro dans le fichier. Concentre la revue sur ces
+lignes et cite les numéros de ligne d'origine ; les correctifs s'appliquent au fichier complet.
+""")
+
+CHUNK_NOTE = dedent("""
+Le fichier {path} est trop volumineux pour être examiné en une fois : le contenu fourni
+en est le morceau des lignes {start} à {end}, précédé de l'en-tête commun du fichier
+(docstring, imports), chaque ligne étant précédée de son numéro dans le fichier. Examine
+uniquement les lignes {start} à {end}, cite les numéros de ligne d'origine ; les correctifs
+s'appliquent au fichier complet.
+""")
+
+
+def engine_system_prompt(output_mode=DEFAULT_OUTPUT_MODE):
+    """Consignes complètes du moteur direct pour une forme de correction"""
+    return "\n\n".join([ENGINE_SYSTEM_PROMPT, OUTPUT_MODE_INSTRUCTIONS[output_mode], ENGINE_TOOL_REMINDER])
+
+
+def engine_prompt_hash(output_mode=DEFAULT_OUTPUT_MODE):
+    """Empreinte des consignes du moteur direct, pour la clé du cache de revues"""
+    prompt = engine_system_prompt(output_mode)
+    return hashlib.sha256(f"{prompt}|{REVIEW_TEMPERATURE}".encode('utf-8')).hexdigest()[:16]
+
+
+def build_repo_context(repo, paths=(), settings=None):
+    """
+    Contexte du dépôt commun à toutes les revues d'une exécution.
+
+    Paramètres:
+    - repo: Nom du dépôt.
+    - paths: Chemins des fichiers du dépôt (ou de la PR) à lister.
+    - settings: Paramètres de revue (language_focus, checks).
+    """
+    settings = settings or {}
+    lines = [f"Dépôt examiné : {repo}"]
+    if settings.get('language_focus'):
+        lines.append(f"Langage principal : {settings['language_focus']}")
+    if settings.get('checks'):
+        lines.append(f"Points de contrôle prioritaires : {', '.join(settings['checks'])}")
+    paths = sorted(paths)
+    if paths:
+        lines.append("")
+        lines.append("Fichiers du dépôt :")
+        lines.extend(f"- {path}" for path in paths[:MAX_CONTEXT_PATHS])
+        if len(paths) > MAX_CONTEXT_PATHS:
+            lines.append(f"- ... et {len(paths) - MAX_CONTEXT_PATHS} autre(s) fichier(s)")
+    return "\n".join(lines)
+
+
+def build_system_blocks(repo_context=None, output_mode=DEFAULT_OUTPUT_MODE):
+    """
+    Prompt système découpé en blocs avec un point d'arrêt de cache après chaque bloc.
+
+    Les consignes sont partagées par tous les dépôts, le contexte par toutes les
+    revues d'un même dépôt; le contenu du fichier reste dans le message utilisateur.
+    """
+    blocks = [{"type": "text", "text": engine_system_prompt(output_mode), "cache_control": CACHE_CONTROL}]
+    if repo_context:
+        blocks.append({"type": "text", "text": repo_context, "cache_control": CACHE_CONTROL})
+    return blocks
+
+
+class TokenUsage:
+    """
+    Cumul des jetons consommés par les appels de revue d'une exécution
+
+    Un compteur créé avec `parent` (ex: celui d'une seule PR) reporte aussi chaque
+    usage dans le compteur parent (token_usage, cumul du processus).
+    """
+
+    # Coût relatif des jetons d'entrée: écriture dans le cache et lecture depuis le cache
+    CACHE_WRITE_FACTOR = 1.25
+    CACHE_READ_FACTOR = 0.1
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_creation_input_tokens = 0
+        self.cache_read_input_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, usage):
+        """Ajoute l'usage d'une réponse (objet du SDK ou dictionnaire des résultats de lot)"""
+        if usage is None:
+            return
+
+        def read(name):
+            value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+            return value or 0
+
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += read('input_tokens')
+            self.output_tokens += read('output_tokens')
+            self.cache_creation_input_tokens += read('cache_creation_input_tokens')
+            self.cache_read_input_tokens += read('cache_read_input_tokens')
+        if self.parent is not None:
+            self.parent.record(usage)
+
+    def input_savings(self):
+        """Part du coût d'entrée économisée par rapport à des appels sans cache"""
+        uncached = self.input_tokens + self.cache_creation_input_tokens + self.cache_read_input_tokens
+        if not uncached:
+            return 0.0
+        cost = (self.input_tokens + self.cache_creation_input_tokens * self.CACHE_WRITE_FACTOR
+                + self.cache_read_input_tokens * self.CACHE_READ_FACTOR)
+        return 1 - cost / uncached
+
+    def summary(self):
+        """Résumé lisible de l'usage, pour les logs de fin d'exécution"""
+        return (
+            f"{self.calls} appel(s), {self.input_tokens} jeton(s) d'entrée non cachés, "
+            f"{self.cache_creation_input_tokens} écrit(s) dans le cache, {self.cache_read_input_tokens} lu(s) "
+            f"depuis le cache, {self.output_tokens} jeton(s) de sortie - "
+            f"économie estimée sur l'entrée {self.input_savings():.0%}"
+        )
+
+
+# Usage cumulé de toutes les revues du processus
+token_usage = TokenUsage()
+
+
+def build_user_message(path, content, excerpt=False, output_mode=DEFAULT_OUTPUT_MODE, chunk=None):
+    """Message utilisateur contenant le fichier, les extraits ou le morceau (chunk) à examiner"""
+    message = f"Chemin du fichier : {path}\n"
+    if chunk is not None:
+        message += CHUNK_NOTE.format(path=path, start=chunk['start'], end=chunk['end'])
+    elif excerpt:
+        message += (PATCH_EXCERPT_NOTE if output_mode == "patch" else EXCERPT_NOTE).format(path=path)
+    else:
+        content = number_lines(content.split('\n'))
+    return message + f"\nVoici le contenu à examiner :\n```\n{content}\n```"
+
+
+class IncrementalReviewParser:
+    """
+    Décodage au fil de l'eau des champs de la réponse JSON {"review", "updated_code"}.
+
+    Chaque morceau reçu n'est parcouru qu'une fois : pour chaque champ, on repère
+    l'ouverture de la chaîne puis on avance jusqu'au guillemet fermant non échappé.
+    """
+
+    FIELDS = ('review', 'updated_code')
+
+    def __init__(self):
+        self.buffer = ""
+        self._fields = {
+            field: {'pattern': re.compile(r'"%s"\s*:\s*"' % field), 'start': None, 'pos': 0,
+                    'escape': False, 'end': None, 'search_from': 0}
+            for field in self.FIELDS
+        }
+
+    def feed(self, chunk):
+        """Ajoute un morceau de texte reçu et avance l'analyse de chaque champ"""
+        self.buffer += chunk
+        for state in self._fields.values():
+            if state['end'] is not None:
+                continue
+            if state['start'] is None:
+                match = state['pattern'].search(self.buffer, state['search_from'])
+                if match is None:
+                    # La clé peut être coupée entre deux morceaux: on garde une marge
+                    state['search_from'] = max(0, len(self.buffer) - 32)
+                    continue
+                state['start'] = state['pos'] = match.end()
+            self._advance(state)
+
+    def _advance(self, state):
+        """Avance jusqu'au guillemet fermant du champ, en tenant compte des échappements"""
+        buffer, pos, escape = self.buffer, state['pos'], state['escape']
+        while pos < len(buffer):
+            char = buffer[pos]
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                state['end'] = pos
+                break
+            pos += 1
+        state['pos'], state['escape'] = pos, escape
+
+    def is_complete(self, field):
+        """Indique si la chaîne du champ a été reçue en entier"""
+        return self._fields[field]['end'] is not None
+
+    def value(self, field):
+        """Valeur décodée du champ (éventuellement partielle), ou None s'il n'a pas commencé"""
+        state = self._fields[field]
+        if state['start'] is None:
+            return None
+        raw = self.buffer[state['start']:state['end'] if state['end'] is not None else state['pos']]
+        # Une séquence d'échappement coupée en fin de morceau est ignorée jusqu'au suivant
+        for trim in range(0, 7):
+            try:
+                return json.loads(f'"{raw[:len(raw) - trim]}"')
+            except json.JSONDecodeError:
+                continue
+        return raw
+
+    @property
+    def size(self):
+        """Nombre de caractères reçus"""
+        return len(self.buffer)
+
+
+def log_sink(logger=None):
+    """Destination partielle qui journalise la revue dès qu'elle est disponible"""
+    logger = logger or logging.getLogger('code_review')
+
+    def sink(path, review):
+        logger.info(f"📝 Revue de {path} disponible ({len(review)} caractères), updated_code en cours de génération")
+        logger.debug(f"Revue partielle de {path}: {review}")
+    return sink
+
+
+def pr_comment_sink(status):
+    """Destination partielle qui affiche la revue dans le commentaire d'état de la PR (github_pr.StatusComment)"""
+    def sink(path, review):
+        status.partial(path, review)
+    return sink
+
+
+def notion_sink(page_id):
+    """
+    Destination partielle qui met en file la revue pour la page Notion dès qu'elle est disponible.
+
+    Le moteur qui écrit sur la même page n'y ajoute ensuite que les constats et le code.
+    """
+    def sink(path, review):
+        if not get_setting("NOTION_API_KEY") or not page_id:
+            return
+        blocks = [heading_block(f"📝 Revue de {path} (correctif en cours)")] + text_blocks("paragraph", review)
+        get_notion_writer().submit(page_id, blocks, label=f"{path} (revue partielle)")
+    sink.notion_page_id = page_id
+    return sink
+
+
+def message_payload(content):
+    """
+    Extrait la réponse d'une liste de blocs de contenu (objets du SDK ou dictionnaires des lots).
+
+    Renvoie l'entrée de l'outil de revue si le modèle l'a appelé, sinon le texte concaténé.
+    """
+    texts = []
+    for block in content:
+        get = block.get if isinstance(block, dict) else lambda name, default=None: getattr(block, name, default)
+        if get('type') == 'tool_use' and get('name') == REVIEW_TOOL_NAME:
+            return get('input')
+        if get('type') == 'text':
+            texts.append(get('text', ''))
+    return "".join(texts)
+
+
+def parse_review_output(payload, project_name, path):
+    """
+    Convertit la réponse du modèle en ReviewResult [project_name, file_path, review, updated_code].
+
+    L'entrée de l'outil (ou un objet JSON équivalent dans le texte) est validée et
+    réparée localement; à défaut, l'ancien format tableau ou le texte brut est conservé
+    comme revue. Lève ReviewSchemaError si l'entrée de l'outil n'est pas exploitable.
+    """
+    try:
+        return ReviewResult.from_payload(validate_review_payload(payload, path), project_name, path)
+    except ReviewSchemaError:
+        if isinstance(payload, dict):
+            raise
+        return ReviewResult.from_value(payload, project_name, path)
+
+
+class DirectReviewEngine:
+    """Revue d'un fichier en un seul appel à Claude"""
+
+    def __init__(self, owner, repo, page_id, path, ref=None, content=None,
+                 model=REVIEW_MODEL, max_tokens=DEFAULT_MAX_TOKENS, repo_context=None,
+                 stream=True, output_budget=None, sinks=None, output_mode=DEFAULT_OUTPUT_MODE, source=None,
+                 chunk_lines=DEFAULT_CHUNK_LINES, chunk_concurrency=DEFAULT_CHUNK_CONCURRENCY, chunk=None,
+                 router=None, diff=None, usage=None):
+        """
+        Paramètres:
+        - owner, repo: Propriétaire et nom du dépôt.
+        - page_id: Page Notion où écrire le résultat (optionnel).
+        - path: Chemin du fichier à examiner.
+        - ref: Branche, tag ou SHA à lire (branche par défaut si None).
+        - content: Extraits numérotés déjà préparés (mode incrémental), à la place du fichier complet.
+        - model, max_tokens: Modèle et budget de sortie de l'appel de revue.
+        - repo_context: Contexte du dépôt (build_repo_context), mis en cache avec les consignes.
+        - stream: Lire la réponse en flux (sinon un seul appel bloquant).
+        - output_budget: Nombre de jetons de sortie au-delà duquel la génération est interrompue.
+        - sinks: Fonctions sink(path, review) appelées dès que la revue est reçue,
+          avant la fin de updated_code.
+        - output_mode: "patch" (diff unifié ou blocs rechercher/remplacer) ou "full" (fichier complet).
+        - source: Contenu complet d'origine quand `content` n'en est qu'un extrait, pour appliquer
+          les correctifs (le fichier récupéré est utilisé sinon).
+        - chunk_lines: Taille des morceaux d'un fichier trop volumineux (None ou 0: fichier ignoré).
+        - chunk_concurrency: Nombre de morceaux examinés en parallèle.
+        - chunk: Morceau {start, end} que représente `content` (revue d'un morceau).
+        - router: ModelRouter choisissant model et max_tokens d'après le contenu (optionnel).
+        - diff: Diff unifié des modifications examinées, utilisé par le routeur (optionnel).
+        - usage: TokenUsage où compter les jetons consommés (token_usage par défaut).
+        """
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"Forme de correction inconnue: {output_mode} (attendu: {', '.join(OUTPUT_MODES)})")
+        self.owner = owner
+        self.repo = repo
+        self.page_id = page_id
+        self.path = path
+        self.ref = ref
+        self.content = content
+        self.model = model
+        self.max_tokens = max_tokens
+        self.repo_context = repo_context
+        self.stream = stream
+        self.output_budget = output_budget
+        self.sinks = list(sinks or [])
+        self.output_mode = output_mode
+        self.source = source
+        self.chunk_lines = chunk_lines
+        self.chunk_concurrency = chunk_concurrency
+        self.chunk = chunk
+        self.router = router
+        self.diff = diff
+        self.usage = usage or token_usage
+        # Vrai si updated_code n'a pas été obtenu en entier (le résultat ne doit pas être mis en cache)
+        self.truncated = False
+        # Vrai si la réponse du modèle était inexploitable (le résultat ne doit pas être mis en cache)
+        self.failed = False
+        # Vrai si une destination partielle a déjà écrit la revue sur la page Notion
+        self.review_in_notion = False
+
+    def load_content(self):
+        """
+        Renvoie le contenu à examiner (extraits fournis ou fichier récupéré sur GitHub).
+
+        Lève FileSkipped si le fichier dépasse les limites de taille.
+        """
+        if self.content is not None:
+            return self.content
+        self.source = fetch_file_contents(self.path, self.owner, self.repo, ref=self.ref)
+        return self.source
+
+    def apply_routing(self, content):
+        """Choisit le modèle et max_tokens de la revue si un routeur est configuré"""
+        if self.router is None:
+            return None
+        if self.chunk is not None:
+            code = "\n".join(self.source.split('\n')[self.chunk['start'] - 1:self.chunk['end']])
+        else:
+            code = self.source if self.source is not None else content
+        decision = self.router.route(self.path, code, diff=self.diff)
+        self.model, self.max_tokens = decision['model'], decision['max_tokens']
+        if self.output_mode == "full" and self.max_tokens < DEFAULT_MAX_TOKENS:
+            # Le fichier réécrit en entier ne tient pas dans le budget d'un correctif
+            self.max_tokens = DEFAULT_MAX_TOKENS
+        return decision
+
+    def build_request(self, content):
+        """Paramètres de l'appel Messages pour ce fichier (utilisés aussi par le mode batch)"""
+        return {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "temperature": REVIEW_TEMPERATURE,
+            "system": build_system_blocks(self.repo_context, self.output_mode),
+            "tools": [REVIEW_TOOL],
+            "tool_choice": {"type": "tool", "name": REVIEW_TOOL_NAME},
+            "messages": [
+                {"role": "user", "content": build_user_message(
+                    self.path, content, self.content is not None, self.output_mode, self.chunk
+                )}
+            ],
+        }
+
+    def finish(self, payload):
+        """
+        Convertit la réponse du modèle (entrée de l'outil ou texte) en résultat et l'écrit dans les destinations.
+
+        Un correctif est validé contre le contenu d'origine s'il est connu; le fichier
+        modifié n'est reconstruit que si une destination lit updated_code.
+        """
+        try:
+            result = parse_review_output(payload, self.repo, self.path)
+        except ReviewSchemaError as e:
+            print(f"⚠️ Réponse de revue inexploitable pour {self.path}: {e}")
+            self.failed = True
+            return ReviewResult(self.repo, self.path, f"Erreur lors de l'analyse: réponse inexploitable ({e})", "")
+        result.source = self.source
+        if result.has_patch and not result.validate_patch():
+            print(f"⚠️ Correctif proposé pour {self.path} non applicable: {result.patch_error}")
+        return self._deliver(result)
+
+    def _deliver(self, result):
+        """Écrit le résultat dans Notion si une page est configurée, puis le renvoie"""
+        if get_setting("NOTION_API_KEY") and self.page_id:
+            print(append_review_to_notion(result, self.page_id, include_review=not self.review_in_notion))
+        return result
+
+    def skipped_result(self, reason):
+        """Résultat d'un fichier ignoré, sans appel au modèle"""
+        return ReviewResult(self.repo, self.path, f"Ignoré: {reason}", "")
+
+    def run(self):
+        """Récupère le contenu, effectue la revue et écrit le résultat dans les destinations"""
+        try:
+            content = self.load_content()
+        except FileSkipped as e:
+            if not self.chunk_lines or self.content is not None:
+                return self.skipped_result(e)
+            return self._run_chunked(e)
+
+        self.apply_routing(content)
+        if self.stream:
+            return self._run_streaming(content)
+        message = get_anthropic_client().messages.create(**self.build_request(content))
+        self.usage.record(message.usage)
+        return self.finish_message(message.content, message.stop_reason)
+
+    def _notify_sinks(self, review):
+        """Transmet la revue aux destinations partielles; l'échec d'une destination n'interrompt pas la revue"""
+        for sink in self.sinks:
+            try:
+                sink(self.path, review)
+            except Exception as e:
+                print(f"⚠️ Destination partielle en échec pour {self.path}: {e}")
+                continue
+            if self.page_id and getattr(sink, 'notion_page_id', None) == self.page_id:
+                self.review_in_notion = bool(get_setting("NOTION_API_KEY"))
+
+    def _run_streaming(self, content):
+        """Effectue la revue en flux, avec arrêt anticipé sur dépassement du budget de sortie"""
+        parser = IncrementalReviewParser()
+        notified = False
+        reason = None
+        budget_chars = self.output_budget * CHARS_PER_TOKEN if self.output_budget else None
+
+        try:
+            with get_anthropic_client().messages.stream(**self.build_request(content)) as stream:
+                for event in stream:
+                    # L'entrée de l'outil arrive en fragments JSON, décodés comme du texte
+                    if event.type != 'content_block_delta':
+                        continue
+                    delta = event.delta
+                    parser.feed(getattr(delta, 'partial_json', None) or getattr(delta, 'text', None) or '')
+                    if not notified and parser.is_complete('review'):
+                        notified = True
+                        self._notify_sinks(parser.value('review'))
+                    if budget_chars and parser.size > budget_chars:
+                        reason = f"budget de sortie de {self.output_budget} jetons dépassé"
+                        break
+                if reason is None:
+                    message = stream.get_final_message()
+                    if message.stop_reason == "max_tokens":
+                        reason = f"limite de {self.max_tokens} jetons atteinte"
+                    else:
+                        payload = message_payload(message.content)
+                else:
+                    # Interruption: l'usage connu est celui de l'instantané courant
+                    message = getattr(stream, 'current_message_snapshot', None)
+                self.usage.record(getattr(message, 'usage', None))
+        except Exception as e:
+            # Une erreur tardive ne fait pas perdre la revue déjà reçue
+            if not parser.is_complete('review'):
+                raise
+            reason = f"flux interrompu ({e})"
+
+        if reason is None:
+            return self.finish(payload)
+
+        print(f"✂️ Revue de {self.path} tronquée: {reason}")
+        self.truncated = True
+        review = parser.value('review')
+        if review is None:
+            review = parser.buffer.strip()
+        return self.finish_partial(review + TRUNCATED_NOTE.format(reason=reason))
+
+    def finish_message(self, content, stop_reason=None):
+        """
+        Traite une réponse complète (appel bloquant ou résultat de lot).
+
+        Si la limite max_tokens a été atteinte, seule la revue est conservée et le
+        résultat est marqué tronqué (il ne doit pas être mis en cache).
+        """
+        payload = message_payload(content)
+        if stop_reason != "max_tokens":
+            return self.finish(payload)
+        reason = f"limite de {self.max_tokens} jetons atteinte"
+        print(f"✂️ Revue de {self.path} tronquée: {reason}")
+        self.truncated = True
+        review = payload.get('review') if isinstance(payload, dict) else payload
+        return self.finish_partial(str(review or '').strip() + TRUNCATED_NOTE.format(reason=reason))
+
+    def finish_partial(self, review):
+        """Écrit un résultat sans updated_code (réponse tronquée) dans les destinations"""
+        return self._deliver(ReviewResult(self.repo, self.path, review, ""))
+
+    def _run_chunked(self, reason):
+        """
+        Examine un fichier trop volumineux morceau par morceau, puis fusionne les résultats.
+
+        Chaque morceau est revu en mode correctif: les diffs, exprimés sur le fichier
+        complet, sont fusionnés et le fichier modifié est reconstruit à la demande.
+        L'échec d'un morceau n'efface pas la revue des autres: sa plage est signalée
+        et le résultat fusionné est marqué en échec (il n'est pas mis en cache).
+        """
+        try:
+            self.source = fetch_file_contents(
+                self.path, self.owner, self.repo, ref=self.ref, max_bytes=MAX_CHUNKED_FILE_BYTES, max_lines=None
+            )
+        except FileSkipped as e:
+            return self.skipped_result(e)
+
+        header, chunks = chunk_file(self.path, self.source, self.chunk_lines)
+        print(f"🧩 {self.path}: {reason} Revue en {len(chunks)} morceau(x) de {self.chunk_lines} lignes au plus")
+
+        def review_chunk(chunk):
+            engine = DirectReviewEngine(
+                self.owner, self.repo, None, self.path, ref=self.ref,
+                content=render_chunk(self.source, header, chunk), model=self.model,
+                max_tokens=self.max_tokens, repo_context=self.repo_context, stream=self.stream,
+                output_budget=self.output_budget, output_mode="patch", source=self.source,
+                chunk_lines=None, chunk=chunk, router=self.router, usage=self.usage
+            )
+            result = engine.run()
+            return engine, result
+
+        outcomes = {}
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.chunk_concurrency, len(chunks)))) as executor:
+            futures = {executor.submit(review_chunk, chunk): chunk['index'] for chunk in chunks}
+            for future in as_completed(futures):
+                try:
+                    outcomes[futures[future]] = future.result()
+                except Exception as e:
+                    errors[futures[future]] = e
+        if not outcomes:
+            # Aucun morceau n'a abouti: l'échec est remonté comme pour un fichier non découpé
+            raise errors[min(errors)]
+
+        reviews, findings, patches, edits = [], [], [], []
+        for chunk in chunks:
+            if chunk['index'] in errors:
+                error = errors[chunk['index']]
+                print(f"⚠️ Revue des lignes {chunk['start']}-{chunk['end']} de {self.path} en échec: {error}")
+                reviews.append(f"**Lignes {chunk['start']}-{chunk['end']}**\n⚠️ Revue de ce morceau en échec: {error}")
+                self.failed = True
+                continue
+            engine, result = outcomes[chunk['index']]
+            self.truncated = self.truncated or engine.truncated
+            self.failed = self.failed or engine.failed
+            reviews.append(f"**Lignes {chunk['start']}-{chunk['end']}**\n{result.review}")
+            findings.extend(remap_findings(result.findings, chunk, header))
+            if result.patch:
+                patches.append(result.patch)
+            edits.extend(edit for edit in result.edits or [] if edit not in edits)
+
+        findings.sort(key=lambda finding: finding.get('line_start') or 0)
+        review = "\n\n".join(reviews)
+        self._notify_sinks(review)
+        merged = ReviewResult(
+            self.repo, self.path, review, "", findings=findings,
+            patch=merge_patches(patches, header=header), edits=edits, source=self.source
+        )
+        if merged.has_patch and not merged.validate_patch():
+            print(f"⚠️ Correctifs fusionnés pour {self.path} non applicables: {merged.patch_error}")
+        return self._deliver(merged)
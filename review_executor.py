@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Exécution concurrente des revues de fichiers
+
+Les revues sont lancées dans un pool de threads borné ; les résultats sont
+renvoyés dans l'ordre des fichiers d'entrée et l'échec d'un fichier
+n'interrompt pas les autres.
+"""
+import logging
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Nombre de revues simultanées par défaut
+DEFAULT_CONCURRENCY = 4
+
+
+def run_reviews(paths, review_fn, concurrency=DEFAULT_CONCURRENCY, logger=None, on_result=None):
+    """
+    Exécute review_fn(path) pour chaque chemin avec au plus `concurrency` revues en vol.
+
+    Paramètres:
+    - paths: Liste des chemins de fichiers à examiner.
+    - review_fn: Fonction prenant un chemin et renvoyant le résultat de la revue.
+    - concurrency: Nombre maximal de revues simultanées.
+    - logger: Logger utilisé pour suivre l'avancement (optionnel).
+    - on_result: Fonction appelée avec chaque résultat dès que son fichier est terminé,
+      depuis le thread de la revue (optionnelle; ses erreurs sont journalisées).
+
+    Renvoie une liste de dictionnaires {file, result, time[, error]} dans l'ordre de `paths`.
+    """
+    logger = logger or logging.getLogger('code_review')
+    total = len(paths)
+
+    def review_one(index, path):
+        result = review_file(index, path)
+        if on_result:
+            try:
+                on_result(result)
+            except Exception as e:
+                logger.warning(f"⚠️ Suivi de la revue de {path} impossible: {e}")
+        return result
+
+    def review_file(index, path):
+        logger.info(f"📄 ({index + 1}/{total}) Analyse de {path}...")
+        start_time = time.time()
+        try:
+            result = review_fn(path)
+            elapsed_time = time.time() - start_time
+            logger.info(f"✅ Revue terminée pour {path} en {elapsed_time:.2f} secondes")
+            return {"file": path, "result": result, "time": elapsed_time}
+        except Exception as e:
+            elapsed_time = time.time() - start_time
+            logger.error(f"❌ Erreur lors de l'analyse de {path}: {e}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Traceback: {traceback.format_exc()}")
+            return {
+                "file": path,
+                "result": f"Erreur lors de l'analyse: {e}",
+                "time": elapsed_time,
+                "error": True
+            }
+
+    if total == 0:
+        return []
+
+    workers = max(1, min(concurrency, total))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="review") as executor:
+        futures = [executor.submit(review_one, index, path) for index, path in enumerate(paths)]
+        # Les futures sont lues dans l'ordre de soumission pour conserver l'ordre d'entrée
+        return [future.result() for future in futures]
@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+"""
+Schéma structuré des revues et validation tolérante des réponses du modèle
+
+Le moteur direct demande sa revue via un outil (tool use) dont le schéma JSON
+impose le chemin du fichier, une synthèse, des constats localisés par plage de
+lignes avec une sévérité, et éventuellement un correctif. Les petites
+irrégularités de la réponse (numéros de ligne en texte, sévérités en français,
+blocs de code autour du JSON, virgules finales...) sont réparées localement au
+lieu de relancer un appel au modèle.
+
+ReviewResult reste compatible avec l'ancien tableau de 4 éléments
+[project_name, file_path, review, updated_code]; en mode correctif,
+updated_code n'est reconstruit à partir du contenu d'origine que lorsqu'une
+destination en a besoin.
+"""
+import ast
+import json
+import re
+
+from diff_utils import PatchError, apply_patch
+
+# Nom de l'outil par lequel le modèle renvoie sa revue
+REVIEW_TOOL_NAME = "submit_review"
+
+# Sévérités acceptées, de la plus grave à la moins grave
+SEVERITIES = ("critical", "major", "minor", "info")
+
+# Revue de synthèse d'une réponse qui ne contient qu'un correctif
+MISSING_REVIEW_NOTE = "Correctif proposé sans commentaire de revue (voir le code amélioré)."
+
+# Synonymes rencontrés dans les réponses, ramenés aux sévérités du schéma
+SEVERITY_ALIASES = {
+    "blocker": "critical", "critique": "critical", "bloquant": "critical", "bloquante": "critical",
+    "high": "major", "error": "major", "erreur": "major", "majeur": "major", "majeure": "major", "important": "major",
+    "medium": "minor", "moderate": "minor", "warning": "minor", "avertissement": "minor",
+    "mineur": "minor", "mineure": "minor", "low": "minor",
+    "suggestion": "info", "note": "info", "style": "info", "information": "info", "nit": "info",
+}
+
+REVIEW_TOOL = {
+    "name": REVIEW_TOOL_NAME,
+    "description": "Enregistre la revue de code d'un fichier.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "file_path": {"type": "string", "description": "Chemin du fichier examiné."},
+            "review": {"type": "string", "description": "Synthèse de la revue, en français."},
+            "findings": {
+                "type": "array",
+                "description": "Constats localisés, du plus grave au moins grave.",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "line_start": {"type": "integer", "description": "Première ligne concernée (numérotée à partir de 1)."},
+                        "line_end": {"type": "integer", "description": "Dernière ligne concernée."},
+                        "severity": {"type": "string", "enum": list(SEVERITIES)},
+                        "message": {"type": "string", "description": "Description du problème et de la correction proposée."},
+                    },
+                    "required": ["line_start", "line_end", "severity", "message"],
+                },
+            },
+            "patch": {"type": "string", "description": "Correctif optionnel au format diff unifié."},
+            "edits": {
+                "type": "array",
+                "description": "Correctifs optionnels sous forme de blocs rechercher/remplacer.",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "search": {"type": "string", "description": "Texte exact du fichier d'origine, sans numéros de ligne."},
+                        "replace": {"type": "string", "description": "Texte de remplacement."},
+                    },
+                    "required": ["search", "replace"],
+                },
+            },
+            "updated_code": {"type": "string", "description": "Contenu du fichier modifié, seulement s'il a été modifié."},
+        },
+        "required": ["file_path", "review", "findings"],
+    },
+}
+
+
+class ReviewSchemaError(ValueError):
+    """Réponse du modèle irréparable au regard du schéma de revue"""
+
+
+def _strip_fences(text):
+    """Retire un éventuel bloc de code Markdown entourant le texte (inchangé sinon)"""
+    fenced = re.match(r'^```[\w-]*\s*\n?(.*?)\s*```$', text.strip(), re.DOTALL)
+    return fenced.group(1) if fenced else text
+
+
+def _load_object(text):
+    """
+    Extrait un objet JSON d'un texte, en réparant les défauts courants.
+
+    Renvoie un dictionnaire ou None si aucun objet n'est récupérable.
+    """
+    candidate = _strip_fences(text)
+    start, end = candidate.find('{'), candidate.rfind('}')
+    if start == -1 or end <= start:
+        return None
+    candidate = candidate[start:end + 1]
+
+    attempts = (
+        candidate,
+        # Virgules finales avant une accolade ou un crochet fermant
+        re.sub(r',\s*([}\]])', r'\1', candidate),
+        # Guillemets typographiques utilisés comme délimiteurs
+        re.sub(r',\s*([}\]])', r'\1', candidate.replace('“', '"').replace('”', '"')),
+    )
+    for attempt in attempts:
+        try:
+            payload = json.loads(attempt, strict=False)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(payload, dict):
+            return payload
+    # Dernier recours: dictionnaire au format Python (guillemets simples, True/None)
+    try:
+        payload = ast.literal_eval(candidate)
+    except (ValueError, SyntaxError):
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def _to_line(value):
+    """Convertit un numéro de ligne ('12', 'L12', 12.0) en entier, ou None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.search(r'\d+', str(value or ''))
+    return int(match.group(0)) if match else None
+
+
+def normalize_severity(value):
+    """Ramène une sévérité libre à une valeur du schéma ('info' par défaut)"""
+    severity = str(value or '').strip().lower()
+    if severity in SEVERITIES:
+        return severity
+    return SEVERITY_ALIASES.get(severity, "info")
+
+
+def _normalize_finding(raw):
+    """Valide et répare un constat; renvoie None s'il est inexploitable"""
+    if isinstance(raw, str):
+        raw = {"message": raw}
+    if not isinstance(raw, dict):
+        return None
+    message = str(raw.get('message') or raw.get('description') or raw.get('comment') or '').strip()
+    if not message:
+        return None
+
+    start = _to_line(raw.get('line_start', raw.get('start_line')))
+    end = _to_line(raw.get('line_end', raw.get('end_line')))
+    lines = raw.get('lines', raw.get('line'))
+    if start is None and lines is not None:
+        # Plage donnée sous forme de texte "12-15" ou de liste [12, 15]
+        bounds = re.findall(r'\d+', str(lines)) if not isinstance(lines, list) else lines
+        bounds = [_to_line(bound) for bound in bounds if _to_line(bound) is not None]
+        if bounds:
+            start, end = bounds[0], bounds[-1]
+    if start is not None:
+        start = max(1, start)
+        end = start if end is None else max(1, end)
+        start, end = min(start, end), max(start, end)
+
+    return {
+        "line_start": start,
+        "line_end": end,
+        "severity": normalize_severity(raw.get('severity') or raw.get('level') or raw.get('priority')),
+        "message": message,
+    }
+
+
+def validate_review_payload(payload, path=None):
+    """
+    Valide une réponse structurée (entrée de l'outil ou texte JSON) et la répare si besoin.
+
+    Paramètres:
+    - payload: Dictionnaire renvoyé par l'outil, ou texte contenant l'objet JSON.
+    - path: Chemin du fichier examiné, prioritaire sur celui indiqué dans la réponse.
+
+    Renvoie un dictionnaire {file_path, review, findings, patch, edits, updated_code}.
+    Lève ReviewSchemaError si aucun objet exploitable n'est trouvé.
+    """
+    if isinstance(payload, str):
+        payload = _load_object(payload)
+    if not isinstance(payload, dict):
+        raise ReviewSchemaError("aucun objet de revue dans la réponse")
+
+    raw_findings = payload.get('findings') or []
+    if isinstance(raw_findings, (dict, str)):
+        raw_findings = [raw_findings]
+    findings = [finding for finding in map(_normalize_finding, raw_findings) if finding]
+    findings.sort(key=lambda finding: SEVERITIES.index(finding['severity']))
+
+    patch = payload.get('patch')
+    updated_code = payload.get('updated_code')
+    raw_edits = payload.get('edits') or []
+    if isinstance(raw_edits, dict):
+        raw_edits = [raw_edits]
+    edits = [
+        {"search": str(edit['search']), "replace": str(edit.get('replace') or '')}
+        for edit in raw_edits if isinstance(edit, dict) and edit.get('search')
+    ]
+
+    review = str(payload.get('review') or payload.get('summary') or '').strip()
+    if not review and findings:
+        review = "\n".join(f"- {finding['message']}" for finding in findings)
+    if not review and not findings:
+        has_fix = (isinstance(patch, str) and patch.strip()) or edits or (isinstance(updated_code, str) and updated_code.strip())
+        if not has_fix:
+            raise ReviewSchemaError("la réponse ne contient ni revue, ni constat, ni correctif")
+        # Correctif seul: la revue est remplacée par une ligne de synthèse
+        review = MISSING_REVIEW_NOTE
+    return {
+        "file_path": path or str(payload.get('file_path') or ''),
+        "review": review,
+        "findings": findings,
+        "patch": _strip_fences(patch).rstrip('\n') + "\n" if isinstance(patch, str) and patch.strip() else None,
+        "edits": edits,
+        "updated_code": _strip_fences(updated_code) if isinstance(updated_code, str) else '',
+    }
+
+
+def parse_path_list(text):
+    """
+    Extrait une liste de chemins de la réponse de l'agent de chemin.
+
+    Accepte un tableau JSON, un tableau au format Python ou, à défaut, les chaînes
+    entre guillemets du premier tableau trouvé.
+    """
+    candidate = _strip_fences(str(text))
+    start, end = candidate.find('['), candidate.rfind(']')
+    if start == -1 or end <= start:
+        return []
+    candidate = candidate[start:end + 1]
+    for loader in (json.loads, ast.literal_eval):
+        try:
+            paths = loader(candidate)
+        except (ValueError, SyntaxError):
+            continue
+        if isinstance(paths, list):
+            return [str(path) for path in paths if isinstance(path, str)]
+    return re.findall(r'["\']([^"\']+)["\']', candidate)
+
+
+class ReviewResult(list):
+    """
+    Résultat de revue compatible avec le tableau [project_name, file_path, review, updated_code].
+
+    Les constats localisés et le correctif éventuel (diff unifié `patch` et/ou blocs
+    `edits`) sont portés en attributs. Si le contenu d'origine (`source`) est connu,
+    updated_code est reconstruit à la première lecture de la propriété.
+    """
+
+    def __init__(self, project_name, file_path, review, updated_code='', findings=None, patch=None,
+                 edits=None, patch_error=None, source=None):
+        super().__init__([project_name, file_path, review, updated_code or ''])
+        self.findings = list(findings or [])
+        self.patch = patch
+        self.edits = list(edits or [])
+        self.patch_error = patch_error
+        self.source = source
+
+    project_name = property(lambda self: self[0])
+    file_path = property(lambda self: self[1])
+    review = property(lambda self: self[2])
+
+    @property
+    def has_patch(self):
+        """Indique si la revue propose un correctif (diff ou blocs rechercher/remplacer)"""
+        return bool(self.patch or self.edits)
+
+    @property
+    def updated_code(self):
+        """Contenu modifié, reconstruit à la demande à partir du correctif et du contenu d'origine"""
+        if not self[3] and self.has_patch and self.source is not None and self.patch_error is None:
+            try:
+                self[3] = apply_patch(self.source, self.patch, self.edits)
+            except PatchError as e:
+                self.patch_error = str(e)
+        return self[3]
+
+    def validate_patch(self):
+        """
+        Vérifie que le correctif s'applique au contenu d'origine, sans conserver le résultat.
+
+        Renvoie True si le correctif est applicable; sinon l'erreur est notée dans patch_error.
+        """
+        if not self.has_patch or self.source is None:
+            return self.patch_error is None
+        try:
+            apply_patch(self.source, self.patch, self.edits)
+        except PatchError as e:
+            self.patch_error = str(e)
+            return False
+        return True
+
+    @classmethod
+    def from_payload(cls, payload, project_name, path):
+        """Construit le résultat à partir d'une réponse validée par validate_review_payload"""
+        return cls(project_name, payload['file_path'] or path, payload['review'], payload['updated_code'],
+                   findings=payload['findings'], patch=payload['patch'], edits=payload.get('edits'))
+
+    @classmethod
+    def from_value(cls, value, project_name='', path=''):
+        """
+        Reconstruit un résultat depuis le cache, un tableau de 4 éléments ou un texte.
+
+        Un texte est lu comme un objet JSON de revue, puis comme l'ancien tableau
+        produit par l'équipe CrewAI; à défaut il est conservé comme revue.
+        """
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, dict):
+            if 'project_name' in value:
+                # Forme produite par to_dict (cache, état de lot)
+                return cls(value['project_name'], value.get('file_path', path), value.get('review', ''),
+                           value.get('updated_code', ''), findings=value.get('findings'), patch=value.get('patch'),
+                           edits=value.get('edits'), patch_error=value.get('patch_error'))
+            return cls.from_payload(validate_review_payload(value, path), project_name, path)
+        if isinstance(value, (list, tuple)) and len(value) >= 3:
+            return cls(str(value[0]), str(value[1]), str(value[2]), str(value[3]) if len(value) >= 4 else '')
+
+        text = str(value or '').strip()
+        try:
+            return cls.from_payload(validate_review_payload(text, path), project_name, path)
+        except ReviewSchemaError:
+            pass
+        try:
+            legacy = ast.literal_eval(_strip_fences(text))
+        except (ValueError, SyntaxError):
+            legacy = None
+        if isinstance(legacy, (list, tuple)) and len(legacy) >= 3:
+            return cls(project_name or str(legacy[0]), path or str(legacy[1]), str(legacy[2]),
+                       str(legacy[3]) if len(legacy) >= 4 else '')
+        return cls(project_name, path, text, '')
+
+    def to_dict(self):
+        """Forme sérialisable en JSON, pour le cache et les états de lot (sans reconstruire updated_code)"""
+        return {
+            "project_name": self.project_name,
+            "file_path": self.file_path,
+            "review": self.review,
+            "updated_code": self[3],
+            "findings": self.findings,
+            "patch": self.patch,
+            "edits": self.edits,
+            "patch_error": self.patch_error,
+        }
+
+    @staticmethod
+    def describe_finding(finding, markdown=False):
+        """Description d'un constat sur une ligne, ex: "major (l. 12-15): message" """
+        if finding['line_start'] is None:
+            location = ""
+        elif finding['line_start'] == finding['line_end']:
+            location = f" (l. {finding['line_start']})"
+        else:
+            location = f" (l. {finding['line_start']}-{finding['line_end']})"
+        severity = f"**{finding['severity']}**" if markdown else finding['severity']
+        return f"{severity}{location}: {finding['message']}"
+
+    def format_findings(self):
+        """Liste Markdown des constats, du plus grave au moins grave"""
+        return "\n".join(f"- {self.describe_finding(finding, markdown=True)}" for finding in self.findings)
@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+"""
+Service de revue des pull requests déclenché par les webhooks GitHub
+
+Au lieu d'un runner GitHub Actions par événement (installation des dépendances
+et imports à chaque fois), un processus de longue durée reçoit les webhooks
+`pull_request` en HTTP local, vérifie leur signature HMAC (X-Hub-Signature-256)
+et confie les revues à un pool de threads. Les modules de revue, les clients
+Anthropic et GitHub (sessions persistantes, cache ETag) et le cache de revues
+sont chargés une seule fois au démarrage et restent en mémoire.
+
+Exemples:
+    python review_service.py serve --port 8080 --review-args="--incremental --source tarball"
+    python review_service.py send --repo owner/repo --pr 42
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import os
+import shlex
+import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from github_client import get_client
+from pr_review_enhanced import open_review_cache, parse_args as parse_review_args, review_pull_request
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_WORKERS = 2
+
+# Actions pull_request qui déclenchent une revue
+REVIEW_ACTIONS = {"opened", "reopened", "synchronize", "ready_for_review"}
+
+# Taille maximale d'une charge utile de webhook GitHub
+MAX_PAYLOAD_BYTES = 25 * 1024 * 1024
+
+
+def sign_payload(secret, body):
+    """Signature X-Hub-Signature-256 d'un corps de requête (bytes)"""
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret, body, signature):
+    """Vérifie la signature d'un webhook en temps constant"""
+    if not signature:
+        return False
+    return hmac.compare_digest(sign_payload(secret, body), signature)
+
+
+def setup_logger(debug_mode=False):
+    """Configure le logging du service (nom du logger et thread affichés pour suivre les revues simultanées)"""
+    logging.basicConfig(
+        level=logging.DEBUG if debug_mode else logging.INFO,
+        format='%(asctime)s [%(levelname)s] [%(threadName)s] %(name)s: %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    return logging.getLogger('review_service')
+
+
+class ReviewService:
+    """Reçoit les événements de PR et exécute les revues dans un pool de threads"""
+
+    def __init__(self, secret, review_args=None, workers=DEFAULT_WORKERS, dry_run=False, logger=None):
+        """
+        Paramètres:
+        - secret: Secret partagé des webhooks (signature HMAC SHA-256).
+        - review_args: Options de pr_review_enhanced.py appliquées à chaque revue (liste).
+        - workers: Nombre de revues de PR exécutées simultanément.
+        - dry_run: Vérifier et répartir les événements sans lancer de revue (tests locaux).
+        - logger: Logger du service.
+        """
+        self.secret = secret
+        self.review_args = list(review_args or [])
+        self.dry_run = dry_run
+        self.logger = logger or logging.getLogger('review_service')
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="pr-review")
+        self.cache = None
+        self._lock = threading.Lock()
+        # Une seule revue à la fois par PR; un événement reçu pendant la revue en relance une à la fin
+        self._running = set()
+        self._rerun = set()
+        self.stats = {"received": 0, "rejected": 0, "ignored": 0, "queued": 0, "coalesced": 0,
+                      "succeeded": 0, "failed": 0}
+
+    def warm_up(self):
+        """Charge les modules de revue, les clients et le cache une fois pour toutes"""
+        start_time = time.time()
+        # Options validées dès le démarrage plutôt qu'au premier webhook
+        args = parse_review_args(["--repo", "owner/repo", "--pr", "1"] + self.review_args)
+        if not self.dry_run:
+            # Modules et clients chargés paresseusement par claude_code_reviewer: créés ici une seule fois
+            from claude_code_reviewer import get_anthropic_client, get_notion_client
+            import review_engine  # noqa: F401
+            get_anthropic_client()
+            get_notion_client()
+            if args.engine == "crew":
+                import crewai  # noqa: F401
+            get_client(os.getenv("GITHUB_API_KEY"))
+            self.cache = open_review_cache(args, self.logger)
+        self.logger.info(f"🔥 Service prêt en {time.time() - start_time:.2f} s")
+
+    def handle_event(self, event, payload):
+        """
+        Traite un événement vérifié; renvoie (code HTTP, message).
+
+        Les événements pull_request ouverts, rouverts, synchronisés ou prêts pour la
+        revue sont mis en file; les autres sont ignorés.
+        """
+        if event == "ping":
+            return 200, "pong"
+        if event != "pull_request":
+            self._count("ignored")
+            return 202, f"événement {event} ignoré"
+        action = payload.get("action")
+        pull_request = payload.get("pull_request") or {}
+        if action not in REVIEW_ACTIONS or pull_request.get("draft"):
+            self._count("ignored")
+            return 202, f"action {action} ignorée"
+        try:
+            repo = payload["repository"]["full_name"]
+            number = int(payload.get("number") or pull_request["number"])
+        except (KeyError, TypeError, ValueError):
+            self._count("rejected")
+            return 400, "événement pull_request incomplet"
+        return 202, self.submit(repo, number)
+
+    def submit(self, repo, number):
+        """Met en file la revue d'une PR (fusionnée avec une revue déjà en cours pour la même PR)"""
+        key = (repo, number)
+        with self._lock:
+            if key in self._running:
+                if key in self._rerun:
+                    self.stats["coalesced"] += 1
+                self._rerun.add(key)
+                return f"revue de {repo}#{number} déjà en cours, nouvelle revue programmée"
+            self._running.add(key)
+            self.stats["queued"] += 1
+        self.executor.submit(self._run, repo, number)
+        self.logger.info(f"📥 Revue de {repo}#{number} mise en file")
+        return f"revue de {repo}#{number} mise en file"
+
+    def _run(self, repo, number):
+        """Exécute les revues d'une PR tant que de nouveaux événements arrivent pendant l'exécution"""
+        key = (repo, number)
+        while True:
+            self._review(repo, number)
+            with self._lock:
+                if key not in self._rerun:
+                    self._running.discard(key)
+                    return
+                self._rerun.discard(key)
+
+    def _review(self, repo, number):
+        logger = logging.getLogger(f"pr_review.{repo}#{number}")
+        start_time = time.time()
+        try:
+            if self.dry_run:
+                logger.info(f"🧪 Mode test: revue de {repo}#{number} simulée")
+                code = 0
+            else:
+                args = parse_review_args(["--repo", repo, "--pr", str(number)] + self.review_args)
+                code = review_pull_request(args, logger, cache=self.cache)
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de la revue de {repo}#{number}: {e}")
+            logger.debug(f"Traceback: {traceback.format_exc()}")
+            code = 1
+        except SystemExit as e:
+            # parse_args termine le processus sur une option invalide: le service continue
+            logger.error(f"❌ Options de revue invalides ({e})")
+            code = 1
+        self._count("succeeded" if code == 0 else "failed")
+        logger.info(f"{'✅' if code == 0 else '❌'} Revue de {repo}#{number} terminée en {time.time() - start_time:.2f} s")
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def health(self):
+        """État du service: compteurs et revues en cours"""
+        with self._lock:
+            return dict(self.stats, running=[f"{repo}#{number}" for repo, number in sorted(self._running)])
+
+    def shutdown(self):
+        """Attend la fin des revues en cours puis ferme le cache"""
+        self.executor.shutdown(wait=True)
+        if self.cache:
+            self.logger.info(f"♻️ Cache de revues: {self.cache.summary()}")
+            self.cache.close()
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Point d'entrée HTTP: POST des webhooks, GET /health"""
+
+    server_version = "ReviewService/1.0"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def do_GET(self):
+        if self.path.rstrip('/') == "/health":
+            self._reply(200, self.service.health())
+        else:
+            self._reply(404, {"message": "introuvable"})
+
+    def do_POST(self):
+        self.service._count("received")
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_PAYLOAD_BYTES:
+            self.service._count("rejected")
+            return self._reply(413 if length else 400, {"message": "taille de charge utile invalide"})
+        body = self.rfile.read(length)
+
+        if not verify_signature(self.service.secret, body, self.headers.get("X-Hub-Signature-256")):
+            self.service._count("rejected")
+            self.service.logger.warning(f"⚠️ Signature invalide pour la livraison {self.headers.get('X-GitHub-Delivery')}")
+            return self._reply(401, {"message": "signature invalide"})
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self.service._count("rejected")
+            return self._reply(400, {"message": "JSON invalide"})
+
+        status, message = self.service.handle_event(self.headers.get("X-GitHub-Event", ""), payload)
+        self._reply(status, {"message": message})
+
+    def _reply(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        self.service.logger.debug(f"{self.address_string()} - {format % args}")
+
+
+def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Démarre le serveur HTTP et traite les webhooks jusqu'à l'interruption"""
+    server = ThreadingHTTPServer((host, port), WebhookHandler)
+    server.daemon_threads = True
+    server.service = service
+    service.logger.info(f"👂 Webhooks attendus sur http://{host}:{server.server_port}/ (état: /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        service.logger.info("⚠️ Arrêt demandé, fin des revues en cours...")
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+def send_fake_webhook(url, secret, repo, pr_number, action="synchronize", event="pull_request", timeout=10):
+    """
+    Envoie un webhook pull_request signé, comme le ferait GitHub (tests locaux).
+
+    Renvoie la réponse `requests` du service.
+    """
+    payload = {
+        "action": action,
+        "number": pr_number,
+        "pull_request": {"number": pr_number, "draft": False},
+        "repository": {"full_name": repo},
+    }
+    body = json.dumps(payload).encode()
+    headers = {
+        "Content-Type": "application/json",
+        "X-GitHub-Event": event,
+        "X-GitHub-Delivery": str(uuid.uuid4()),
+        "X-Hub-Signature-256": sign_payload(secret, body),
+    }
+    return requests.post(url, data=body, headers=headers, timeout=timeout)
+
+
+def parse_args():
+    """Parse les arguments de ligne de commande"""
+    parser = argparse.ArgumentParser(description="Service de revue des pull requests déclenché par webhook GitHub")
+    parser.add_argument("--debug", action="store_true", help="Activer le mode débogage (plus de logs)")
+    parser.add_argument("--secret", type=str, default=None,
+                        help="Secret des webhooks (défaut: variable GITHUB_WEBHOOK_SECRET)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Recevoir les webhooks et exécuter les revues")
+    serve_parser.add_argument("--host", type=str, default=DEFAULT_HOST, help=f"Adresse d'écoute (défaut: {DEFAULT_HOST})")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port d'écoute (défaut: {DEFAULT_PORT})")
+    serve_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                              help=f"Nombre de PR examinées simultanément (défaut: {DEFAULT_WORKERS})")
+    serve_parser.add_argument("--review-args", type=str, default="",
+                              help="Options de pr_review_enhanced.py appliquées à chaque revue, "
+                                   "ex: --review-args=\"--incremental --source tarball\"")
+    serve_parser.add_argument("--dry-run", action="store_true",
+                              help="Vérifier et répartir les webhooks sans lancer de revue (tests locaux)")
+
+    send_parser = commands.add_parser("send", help="Envoyer un faux webhook pull_request signé au service")
+    send_parser.add_argument("--url", type=str, default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}/",
+                             help="URL du service (défaut: %(default)s)")
+    send_parser.add_argument("--repo", type=str, required=True, help="Nom du dépôt au format 'owner/repo'")
+    send_parser.add_argument("--pr", type=int, required=True, help="Numéro de la pull request")
+    send_parser.add_argument("--action", type=str, default="synchronize",
+                             help="Action de l'événement (défaut: synchronize)")
+    return parser.parse_args()
+
+
+def main():
+    """Fonction principale"""
+    args = parse_args()
+    logger = setup_logger(args.debug)
+    # Le fichier .env est chargé avant toute lecture de l'environnement (secret, clés des revues)
+    from claude_code_reviewer import load_environment
+    load_environment()
+    args.secret = args.secret or os.getenv("GITHUB_WEBHOOK_SECRET")
+    if not args.secret:
+        logger.error("❌ Secret des webhooks manquant. Définissez GITHUB_WEBHOOK_SECRET ou --secret.")
+        return 1
+
+    if args.command == "send":
+        try:
+            response = send_fake_webhook(args.url, args.secret, args.repo, args.pr, args.action)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ Service injoignable: {e}")
+            return 1
+        logger.info(f"📨 Réponse du service: {response.status_code} {response.text}")
+        return 0 if response.ok else 1
+
+    service = ReviewService(args.secret, shlex.split(args.review_args), args.workers, args.dry_run, logger)
+    service.warm_up()
+    serve(service, args.host, args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
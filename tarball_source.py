@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+Source de contenu alimentée par une seule archive tar du dépôt
+
+Au lieu d'un appel à l'API contents (et d'une charge utile base64) par fichier,
+l'archive tar.gz de la référence examinée est téléchargée une fois et lue en
+flux par `tarfile`, sans être écrite sur disque. Les fichiers sont recopiés bout
+à bout dans un tampon SpooledTemporaryFile (en mémoire, déversé dans un fichier
+temporaire au-delà d'un seuil) et indexés par chemin -> (position, taille).
+fetch_file_contents sert ensuite les fichiers depuis cet index.
+"""
+import tarfile
+import tempfile
+import threading
+import time
+
+from github_client import get_client
+from repo_tree import DEFAULT_IGNORE_DIRS, is_ignored
+
+# Taille du tampon conservée en mémoire avant déversement dans un fichier temporaire
+DEFAULT_SPILL_BYTES = 64 * 1024 * 1024
+
+# Les fichiers plus gros ne sont pas indexés (ils restent servis par l'API contents)
+DEFAULT_MAX_MEMBER_BYTES = 10 * 1024 * 1024
+
+# Délai de lecture de l'archive, plus long que celui des appels unitaires
+DEFAULT_TARBALL_TIMEOUT = 300
+
+
+class _CountingReader:
+    """Flux de lecture comptant les octets reçus (archive compressée)"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.count = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.count += len(data)
+        return data
+
+
+class TarballSource:
+    """Index en mémoire des fichiers d'une archive tar du dépôt"""
+
+    def __init__(self, owner, repo, ref=None, token=None, spill_bytes=DEFAULT_SPILL_BYTES,
+                 max_member_bytes=DEFAULT_MAX_MEMBER_BYTES, ignore_dirs=DEFAULT_IGNORE_DIRS):
+        """
+        Paramètres:
+        - owner, repo: Propriétaire et nom du dépôt.
+        - ref: Branche, tag ou SHA de l'archive (branche par défaut si None).
+        - token: Token GitHub (GITHUB_API_KEY par défaut).
+        - spill_bytes: Taille du tampon en mémoire avant déversement sur disque.
+        - max_member_bytes: Taille au-delà de laquelle un fichier n'est pas indexé.
+        - ignore_dirs: Répertoires dont les fichiers ne sont pas indexés.
+        """
+        self.owner = owner
+        self.repo = repo
+        self.ref = ref
+        self.token = token
+        self.max_member_bytes = max_member_bytes
+        self.ignore_dirs = ignore_dirs
+        self._buffer = tempfile.SpooledTemporaryFile(max_size=spill_bytes)
+        self._index = {}
+        self._lock = threading.Lock()
+        self.archive_bytes = 0
+        self._registered = False
+
+    def load(self, timeout=DEFAULT_TARBALL_TIMEOUT, logger=None):
+        """Télécharge l'archive en flux et construit l'index; renvoie le nombre de fichiers indexés"""
+        start_time = time.time()
+        url = f"/repos/{self.owner}/{self.repo}/tarball" + (f"/{self.ref}" if self.ref else "")
+        response = get_client(self.token).get(url, stream=True, timeout=timeout)
+        response.raise_for_status()
+        # Un éventuel encodage de transfert est décodé; l'archive elle-même reste compressée
+        response.raw.decode_content = True
+        raw = _CountingReader(response.raw)
+        try:
+            with tarfile.open(fileobj=raw, mode='r|gz') as archive:
+                for member in archive:
+                    self._add_member(archive, member)
+        finally:
+            response.close()
+        self.archive_bytes = raw.count
+
+        message = (
+            f"📦 Archive {self.owner}/{self.repo} chargée en {time.time() - start_time:.2f} s: "
+            f"{len(self._index)} fichier(s) indexé(s), {self.archive_bytes / 1e6:.1f} Mo téléchargés"
+        )
+        if logger:
+            logger.info(message)
+        else:
+            print(message)
+        return len(self._index)
+
+    def _add_member(self, archive, member):
+        """Recopie un fichier de l'archive dans le tampon et l'indexe"""
+        if not member.isfile() or member.size > self.max_member_bytes:
+            return
+        # Les chemins de l'archive sont préfixés par un répertoire "owner-repo-sha/"
+        parts = member.name.split('/', 1)
+        if len(parts) < 2 or not parts[1] or is_ignored(parts[1], self.ignore_dirs):
+            return
+        data = archive.extractfile(member).read()
+        with self._lock:
+            self._buffer.seek(0, 2)
+            self._index[parts[1]] = (self._buffer.tell(), len(data))
+            self._buffer.write(data)
+
+    def __contains__(self, path):
+        return path in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def size(self, path):
+        """Taille en octets d'un fichier indexé, ou None"""
+        entry = self._index.get(path)
+        return entry[1] if entry else None
+
+    def get(self, path):
+        """Contenu brut (bytes) d'un fichier indexé, ou None s'il n'est pas dans l'archive"""
+        entry = self._index.get(path)
+        if entry is None:
+            return None
+        offset, size = entry
+        with self._lock:
+            self._buffer.seek(offset)
+            return self._buffer.read(size)
+
+    def register(self):
+        """Enregistre l'archive comme source de fetch_file_contents pour ce dépôt et cette référence"""
+        from claude_code_reviewer import register_content_source
+        register_content_source(self.owner, self.repo, self.ref, self)
+        self._registered = True
+
+    def close(self):
+        """Retire l'enregistrement et libère le tampon (et le fichier temporaire éventuel)"""
+        if self._registered:
+            from claude_code_reviewer import register_content_source
+            register_content_source(self.owner, self.repo, self.ref, None)
+            self._registered = False
+        with self._lock:
+            self._buffer.close()
+            self._index = {}
+
+
+def open_tarball_source(owner, repo, ref=None, token=None, logger=None):
+    """
+    Télécharge l'archive du dépôt et l'enregistre comme source de contenu.
+
+    Renvoie la source, ou None si l'archive n'a pas pu être chargée (les fichiers
+    sont alors lus via l'API contents).
+    """
+    source = TarballSource(owner, repo, ref=ref, token=token)
+    try:
+        source.load(logger=logger)
+    except Exception as e:
+        source.close()
+        message = f"⚠️ Archive du dépôt indisponible ({e}), lecture des fichiers via l'API contents"
+        if logger:
+            logger.warning(message)
+        else:
+            print(message)
+        return None
+    source.register()
+    return source
@@ -0,0 +1,151 @@
+"""
+Cycle complet du mode lot contre une simulation des endpoints /v1/messages/batches
+
+La session HTTP du BatchClient est remplacée par FakeBatchSession (création, interrogation,
+résultats JSONL); le contenu des fichiers est servi localement à la place de GitHub.
+"""
+import json
+
+import pytest
+
+import batch_review
+import review_engine
+from review_cache import ReviewCache
+
+SOURCES = {
+    "app.py": "def add(a, b):\n    return a - b\n",
+    "util.py": "def name():\n    return 'x'\n",
+}
+
+FIX_PATCH = (
+    "--- a/app.py\n+++ b/app.py\n@@ -1,2 +1,2 @@\n"
+    " def add(a, b):\n-    return a - b\n+    return a + b\n"
+)
+
+
+class FakeResponse:
+    """Réponse minimale de requests, utilisable comme gestionnaire de contexte (stream=True)"""
+
+    def __init__(self, payload=None, lines=None):
+        self.payload = payload
+        self.lines = lines or []
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeBatchSession:
+    """Simulation des endpoints de lot: le lot est terminé à la deuxième interrogation"""
+
+    def __init__(self, outputs):
+        self.headers = {}
+        self.outputs = outputs
+        self.created = []
+        self.polls = 0
+
+    def post(self, url, json=None, timeout=None):
+        assert url.endswith("/v1/messages/batches")
+        self.created.append(json['requests'])
+        return FakeResponse({'id': "msgbatch_1", 'processing_status': "in_progress"})
+
+    def get(self, url, stream=False, timeout=None):
+        if url.endswith("/results"):
+            submitted = self.created[-1]
+            lines = [self.result_line(request) for request in submitted]
+            return FakeResponse(lines=lines)
+        self.polls += 1
+        status = "ended" if self.polls >= 2 else "in_progress"
+        return FakeResponse({'id': "msgbatch_1", 'processing_status': status, 'request_counts': {}})
+
+    def result_line(self, request):
+        # custom_id "file-<i>": i-ème fichier soumis, dans l'ordre de SOURCES
+        path = list(SOURCES)[int(request['custom_id'].split('-')[1])]
+        review, stop_reason = self.outputs[path]
+        message = {
+            'content': [{'type': "tool_use", 'name': review_engine.REVIEW_TOOL_NAME, 'input': review}],
+            'stop_reason': stop_reason,
+            'usage': {'input_tokens': 10, 'output_tokens': 5},
+        }
+        return json.dumps({'custom_id': request['custom_id'], 'result': {'type': "succeeded", 'message': message}})
+
+
+@pytest.fixture
+def local_files(monkeypatch):
+    """Sert le contenu des fichiers (par chemin ou par URL de blob) sans appeler GitHub"""
+    def fetch(path, owner, repo, ref=None, **kwargs):
+        for name, source in SOURCES.items():
+            if path == name or path.endswith(f"/git/blobs/sha-{name}"):
+                return source
+        raise AssertionError(f"fichier inattendu: {path}")
+    monkeypatch.setattr(review_engine, "fetch_file_contents", fetch)
+    monkeypatch.setattr(batch_review, "fetch_file_contents", fetch)
+    monkeypatch.setattr(review_engine, "get_setting", lambda name: None)
+
+
+def make_client(outputs):
+    client = batch_review.BatchClient(api_key="test", base_url="http://batch.test")
+    client.session = FakeBatchSession(outputs)
+    return client
+
+
+def test_submit_poll_collect_and_resume(local_files, tmp_path):
+    outputs = {
+        "app.py": ({'review': "Addition incorrecte", 'patch': FIX_PATCH}, "tool_use"),
+        "util.py": ({'review': "Nom peu explicite", 'patch': "--- a/util.py\n+++ b/util.py\n@@ -1"}, "max_tokens"),
+    }
+    client = make_client(outputs)
+    cache = ReviewCache(str(tmp_path / "reviews.sqlite"))
+    blob_shas = {name: f"sha-{name}" for name in SOURCES}
+
+    state, outcome = batch_review.submit_batch_reviews(
+        "owner", "repo", None, list(SOURCES), blob_shas=blob_shas, cache=cache,
+        client=client, batch_dir=str(tmp_path)
+    )
+    assert outcome == {'known': {}, 'errors': {}}
+    assert len(client.session.created[0]) == 2
+
+    # Reprise à partir du fichier d'état, comme avec --batch-id
+    resumed = batch_review.load_batch_state(state['batch_id'], batch_dir=str(tmp_path))
+    results = batch_review.collect_batch_results(resumed, cache=cache, client=client, poll_interval=0)
+
+    assert client.session.polls == 2
+    by_file = {item['file']: item for item in results}
+    fixed = by_file["app.py"]['result']
+    assert fixed.patch_error is None
+    assert fixed.updated_code == "def add(a, b):\n    return a + b\n"
+    truncated = by_file["util.py"]['result']
+    assert "updated_code omis" in truncated.review
+
+    # Seule la revue complète et vérifiée est mise en cache
+    assert cache.get(resumed['files']["file-0"]['cache_key']) is not None
+    assert cache.get(resumed['files']["file-1"]['cache_key']) is None
+    cache.close()
+
+
+def test_cached_files_are_not_submitted(local_files, tmp_path):
+    cache = ReviewCache(str(tmp_path / "reviews.sqlite"))
+    blob_shas = {name: f"sha-{name}" for name in SOURCES}
+    outputs = {name: ({'review': f"Revue de {name}"}, "tool_use") for name in SOURCES}
+
+    first = make_client(outputs)
+    batch_review.run_batch_reviews("owner", "repo", None, list(SOURCES), blob_shas=blob_shas, cache=cache,
+                                   client=first, batch_dir=str(tmp_path), poll_interval=0)
+    second = make_client(outputs)
+    results = batch_review.run_batch_reviews("owner", "repo", None, list(SOURCES), blob_shas=blob_shas,
+                                             cache=cache, client=second, batch_dir=str(tmp_path), poll_interval=0)
+
+    assert second.session.created == []
+    assert [item['result'].review for item in results] == ["Revue de app.py", "Revue de util.py"]
+    cache.close()
@@ -0,0 +1,61 @@
+"""Découpage des gros fichiers: renumérotation des constats et fusion des correctifs par morceau"""
+from code_chunker import chunk_file, merge_patches, remap_findings
+from diff_utils import apply_unified_diff
+
+CHUNK = {'index': 1, 'start': 101, 'end': 200, 'context': [(50, 50)]}
+HEADER = [(1, 5)]
+
+
+def test_remap_findings_shifts_chunk_relative_lines():
+    findings = [
+        {'line_start': 10, 'line_end': 12},   # relatif au morceau: 110-112
+        {'line_start': 150, 'line_end': 151},  # déjà global
+        {'line_start': 3, 'line_end': 3},      # dans l'en-tête
+        {'line_start': 50},                    # dans le contexte de classe
+        {'line_start': 150, 'line_end': 400},  # global, déborde du morceau
+        {'summary': "sans ligne"},
+    ]
+    remapped = remap_findings(findings, CHUNK, HEADER)
+    assert [(f.get('line_start'), f.get('line_end')) for f in remapped] == [
+        (110, 112), (150, 151), (3, 3), (50, None), (150, 400), (None, None)
+    ]
+    assert findings[0]['line_start'] == 10
+
+
+def test_remap_findings_keeps_first_chunk():
+    first = {'index': 0, 'start': 1, 'end': 100, 'context': []}
+    assert remap_findings([{'line_start': 10, 'line_end': 12}], first, HEADER) == [{'line_start': 10, 'line_end': 12}]
+
+
+def test_merge_patches_sorts_and_dedupes_header_hunks():
+    content = "\n".join(["import os"] + [f"x{number} = {number}" for number in range(2, 31)])
+    header = [(1, 1)]
+    header_fix = "@@ -1,1 +1,1 @@\n-import os\n+import sys\n"
+    first = header_fix + "@@ -5,1 +5,1 @@\n-x5 = 5\n+x5 = 50\n"
+    second = "@@ -1,1 +1,1 @@\n-import os\n+import re\n@@ -20,1 +20,1 @@\n-x20 = 20\n+x20 = 200\n"
+    merged = merge_patches([second.replace("re", "sys"), first, second], header=header)
+
+    assert merged.count("@@ -1,1") == 1
+    assert merged.count("@@ -20,1") == 1
+    starts = [int(line.split()[1].split(',')[0][1:]) for line in merged.split('\n') if line.startswith('@@')]
+    assert starts == sorted(starts)
+
+    result = apply_unified_diff(content, merged).split('\n')
+    assert (result[0], result[4], result[19]) == ("import sys", "x5 = 50", "x20 = 200")
+
+
+def test_merge_patches_without_hunks():
+    assert merge_patches(["", "pas de diff"]) is None
+
+
+def test_chunk_file_splits_python_at_top_level_definitions():
+    functions = ["def f{0}():\n{1}".format(number, "\n".join(["    pass"] * 30)) for number in range(10)]
+    content = "import os\n\n" + "\n\n".join(functions) + "\n"
+    header, chunks = chunk_file("big.py", content, max_lines=100)
+    assert header and header[0][0] == 1
+    assert len(chunks) > 1
+    lines = content.split('\n')
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk['start'] == previous['end'] + 1
+        assert lines[chunk['start'] - 1].startswith("def ") or not lines[chunk['start'] - 1].strip()
+    assert chunks[-1]['end'] == len(lines)
@@ -0,0 +1,57 @@
+"""Application locale des correctifs proposés par le modèle (diff unifié et rechercher/remplacer)"""
+import pytest
+
+from diff_utils import PatchError, apply_patch, apply_search_replace, apply_unified_diff, build_excerpt
+
+SOURCE = "def add(a, b):\n    return a - b\n\n\ndef name():\n    return 'x'\n"
+
+
+def test_unified_diff_applies_hunk():
+    patch = "--- a/app.py\n+++ b/app.py\n@@ -1,2 +1,2 @@\n def add(a, b):\n-    return a - b\n+    return a + b\n"
+    assert apply_unified_diff(SOURCE, patch) == SOURCE.replace("a - b", "a + b")
+
+
+def test_unified_diff_tolerates_wrong_line_numbers_and_lost_context_spaces():
+    # En-tête décalé et ligne de contexte vide sans son espace initial
+    patch = "@@ -40,3 +40,3 @@\n     return a - b\n\n \n-def name():\n+def label():\n"
+    assert apply_unified_diff(SOURCE, patch) == SOURCE.replace("def name", "def label")
+
+
+def test_unified_diff_pure_insertion():
+    patch = "@@ -2,0 +3,1 @@\n+    # fin\n"
+    assert apply_unified_diff(SOURCE, patch).split('\n')[2] == "    # fin"
+
+
+def test_unified_diff_rejects_mismatch():
+    with pytest.raises(PatchError):
+        apply_unified_diff(SOURCE, "@@ -1,1 +1,1 @@\n-def sub(a, b):\n+def add(a, b):\n")
+    with pytest.raises(PatchError):
+        apply_unified_diff(SOURCE, "pas de hunk")
+
+
+def test_search_replace_in_order():
+    edits = [{'search': "a - b", 'replace': "a + b"}, {'search': "a + b", 'replace': "b + a"}]
+    assert apply_search_replace(SOURCE, edits) == SOURCE.replace("a - b", "b + a")
+
+
+@pytest.mark.parametrize("search, message", [
+    ("", "vide"),
+    ("absent", "introuvable"),
+    ("return", "ambigu"),
+])
+def test_search_replace_rejects_invalid_blocks(search, message):
+    with pytest.raises(PatchError, match=message):
+        apply_search_replace(SOURCE, [{'search': search, 'replace': "x"}])
+
+
+def test_apply_patch_combines_both_forms():
+    patch = "@@ -1,2 +1,2 @@\n def add(a, b):\n-    return a - b\n+    return a + b\n"
+    edits = [{'search': "'x'", 'replace': "'y'"}]
+    assert apply_patch(SOURCE, patch=patch, edits=edits) == SOURCE.replace("a - b", "a + b").replace("'x'", "'y'")
+
+
+def test_build_excerpt_numbers_lines_globally():
+    content = "\n".join(f"ligne {number}" for number in range(1, 21))
+    excerpt = build_excerpt(content, [(10, 10)], context=1)
+    assert excerpt.split('\n')[0] == "# --- lignes 9-11 ---"
+    assert "   10 | ligne 10" in excerpt
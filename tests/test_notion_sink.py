@@ -0,0 +1,32 @@
+"""Découpe des textes selon les limites de l'API Notion"""
+from notion_sink import MAX_RICH_TEXT_ITEMS, MAX_TEXT_CHARS, rich_text, split_text, text_blocks
+
+
+def test_split_text_short_and_empty():
+    assert split_text("court") == ["court"]
+    assert split_text("") == [""]
+
+
+def test_split_text_prefers_line_ends():
+    text = "a" * 6 + "\n" + "b" * 6 + "\n" + "c" * 5
+    assert split_text(text, limit=10) == ["a" * 6 + "\n", "b" * 6 + "\n", "c" * 5]
+
+
+def test_split_text_cuts_long_lines_at_limit():
+    pieces = split_text("x" * 25, limit=10)
+    assert pieces == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_split_text_is_lossless_under_api_limit():
+    text = "\n".join(f"ligne {number} " + "y" * (number % 300) for number in range(2000))
+    pieces = split_text(text)
+    assert "".join(pieces) == text
+    assert all(len(piece) <= MAX_TEXT_CHARS for piece in pieces)
+
+
+def test_long_text_spans_several_blocks():
+    text = "z" * (MAX_TEXT_CHARS * (MAX_RICH_TEXT_ITEMS + 5))
+    assert len(rich_text(text)) == MAX_RICH_TEXT_ITEMS + 5
+    blocks = text_blocks("paragraph", text)
+    assert len(blocks) == 2
+    assert len(blocks[0]["paragraph"]["rich_text"]) == MAX_RICH_TEXT_ITEMS
@@ -0,0 +1,53 @@
+"""Résolution locale des cibles utilisateur à partir de l'index de l'arborescence"""
+import pytest
+
+from path_resolver import PathResolver
+
+ENTRIES = [
+    {'path': path, 'type': 'tree'} for path in ("src", "src/components", "docs", "node_modules")
+] + [
+    {'path': path, 'type': 'blob'} for path in (
+        "README.md", "src/app.py", "src/utils.py", "src/components/Login.jsx",
+        "src/components/Button.jsx", "docs/utils.py", "node_modules/lib/index.js",
+    )
+]
+
+
+@pytest.fixture
+def resolver():
+    return PathResolver(ENTRIES)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("./src/app.py", ["src/app.py"]),
+    ("src/components/", ["src/components/Button.jsx", "src/components/Login.jsx"]),
+    ("*.jsx", ["src/components/Button.jsx", "src/components/Login.jsx"]),
+    ("src/*.py", ["src/app.py", "src/utils.py"]),
+    ("app.py", ["src/app.py"]),
+    ("components/Login.jsx", ["src/components/Login.jsx"]),
+    ("components", ["src/components/Button.jsx", "src/components/Login.jsx"]),
+    ("Logn.jsx", ["src/components/Login.jsx"]),
+])
+def test_unambiguous_targets(resolver, query, expected):
+    assert resolver.resolve(query) == (expected, False)
+
+
+def test_root_excludes_ignored_dirs(resolver):
+    paths, ambiguous = resolver.resolve(".")
+    assert not ambiguous
+    assert "node_modules/lib/index.js" not in paths
+    assert len(paths) == 6
+
+
+def test_duplicate_basename_is_ambiguous(resolver):
+    assert resolver.resolve("utils.py") == (["docs/utils.py", "src/utils.py"], True)
+
+
+def test_unknown_target_goes_to_agent_only_for_natural_language(resolver):
+    assert resolver.resolve("nothing.rs") == ([], False)
+    assert resolver.resolve("le fichier de connexion") == ([], True)
+
+
+def test_files_under_does_not_match_sibling_prefix():
+    resolver = PathResolver([{'path': "src/a.py", 'type': 'blob'}, {'path': "src2/b.py", 'type': 'blob'}])
+    assert resolver.files_under("src") == ["src/a.py"]
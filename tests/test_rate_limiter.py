@@ -0,0 +1,86 @@
+"""Cadencement des appels GitHub en fonction des en-têtes de quota"""
+import time
+
+import pytest
+
+from rate_limiter import PRIORITY_CONTENT, PRIORITY_METADATA, SECONDARY_LIMIT_DELAY, RateLimitScheduler, request_priority
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, headers=None, text=""):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = text
+
+
+def quota(remaining, limit=5000, reset_in=600):
+    return FakeResponse(headers={
+        'X-RateLimit-Limit': str(limit),
+        'X-RateLimit-Remaining': str(remaining),
+        'X-RateLimit-Reset': str(time.time() + reset_in),
+    })
+
+
+def test_request_priority():
+    assert request_priority("get", "https://api.github.com/repos/o/r/contents/a.py") == PRIORITY_CONTENT
+    assert request_priority("GET", "https://api.github.com/repos/o/r/git/blobs/abc") == PRIORITY_CONTENT
+    assert request_priority("GET", "https://api.github.com/repos/o/r/pulls/1") == PRIORITY_METADATA
+    assert request_priority("PUT", "https://api.github.com/repos/o/r/contents/a.py") == PRIORITY_METADATA
+
+
+def test_update_ignores_other_resources():
+    scheduler = RateLimitScheduler()
+    response = quota(10)
+    response.headers['X-RateLimit-Resource'] = 'search'
+    scheduler.update(response)
+    assert scheduler.remaining is None
+    scheduler.update(quota(4000))
+    assert (scheduler.remaining, scheduler.limit) == (4000, 5000)
+
+
+def test_rate_is_smoothed_below_slowdown_ratio():
+    scheduler = RateLimitScheduler(max_rate=10)
+    now = time.time()
+    scheduler.update(quota(4000))
+    assert scheduler._current_rate(now) == 10
+    scheduler.update(quota(300, reset_in=600))
+    assert scheduler._current_rate(now) < 1
+
+
+def test_reserve_blocks_content_but_not_metadata():
+    scheduler = RateLimitScheduler()
+    scheduler.update(quota(100, reset_in=600))  # 2 % du quota, sous la réserve de 5 %
+    now = time.time()
+    assert scheduler._wait_time(now, PRIORITY_CONTENT) > 500
+    assert scheduler._wait_time(now, PRIORITY_METADATA) == 0
+
+
+def test_acquire_consumes_tokens_and_local_budget():
+    scheduler = RateLimitScheduler(burst=3)
+    scheduler.update(quota(4000))
+    for _ in range(3):
+        scheduler.acquire()
+    assert scheduler.remaining == 3997
+    assert scheduler.waited == 0
+
+
+def test_retry_delay():
+    scheduler = RateLimitScheduler()
+    assert scheduler.retry_delay(FakeResponse(404)) is None
+    assert scheduler.retry_delay(FakeResponse(403, text="Forbidden")) is None
+    assert scheduler.retry_delay(FakeResponse(429, {'Retry-After': "7"})) == 7
+    assert scheduler.retry_delay(FakeResponse(403, text="API rate limit exceeded")) == SECONDARY_LIMIT_DELAY
+    exhausted = FakeResponse(403, {'X-RateLimit-Remaining': "0", 'X-RateLimit-Reset': str(time.time() + 120)})
+    assert 100 < scheduler.retry_delay(exhausted) <= 120
+    assert scheduler.rate_limited == 3
+    assert scheduler.blocked_until > time.time() + 100
+    assert scheduler._wait_time(time.time(), PRIORITY_METADATA) > 100
+
+
+def test_projected_exhaustion():
+    scheduler = RateLimitScheduler()
+    assert scheduler.projected_exhaustion_seconds() is None
+    scheduler.update(quota(1000))
+    scheduler._samples[-1] = (scheduler._samples[-1][0] - 10, 1000)
+    scheduler.update(quota(900))  # 100 requêtes en 10 s
+    assert scheduler.projected_exhaustion_seconds() == pytest.approx(90, abs=1)
@@ -12,6 +12,8 @@ import requests
 import time
 from datetime import datetime
 
+from github_client import get_client
+
 def parse_args():
     """Parse les arguments de ligne de commande"""
     parser = argparse.ArgumentParser(description="Déclencheur de workflow GitHub Actions")
@@ -30,19 +32,14 @@ def parse_args():
 
 def trigger_workflow(owner, repo, workflow_id, inputs, token):
     """Déclenche un workflow GitHub Actions via l'API"""
-    url = f"https://api.github.com/repos/{owner}/{repo}/actions/workflows/{workflow_id}/dispatches"
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json",
-        "Content-Type": "application/json"
-    }
+    url = f"/repos/{owner}/{repo}/actions/workflows/{workflow_id}/dispatches"
     data = {
         "ref": "main",  # Branche sur laquelle déclencher le workflow
         "inputs": inputs
     }
     
     try:
-        response = requests.post(url, headers=headers, json=data)
+        response = get_client(token).post(url, json=data)
         response.raise_for_status()
         return True
     except requests.exceptions.RequestException as e:
@@ -58,14 +55,10 @@ def trigger_workflow(owner, repo, workflow_id, inputs, token):
 
 def get_workflow_runs(owner, repo, workflow_id, token, per_page=10):
     """Récupère les dernières exécutions d'un workflow"""
-    url = f"https://api.github.com/repos/{owner}/{repo}/actions/workflows/{workflow_id}/runs?per_page={per_page}"
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
+    url = f"/repos/{owner}/{repo}/actions/workflows/{workflow_id}/runs"
     
     try:
-        response = requests.get(url, headers=headers)
+        response = get_client(token).get(url, params={"per_page": per_page})
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -74,16 +67,12 @@ def get_workflow_runs(owner, repo, workflow_id, token, per_page=10):
 
 def monitor_workflow_run(owner, repo, run_id, token, interval=10, max_attempts=30):
     """Surveille l'état d'une exécution de workflow"""
-    url = f"https://api.github.com/repos/{owner}/{repo}/actions/runs/{run_id}"
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
+    url = f"/repos/{owner}/{repo}/actions/runs/{run_id}"
     
     attempts = 0
     while attempts < max_attempts:
         try:
-            response = requests.get(url, headers=headers)
+            response = get_client(token).get(url)
             response.raise_for_status()
             run_data = response.json()
             